@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import (
+    load_user_vector_store,
+    load_global_vector_store,
+    load_regulatory_vector_store,
+    get_combined_conversational_agent,
+    get_summary_trees,
+    get_tables,
+    is_summary_question,
+    embed_queries,
+)
+from usage_store import usage_context
+
+def read_questions(input_path):
+    """Read questions from a JSONL file; accepts question/query/body fields and id/request_id keys"""
+    questions = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = record.get("question") or record.get("query") or record.get("body")
+            if not question:
+                print(f"Skipping line {line_number}: no question field")
+                continue
+            question_id = str(record.get("id") or record.get("request_id") or line_number)
+            questions.append({"id": question_id, "question": question})
+    return questions
+
+def read_completed_ids(output_path):
+    """Return ids already answered successfully so an interrupted run can resume"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+    return completed
+
+def build_agent(username=None):
+    """Load indexes once and build the same combined agent the chat UI uses"""
+    user_vector_store = load_user_vector_store(username) if username else None
+    global_vector_store = load_global_vector_store()
+    if not user_vector_store and not global_vector_store:
+        raise RuntimeError("No vector store available: build the knowledge base or a user index first")
+    
+    agent = get_combined_conversational_agent(
+        user_vector_store,
+        global_vector_store,
+        "batch question answering",
+        summary_trees=get_summary_trees(username),
+        tables=get_tables(username),
+        regulatory_vector_store=load_regulatory_vector_store(),
+        username=username
+    )
+    embeddings = (user_vector_store or global_vector_store).embedding_function
+    return agent, embeddings
+
+def answer_question(agent, item, query_embedding=None, username=None):
+    """Answer one question and return the output record with latency and token stats"""
+    start = time.perf_counter()
+    record = {"id": item["id"], "question": item["question"]}
+    try:
+        # Worker threads start with an empty context, so usage is attributed here rather than in run_batch
+        with usage_context(username, "batch"):
+            response = agent.invoke({"query": item["question"], "query_embedding": query_embedding})
+        usage = response.get("usage") or {}
+        record.update({
+            "status": "ok",
+            "answer": response["result"],
+            "sources": [
+                {
+                    "source_file": doc.metadata.get("source_file"),
+                    "retrieval_source": doc.metadata.get("retrieval_source"),
+                    "page": doc.metadata.get("page"),
+                }
+                for doc in response.get("source_documents", [])
+            ],
+            "input_tokens": usage.get("input_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+            "mode": response.get("mode"),
+        })
+    except Exception as e:
+        record.update({"status": "error", "error": str(e)})
+    record["latency_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+def run_batch(input_path, output_path, username=None, concurrency=4, embed_batch_size=100):
+    """Answer every pending question in input_path, appending results to output_path"""
+    questions = read_questions(input_path)
+    completed = read_completed_ids(output_path)
+    pending = [item for item in questions if item["id"] not in completed]
+    print(f"{len(questions)} questions, {len(completed)} already answered, {len(pending)} pending")
+    if not pending:
+        return []
+    
+    agent, embeddings = build_agent(username)
+    
+    # Summary questions are answered from precomputed summaries and need no query vector
+    to_embed = [item for item in pending if not is_summary_question(item["question"])]
+    with usage_context(username, "batch"):
+        vectors = embed_queries(embeddings, [item["question"] for item in to_embed], embed_batch_size)
+    embedded = {item["id"]: vector for item, vector in zip(to_embed, vectors)}
+    
+    write_lock = threading.Lock()
+    records = []
+    started = time.perf_counter()
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(answer_question, agent, item, embedded.get(item["id"]), username) for item in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            records.append(record)
+            print(f"[{done}/{len(pending)}] {record['id']}: {record['status']} in {record['latency_s']}s")
+    
+    print_summary(records, time.perf_counter() - started)
+    return records
+
+def print_summary(records, elapsed):
+    """Print throughput, latency percentiles and token totals for a run"""
+    latencies = sorted(record["latency_s"] for record in records if record["status"] == "ok")
+    errors = sum(1 for record in records if record["status"] != "ok")
+    input_tokens = sum(record.get("input_tokens") or 0 for record in records)
+    output_tokens = sum(record.get("output_tokens") or 0 for record in records)
+    
+    print("\n📊 Batch summary:")
+    print(f"  Answered: {len(latencies)}  Errors: {errors}  Wall time: {elapsed:.1f}s")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"  Latency p50: {p50:.2f}s  p95: {p95:.2f}s  Throughput: {len(latencies) / elapsed:.2f} q/s")
+    print(f"  Tokens in: {input_tokens}  out: {output_tokens}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions against the knowledge base")
+    parser.add_argument("input", help="JSONL file with one question per line")
+    parser.add_argument("output", help="JSONL file to append answers to (reused to resume)")
+    parser.add_argument("--username", help="also search this user's uploaded document index")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions answered in parallel")
+    parser.add_argument("--embed-batch-size", type=int, default=100, help="queries per embedding request")
+    args = parser.parse_args()
+    
+    run_batch(args.input, args.output, args.username, args.concurrency, args.embed_batch_size)
+
+if __name__ == "__main__":
+    main()
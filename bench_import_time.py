@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+import platform
+import statistics
+import subprocess
+
+RESULTS_DIR = "bench_results"
+
+# main.py imports utils before it renders the login page; none of these may load on that path
+LOGIN_MODULE = "utils"
+DEFERRED_PACKAGES = (
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "langchain_classic",
+    "langchain_text_splitters",
+    "langchain_google_genai",
+    "google.generativeai",
+    "google.genai",
+    "faiss",
+    "numpy",
+    "pandas",
+    "pypdf",
+    "docx",
+    "requests",
+    "bs4",
+)
+
+def parse_importtime(stderr):
+    """(module, self_us, cumulative_us, depth) for every line `python -X importtime` wrote"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+def measure_import(module):
+    # The app reads the key at import; a placeholder keeps the import from stopping on a missing secret
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "import-benchmark"), METRICS_LOG_FILE="")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = parse_importtime(result.stderr)
+    total_us = next((cumulative for name, _, cumulative, depth in entries if name == module and depth == 0), None)
+    return total_us, entries
+
+def deferred_packages_loaded(entries):
+    loaded = {name for name, _, _, _ in entries}
+    return sorted(
+        package for package in DEFERRED_PACKAGES
+        if any(name == package or name.startswith(package + ".") for name in loaded)
+    )
+
+def slowest_imports(entries, count):
+    """Top-level packages under the measured module, by cumulative time"""
+    packages = {}
+    for name, _, cumulative, depth in entries:
+        if depth == 1:
+            packages[name] = max(packages.get(name, 0), cumulative)
+    return [
+        {"module": name, "ms": round(us / 1000, 1)}
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:count]
+    ]
+
+def run(module, repeat):
+    # The first import writes .pyc files and warms the page cache, so it is not counted
+    measure_import(module)
+    totals, entries = [], []
+    for _ in range(repeat):
+        total_us, entries = measure_import(module)
+        totals.append(total_us)
+    return {
+        "module": module,
+        "repeat": repeat,
+        "median_ms": round(statistics.median(totals) / 1000, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "max_ms": round(max(totals) / 1000, 1),
+        "modules_loaded": len(entries),
+        "deferred_packages_loaded": deferred_packages_loaded(entries),
+        "slowest": slowest_imports(entries, 10)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the login page path with `python -X importtime` and fail on regressions")
+    parser.add_argument("modules", nargs="*", default=[LOGIN_MODULE], help=f"modules to import (default: {LOGIN_MODULE})")
+    parser.add_argument("--repeat", type=int, default=5, help="imports to take the median of, after one warm-up")
+    parser.add_argument("--max-ms", type=float, default=1000.0, help="fail when the median import of the login module takes longer")
+    parser.add_argument("--compare", help="earlier results file; fail when a module got more than --tolerance slower")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/import_time_<timestamp>.json)")
+    args = parser.parse_args()
+
+    started_at = datetime.datetime.now()
+    results = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "imports": [run(module, args.repeat) for module in args.modules]
+    }
+
+    failures = []
+    for result in results["imports"]:
+        print(f"import {result['module']}: median {result['median_ms']} ms ({result['min_ms']}-{result['max_ms']}), {result['modules_loaded']} modules")
+        for slow in result["slowest"]:
+            print(f"  {slow['module']:<40} {slow['ms']:>8} ms")
+        if result["module"] == LOGIN_MODULE:
+            if result["deferred_packages_loaded"]:
+                failures.append(f"{LOGIN_MODULE} loads {', '.join(result['deferred_packages_loaded'])}; import them inside the functions that use them")
+            if result["median_ms"] > args.max_ms:
+                failures.append(f"{LOGIN_MODULE} import takes {result['median_ms']} ms, over the {args.max_ms} ms budget")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = {result["module"]: result for result in json.load(f)["imports"]}
+        print(f"\nCompared with {args.compare}")
+        for result in results["imports"]:
+            old = baseline.get(result["module"])
+            if not old:
+                continue
+            change = (result["median_ms"] - old["median_ms"]) / old["median_ms"]
+            print(f"  {result['module']:<32} {old['median_ms']:>8} -> {result['median_ms']:>8} ms ({change:+.1%})")
+            if change > args.tolerance:
+                failures.append(f"{result['module']} import is {change:.0%} slower than {args.compare}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"import_time_{started_at:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to {output}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
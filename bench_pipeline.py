@@ -0,0 +1,241 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import resource
+import subprocess
+import tempfile
+
+import numpy as np
+
+# Offline runs need neither a real key nor the metrics log; both are read when utils is imported
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ["METRICS_LOG_FILE"] = ""
+
+import utils
+from langchain_community.vectorstores import FAISS
+from dedup import dedupe_chunks
+from instrumented_models import TimedEmbeddings
+from mmap_store import write_chunk_store, load_mmap_vector_store
+from fake_backends import FakeEmbeddings, FakeChatModel
+
+RESULTS_DIR = "bench_results"
+
+# (result path, True when a larger value is better) for --compare
+COMPARED_METRICS = [
+    ("ingestion.chunks_per_second", True),
+    ("ingestion.seconds.load", False),
+    ("ingestion.seconds.split", False),
+    ("ingestion.seconds.embed", False),
+    ("ingestion.seconds.write", False),
+    ("index_load.private_s", False),
+    ("index_load.mmap_s", False),
+    ("queries.retrieval_p50_ms", False),
+    ("queries.retrieval_p99_ms", False),
+    ("queries.answer_p50_ms", False),
+    ("queries.answer_p99_ms", False),
+    ("peak_rss_mb", False),
+]
+
+def use_fake_backends(args):
+    """Route every embedding and chat model the pipeline builds to the deterministic fakes"""
+    embeddings = FakeEmbeddings(args.dimensions, args.embed_latency, args.embed_text_latency)
+    utils.get_embeddings = lambda: TimedEmbeddings(embeddings)
+    utils.get_llm = lambda temperature=0.7, operation="answer": FakeChatModel(
+        first_token_latency=args.llm_latency,
+        token_latency=args.llm_token_latency,
+        completion_tokens=args.completion_tokens
+    )
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ingest(paths, index_path):
+    """Load, split, dedupe, embed and write the documents the way create_global_knowledge_base does"""
+    seconds = {}
+    start = time.perf_counter()
+    docs = []
+    for path in paths:
+        docs.extend(utils.load_document(path))
+    seconds["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = utils.split_documents(docs)
+    canonical_chunks, dedup_report = dedupe_chunks(chunks)
+    seconds["split"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vector_store = FAISS.from_documents(canonical_chunks, utils.get_embeddings())
+    seconds["embed"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    os.makedirs(index_path, exist_ok=True)
+    vector_store.save_local(index_path)
+    write_chunk_store(vector_store, index_path)
+    seconds["write"] = time.perf_counter() - start
+
+    total = sum(seconds.values())
+    return vector_store, {
+        "documents": len(paths),
+        "pages": len(docs),
+        "chunks": len(chunks),
+        "unique_chunks": len(canonical_chunks),
+        "duplicates": dedup_report["duplicates"],
+        "seconds": {stage: round(value, 3) for stage, value in seconds.items()},
+        "total_s": round(total, 3),
+        "chunks_per_second": round(len(chunks) / total, 1) if total else None
+    }
+
+def measure_index_load(index_path, repeat):
+    private, mmapped = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        utils.load_vector_store(index_path)
+        private.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        load_mmap_vector_store(index_path, utils.get_embeddings())
+        mmapped.append(time.perf_counter() - start)
+    return {"repeat": repeat, "private_s": round(float(np.median(private)), 4), "mmap_s": round(float(np.median(mmapped)), 4)}
+
+def sample_questions(vector_store, count, seed):
+    """Build questions from phrases in random chunks, so every query has at least one relevant passage"""
+    rng = random.Random(seed)
+    positions = list(range(vector_store.index.ntotal))
+    questions = []
+    while positions and len(questions) < count:
+        position = positions.pop(rng.randrange(len(positions)))
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+        words = doc.page_content.split()
+        if len(words) < 12:
+            continue
+        offset = rng.randrange(len(words) - 10)
+        questions.append("What does the document say about " + " ".join(words[offset:offset + 10]) + "?")
+    return questions
+
+def run_queries(agent, questions, warmup):
+    for question in questions[:warmup]:
+        agent.invoke({"query": question})
+
+    questions = questions[warmup:]
+    retrieval, answers = [], []
+    stage_seconds = {}
+    for question in questions:
+        start = time.perf_counter()
+        agent.retrieval_fn(question)
+        retrieval.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        response = agent.invoke({"query": question})
+        answers.append(time.perf_counter() - start)
+        for timing in response.get("timings", []):
+            stage_seconds.setdefault(timing["stage"], []).append(timing["seconds"])
+
+    return {
+        "questions": len(questions),
+        "retrieval_p50_ms": percentile_ms(retrieval, 50),
+        "retrieval_p99_ms": percentile_ms(retrieval, 99),
+        "answer_p50_ms": percentile_ms(answers, 50),
+        "answer_p99_ms": percentile_ms(answers, 99),
+        "stage_mean_ms": {stage: round(float(np.mean(values)) * 1000, 2) for stage, values in sorted(stage_seconds.items())}
+    }
+
+def _lookup(results, path):
+    for key in path.split("."):
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+def compare(baseline_path, results):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline.get('git_commit')}, {baseline.get('started_at')})")
+    for path, higher_is_better in COMPARED_METRICS:
+        old, new = _lookup(baseline, path), _lookup(results, path)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        better = change > 0 if higher_is_better else change < 0
+        flag = "" if abs(change) < 0.05 else (" better" if better else " WORSE")
+        print(f"  {path:<32} {old:>10} -> {new:>10} ({change:+.1%}){flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, index loading and answering offline with fake embedding and LLM backends")
+    parser.add_argument("docs", nargs="*", help="documents to ingest (default: preloaded_docs/*.pdf)")
+    parser.add_argument("--questions", type=int, default=200, help="queries sampled from the indexed chunks")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--load-repeat", type=int, default=5, help="index loads to take the median of")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dimensions", type=int, default=768, help="fake embedding size; embedding-001 returns 768")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="simulated seconds per embedding call")
+    parser.add_argument("--embed-text-latency", type=float, default=0.0, help="simulated seconds per embedded text")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds before the first generated token")
+    parser.add_argument("--llm-token-latency", type=float, default=0.0, help="simulated seconds per generated token")
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/pipeline_<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to report changes against")
+    args = parser.parse_args()
+
+    paths = args.docs or sorted(glob.glob(os.path.join(utils.get_preloaded_docs_path(), "*.pdf")))
+    if not paths:
+        parser.error("no documents to ingest")
+    use_fake_backends(args)
+
+    started_at = datetime.datetime.now()
+    results = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": dict(vars(args), docs=paths)
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        # A private extraction cache keeps ingestion cold and leaves the app's cache untouched
+        utils.EXTRACTION_CACHE_DIR = os.path.join(workdir, "extraction_cache")
+        index_path = os.path.join(workdir, "index")
+
+        print(f"Ingesting {len(paths)} documents...")
+        vector_store, results["ingestion"] = ingest(paths, index_path)
+        results["rss_after_ingestion_mb"] = peak_rss_mb()
+        print(f"  {results['ingestion']}")
+
+        print("Loading the index...")
+        results["index_load"] = measure_index_load(index_path, args.load_repeat)
+        print(f"  {results['index_load']}")
+
+        questions = sample_questions(vector_store, args.questions + args.warmup, args.seed)
+        del vector_store
+        agent = utils.get_combined_conversational_agent(None, load_mmap_vector_store(index_path, utils.get_embeddings()), "benchmark")
+        print(f"Answering {len(questions) - args.warmup} questions...")
+        results["queries"] = run_queries(agent, questions, args.warmup)
+        print(f"  {results['queries']}")
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{started_at:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()
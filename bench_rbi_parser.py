@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import glob
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+
+from rbi_scraper import BASE, parse_rbi_listing
+
+FIXTURE_DIR = os.path.join("fixtures", "rbi")
+
+def legacy_parse_rbi_listing(content):
+    """The previous title-matching parser, kept as the benchmark baseline"""
+    soup = BeautifulSoup(content, "html.parser")
+    results = []
+    current_date = None
+    lines = soup.get_text('\n').split('\n')
+
+    link_map = {}
+    for link in soup.find_all('a', href=True):
+        href = link.get('href', '')
+        if 'BS_PressReleaseDisplay.aspx?prid=' in href:
+            title = link.get_text(strip=True)
+            if title and len(title) > 10:
+                if href.startswith('/'):
+                    full_url = BASE + href
+                elif href.startswith('http'):
+                    full_url = href
+                elif href.startswith('Scripts/'):
+                    full_url = BASE + "/" + href
+                else:
+                    full_url = BASE + "/Scripts/" + href
+                link_map[title] = full_url
+
+    date_patterns = [
+        r'^([A-Z][a-z]{2}) (\d{1,2}), (\d{4})$',
+        r'^(\d{1,2}) ([A-Z][a-z]{2}) (\d{4})$',
+        r'^([A-Z][a-z]{2})\s+(\d{1,2}),\s+(\d{4})$'
+    ]
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if any(re.match(pattern, line) for pattern in date_patterns):
+            current_date = line
+            continue
+        if line in link_map:
+            results.append({'date': current_date if current_date else 'No Date', 'title': line, 'url': link_map[line]})
+    return results
+
+def load_fixtures():
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))):
+        with open(path, "rb") as f:
+            content = f.read()
+        expected_path = path[:-len(".html")] + ".expected.json"
+        expected = None
+        if os.path.exists(expected_path):
+            with open(expected_path, "r", encoding="utf-8") as f:
+                expected = json.load(f)
+        fixtures.append((path, content, expected))
+    return fixtures
+
+def check_fixtures(fixtures):
+    """Compare parser output with each fixture's expected items; return the number of mismatching fixtures"""
+    failures = 0
+    for path, content, expected in fixtures:
+        if expected is None:
+            print(f"SKIP {path}: no expected output")
+            continue
+        items = parse_rbi_listing(content)
+        if items == expected:
+            print(f"OK   {path}: {len(items)} items")
+            continue
+        failures += 1
+        print(f"FAIL {path}: {len(items)} items, expected {len(expected)}")
+        for index, (got, want) in enumerate(zip(items, expected)):
+            if got != want:
+                print(f"     first difference at item {index}: {got} != {want}")
+                break
+    return failures
+
+def build_archive_page(content, months):
+    """Repeat a listing page's rows to approximate a multi-year archive page for throughput runs"""
+    text = content.decode("utf-8")
+    start = text.index("<tr>")
+    end = text.rindex("</tr>") + len("</tr>")
+    rows = text[start:end]
+    # Offset prids per month so every release is distinct, as on a real archive page
+    months_rows = [
+        re.sub(r"prid=(\d+)", lambda match: f"prid={int(match.group(1)) + month * 100000}", rows)
+        for month in range(months)
+    ]
+    return (text[:start] + "\n".join(months_rows) + text[end:]).encode("utf-8")
+
+def benchmark(name, parse, pages, repeat):
+    total_bytes = sum(len(page) for page in pages)
+    items = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            items += len(parse(page))
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8}: {repeat * len(pages) / elapsed:8.1f} pages/s  {items / elapsed:10.0f} items/s  {repeat * total_bytes / elapsed / 1e6:6.2f} MB/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the RBI listing parser against saved fixtures and measure parse throughput")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the fixture pages")
+    parser.add_argument("--archive-months", type=int, default=36, help="size of the synthetic archive page, in months of listing rows")
+    parser.add_argument("--check-only", action="store_true")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    failures = check_fixtures(fixtures)
+    if args.check_only:
+        raise SystemExit(1 if failures else 0)
+
+    pages = [content for _, content, _ in fixtures]
+    print(f"\nListing fixtures ({len(pages)} pages, {args.repeat} passes)")
+    legacy = benchmark("legacy", legacy_parse_rbi_listing, pages, args.repeat)
+    current = benchmark("lxml", parse_rbi_listing, pages, args.repeat)
+    print(f"speedup: {legacy / current:.1f}x")
+
+    archive = build_archive_page(pages[0], args.archive_months)
+    print(f"\nSynthetic archive page ({args.archive_months} months, {len(archive) / 1e6:.1f} MB)")
+    legacy = benchmark("legacy", legacy_parse_rbi_listing, [archive], 1)
+    current = benchmark("lxml", parse_rbi_listing, [archive], 1)
+    print(f"speedup: {legacy / current:.1f}x")
+
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import multiprocessing
+
+def legacy_register(path, username, password_hash):
+    """The previous users.json read-modify-write, kept as the comparison baseline"""
+    db = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            try:
+                db = json.load(f)
+            except json.JSONDecodeError:
+                db = {}
+    if username in db:
+        return False
+    db[username] = password_hash
+    with open(path, "w") as f:
+        json.dump(db, f, indent=4)
+    return True
+
+def legacy_lookup(path, username):
+    with open(path, "r") as f:
+        return json.load(f).get(username)
+
+def _password_hash(username):
+    return hashlib.sha256(f"password-{username}".encode()).hexdigest()
+
+def _register_worker(args):
+    backend, usernames = args
+    if backend == "sqlite":
+        import user_store
+        return [name for name in usernames if user_store.create_user(name, _password_hash(name))]
+    registered = []
+    for name in usernames:
+        try:
+            if legacy_register("users.json", name, _password_hash(name)):
+                registered.append(name)
+        except (OSError, ValueError):
+            pass
+    return registered
+
+def concurrent_registrations(backend, processes, per_process, overlap):
+    """Each process registers its own names plus `overlap` names every other process also tries"""
+    shared = [f"shared_{i}" for i in range(overlap)]
+    batches = []
+    for worker in range(processes):
+        names = [f"user_{worker}_{i}" for i in range(per_process)] + shared
+        random.shuffle(names)
+        batches.append((backend, names))
+
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        results = pool.map(_register_worker, batches)
+    elapsed = time.perf_counter() - start
+
+    successes = [name for result in results for name in result]
+    expected = processes * per_process + overlap
+    if backend == "sqlite":
+        import user_store
+        stored = user_store.get_all_users()
+        integrity = user_store.get_connection().execute("PRAGMA integrity_check").fetchone()[0]
+    else:
+        try:
+            with open("users.json", "r") as f:
+                stored = json.load(f)
+            integrity = "ok"
+        except (OSError, ValueError) as e:
+            stored, integrity = {}, f"corrupt: {e}"
+
+    print(f"{backend:>6}: {len(successes)} registrations reported, {len(stored)} stored of {expected} distinct names "
+          f"({expected - len(stored)} lost, {len(successes) - len(set(successes))} double-registered) "
+          f"in {elapsed:.2f}s, {len(successes) / elapsed:.0f}/s, integrity {integrity}")
+    return stored, successes
+
+def lookups(backend, usernames, count):
+    sample = random.choices(usernames, k=count)
+    if backend == "sqlite":
+        import user_store
+        user_store._hash_cache.clear()
+        start = time.perf_counter()
+        for name in sample:
+            assert user_store.get_password_hash(name) == _password_hash(name)
+    else:
+        start = time.perf_counter()
+        for name in sample:
+            assert legacy_lookup("users.json", name) == _password_hash(name)
+    elapsed = time.perf_counter() - start
+    print(f"{backend:>6}: {count} logins over {len(usernames)} accounts, {elapsed / count * 1e6:.0f} µs per lookup")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the SQLite user store against the old users.json")
+    parser.add_argument("--accounts", type=int, default=5000, help="accounts created before the lookup test")
+    parser.add_argument("--processes", type=int, default=8, help="concurrent registering processes")
+    parser.add_argument("--per-process", type=int, default=250)
+    parser.add_argument("--overlap", type=int, default=100, help="names every process tries to register")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    backends = ["sqlite"] if args.skip_legacy else ["sqlite", "json"]
+    for backend in backends:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            os.environ["PYTHONPATH"] = repo_dir
+            sys.path.insert(0, repo_dir)
+
+            print(f"\n== {backend} ==")
+            concurrent_registrations(backend, args.processes, args.per_process, args.overlap)
+
+            usernames = [f"bulk_{i}" for i in range(args.accounts)]
+            start = time.perf_counter()
+            if backend == "sqlite":
+                import user_store
+                for name in usernames:
+                    user_store.create_user(name, _password_hash(name))
+            else:
+                # Building thousands of accounts one registration at a time is quadratic for the JSON file
+                with open("users.json", "r") as f:
+                    db = json.load(f)
+                db.update({name: _password_hash(name) for name in usernames})
+                with open("users.json", "w") as f:
+                    json.dump(db, f, indent=4)
+            print(f"{backend:>6}: created {args.accounts} accounts in {time.perf_counter() - start:.2f}s")
+            lookups(backend, usernames, args.lookups)
+
+            if backend == "sqlite":
+                user_store.get_connection().close()
+                user_store._local.connection = None
+            os.chdir(repo_dir)
+
+if __name__ == "__main__":
+    main()
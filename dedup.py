@@ -0,0 +1,92 @@
+import re
+import zlib
+import hashlib
+
+import numpy as np
+
+HASH_PRIME = 4294967291
+ALIAS_FIELDS = ("source_file", "page", "section_id", "source_url")
+
+class NearDuplicateIndex:
+    """MinHash signatures with an LSH band index for detecting duplicate chunks.
+
+    MinHash only proposes candidates: a chunk is collapsed into an alias when its normalized text
+    (lowercased words) equals the canonical chunk's. Statute chunks that differ in one amount or
+    rate are different law, so near matches are kept as chunks of their own.
+    """
+
+    def __init__(self, threshold=0.98, num_perm=128, bands=32, shingle_size=5, seed=1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        generator = np.random.RandomState(seed)
+        # Hash functions are (a * x + b) mod p over the largest 32-bit prime, so a * x fits in uint64
+        self.a = generator.randint(1, HASH_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = generator.randint(0, HASH_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.buckets = {}
+        self.signatures = []
+        self.normalized_hashes = []
+        self.canonical_chunks = []
+        self.total = 0
+
+    @staticmethod
+    def _words(text):
+        return re.findall(r"\w+", text.lower())
+
+    def signature(self, text):
+        words = self._words(text)
+        if len(words) < self.shingle_size:
+            shingles = {" ".join(words)}
+        else:
+            shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) % HASH_PRIME for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % np.uint64(HASH_PRIME)).min(axis=1)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def add(self, chunk):
+        """Index a chunk; return False and record it as an alias when it duplicates an earlier chunk"""
+        self.total += 1
+        signature = self.signature(chunk.page_content)
+        normalized_hash = hashlib.sha256(" ".join(self._words(chunk.page_content)).encode("utf-8")).digest()
+        keys = self._band_keys(signature)
+
+        candidates = set()
+        for key in keys:
+            candidates.update(self.buckets.get(key, ()))
+        for candidate in sorted(candidates):
+            if self.normalized_hashes[candidate] != normalized_hash:
+                continue
+            if np.mean(self.signatures[candidate] == signature) >= self.threshold:
+                canonical = self.canonical_chunks[candidate]
+                alias = {field: chunk.metadata[field] for field in ALIAS_FIELDS if chunk.metadata.get(field) is not None}
+                # Same words, different casing or punctuation: the alias keeps its own wording
+                if chunk.page_content != canonical.page_content:
+                    alias["text"] = chunk.page_content
+                canonical.metadata.setdefault("aliases", []).append(alias)
+                return False
+
+        position = len(self.canonical_chunks)
+        self.signatures.append(signature)
+        self.normalized_hashes.append(normalized_hash)
+        self.canonical_chunks.append(chunk)
+        for key in keys:
+            self.buckets.setdefault(key, []).append(position)
+        return True
+
+    def report(self):
+        duplicates = self.total - len(self.canonical_chunks)
+        return {
+            "chunks": self.total,
+            "canonical_chunks": len(self.canonical_chunks),
+            "duplicates": duplicates,
+            "dedup_ratio": round(duplicates / self.total, 4) if self.total else 0.0
+        }
+
+def dedupe_chunks(chunks, **kwargs):
+    """Return the canonical chunks (aliases recorded in their metadata) and a dedup report"""
+    index = NearDuplicateIndex(**kwargs)
+    canonical = [chunk for chunk in chunks if index.add(chunk)]
+    return canonical, index.report()
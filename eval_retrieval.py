@@ -0,0 +1,275 @@
+import os
+import glob
+import json
+import time
+import hashlib
+import argparse
+import datetime
+import tempfile
+
+import numpy as np
+import faiss
+
+GOLDEN_SET = os.path.join("fixtures", "eval", "golden.jsonl")
+EMBEDDING_CACHE_DIR = "eval_cache"
+RESULTS_DIR = "bench_results"
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+
+def normalize(text):
+    return " ".join(text.split()).lower()
+
+def load_golden_set(path=GOLDEN_SET):
+    """Questions with the source file and the passages (as exact phrases) that answer them"""
+    golden = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                record["evidence"] = [normalize(passage) for passage in record["evidence"]]
+                golden.append(record)
+    return golden
+
+def check_golden_set(golden, pages):
+    """Evidence phrases that no longer occur in the extracted text of their source file"""
+    texts = {}
+    for page in pages:
+        texts.setdefault(page.metadata["source_file"], []).append(normalize(page.page_content))
+    texts = {source: " ".join(parts) for source, parts in texts.items()}
+    return [
+        (record["id"], passage)
+        for record in golden
+        for passage in record["evidence"]
+        if passage not in texts.get(record["source_file"], "")
+    ]
+
+class CachedEmbeddings:
+    """Keeps every vector by text hash on disk, so a sweep only pays for chunk texts it has not seen before"""
+
+    def __init__(self, embeddings, name):
+        self.embeddings = embeddings
+        self.path = os.path.join(EMBEDDING_CACHE_DIR, f"{name}.npz")
+        self.vectors = {}
+        if os.path.exists(self.path):
+            data = np.load(self.path)
+            self.vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+        self.new_texts = 0
+        self.new_chars = 0
+
+    @staticmethod
+    def _key(kind, text):
+        return hashlib.sha1(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts, batch_size=100):
+        missing = list({text: None for text in texts if self._key("document", text) not in self.vectors})
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            for text, vector in zip(batch, self.embeddings.embed_documents(batch)):
+                self.vectors[self._key("document", text)] = np.asarray(vector, dtype=np.float32)
+            self.new_texts += len(batch)
+            self.new_chars += sum(len(text) for text in batch)
+        return np.vstack([self.vectors[self._key("document", text)] for text in texts])
+
+    def embed_query(self, text):
+        key = self._key("query", text)
+        if key not in self.vectors:
+            self.vectors[key] = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return self.vectors[key]
+
+    def save(self):
+        if not self.vectors:
+            return
+        os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+        keys = list(self.vectors)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, keys=np.array(keys), vectors=np.vstack([self.vectors[key] for key in keys]))
+        os.replace(tmp_path, self.path)
+
+def build_faiss_index(index_type, vectors):
+    """A FAISS index of the given type over the vectors; flat is what FAISS.from_documents builds"""
+    dimensions = vectors.shape[1]
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimensions)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimensions, 32)
+        index.hnsw.efSearch = 64
+    elif index_type == "ivf":
+        nlist = max(1, int(np.sqrt(len(vectors))))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimensions), dimensions, nlist)
+        index.train(vectors)
+        index.nprobe = max(1, nlist // 4)
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+    return index
+
+def build_vector_store(index_type, chunks, vectors, embeddings):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    vector_store = FAISS(
+        embedding_function=embeddings.embeddings,
+        index=build_faiss_index(index_type, vectors),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={}
+    )
+    vector_store.add_embeddings(
+        [(chunk.page_content, vector) for chunk, vector in zip(chunks, vectors.tolist())],
+        metadatas=[dict(chunk.metadata, position=position) for position, chunk in enumerate(chunks)]
+    )
+    return vector_store
+
+def saved_size_bytes(vector_store):
+    with tempfile.TemporaryDirectory() as path:
+        vector_store.save_local(path)
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def evidence_by_chunk(golden, chunks):
+    """For each question, the evidence phrases each chunk contains, keyed by chunk position"""
+    normalized = [normalize(chunk.page_content) for chunk in chunks]
+    relevant = []
+    for record in golden:
+        found = {}
+        for position, (chunk, text) in enumerate(zip(chunks, normalized)):
+            if chunk.metadata.get("source_file") != record["source_file"]:
+                continue
+            hits = {i for i, passage in enumerate(record["evidence"]) if passage in text}
+            if hits:
+                found[position] = hits
+        relevant.append(found)
+    return relevant
+
+def score(golden, relevant, rankings, ks):
+    """recall@k (share of evidence phrases retrieved), hit rate@k and MRR@k over the golden set"""
+    metrics = {}
+    for k in ks:
+        recall, hits, reciprocal_ranks = [], [], []
+        for record, found, ranking in zip(golden, relevant, rankings):
+            retrieved = set()
+            first_rank = None
+            for rank, position in enumerate(ranking[:k], 1):
+                if position in found:
+                    retrieved |= found[position]
+                    first_rank = first_rank or rank
+            recall.append(len(retrieved) / len(record["evidence"]))
+            hits.append(1.0 if first_rank else 0.0)
+            reciprocal_ranks.append(1.0 / first_rank if first_rank else 0.0)
+        metrics[f"recall@{k}"] = round(float(np.mean(recall)), 3)
+        metrics[f"hit_rate@{k}"] = round(float(np.mean(hits)), 3)
+        metrics[f"mrr@{k}"] = round(float(np.mean(reciprocal_ranks)), 3)
+    return metrics
+
+def evaluate(golden, pages, embeddings, chunk_sizes, overlaps, ks, index_types):
+    import utils
+    question_vectors = [embeddings.embed_query(record["question"]) for record in golden]
+    results = []
+    for chunk_size in chunk_sizes:
+        for overlap in overlaps:
+            if overlap >= chunk_size:
+                continue
+            chunks = utils.split_documents(pages, chunk_size=chunk_size, chunk_overlap=overlap)
+            relevant = evidence_by_chunk(golden, chunks)
+            answerable = sum(1 for found in relevant if found)
+
+            start = time.perf_counter()
+            new_chars = embeddings.new_chars
+            vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+            embed_seconds = time.perf_counter() - start
+
+            for index_type in index_types:
+                start = time.perf_counter()
+                vector_store = build_vector_store(index_type, chunks, vectors, embeddings)
+                build_seconds = time.perf_counter() - start
+
+                latencies, rankings = [], []
+                for vector in question_vectors:
+                    start = time.perf_counter()
+                    docs = vector_store.similarity_search_by_vector(vector.tolist(), k=max(ks))
+                    latencies.append(time.perf_counter() - start)
+                    rankings.append([doc.metadata["position"] for doc in docs])
+
+                row = {
+                    "chunk_size": chunk_size,
+                    "overlap": overlap,
+                    "index": index_type,
+                    "chunks": len(chunks),
+                    "embedded_chars": sum(len(chunk.page_content) for chunk in chunks),
+                    "answerable": answerable,
+                    **score(golden, relevant, rankings, ks),
+                    "index_bytes": saved_size_bytes(vector_store),
+                    "embed_s": round(embed_seconds, 3),
+                    "newly_embedded_chars": embeddings.new_chars - new_chars,
+                    "build_s": round(build_seconds, 3),
+                    "query_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+                    "query_p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3)
+                }
+                results.append(row)
+                print(" | ".join(f"{key}={value}" for key, value in row.items()))
+            embeddings.save()
+    return results
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part]
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep chunking, top-k and index type against the golden question set")
+    parser.add_argument("docs", nargs="*", help="documents the golden set refers to (default: preloaded_docs/*.pdf)")
+    parser.add_argument("--golden", default=GOLDEN_SET)
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[500, 1000, 1500, 2000])
+    parser.add_argument("--overlaps", type=_int_list, default=[0, 150, 300])
+    parser.add_argument("--k", type=_int_list, default=[3, 6, 10])
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--backend", choices=("gemini", "fake"), default="gemini", help="fake uses offline hashed bag-of-words vectors")
+    parser.add_argument("--check-only", action="store_true", help="only verify every evidence phrase still occurs in its document")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/eval_<timestamp>.json)")
+    args = parser.parse_args()
+
+    # The offline backend needs no key; utils reads it on import
+    if args.backend == "fake":
+        os.environ.setdefault("GOOGLE_API_KEY", "offline-evaluation")
+    os.environ["METRICS_LOG_FILE"] = ""
+    import utils
+
+    paths = args.docs or sorted(glob.glob(os.path.join(utils.get_preloaded_docs_path(), "*.pdf")))
+    golden = load_golden_set(args.golden)
+    pages = [page for path in paths for page in utils.load_document(path)]
+
+    missing = check_golden_set(golden, pages)
+    for question_id, passage in missing:
+        print(f"{question_id}: evidence not found in its document: {passage!r}")
+    print(f"Golden set: {len(golden)} questions, {len(missing)} missing evidence phrases")
+    if args.check_only or missing:
+        raise SystemExit(1 if missing else 0)
+
+    if args.backend == "fake":
+        from fake_backends import FakeEmbeddings
+        embeddings = CachedEmbeddings(FakeEmbeddings(), "fake")
+    else:
+        embeddings = CachedEmbeddings(utils.get_embeddings(), "embedding-001")
+
+    started_at = datetime.datetime.now()
+    results = evaluate(
+        golden, pages, embeddings,
+        args.chunk_sizes, args.overlaps, sorted(args.k),
+        [index_type for index_type in args.index_types.split(",") if index_type]
+    )
+
+    k = max(args.k)
+    print(f"\nBy recall@{k}, then MRR and query latency:")
+    for row in sorted(results, key=lambda row: (-row[f"recall@{k}"], -row[f"mrr@{k}"], row["query_p50_ms"]))[:10]:
+        print(f"  {row['chunk_size']}/{row['overlap']} {row['index']}: recall@{k} {row[f'recall@{k}']}, "
+              f"MRR {row[f'mrr@{k}']}, {row['index_bytes'] / 1e6:.1f} MB, {row['query_p50_ms']} ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"eval_{started_at:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "golden_set": args.golden,
+            "questions": len(golden),
+            "docs": paths,
+            "results": results
+        }, f, indent=4)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
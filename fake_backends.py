@@ -0,0 +1,77 @@
+import re
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from usage_store import estimate_tokens
+
+# Offline stand-ins for the Gemini embedding and chat models, for benchmarks and evaluation runs.
+# Both are deterministic, so two runs over the same documents retrieve and answer identically.
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors, so chunks sharing terms with a query still rank above unrelated ones.
+
+    Latency is simulated per call and per text to mimic the remote API.
+    """
+
+    def __init__(self, dimensions=768, call_latency=0.0, text_latency=0.0):
+        self.dimensions = dimensions
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            bucket = zlib.crc32(token.encode("utf-8"))
+            vector[bucket % self.dimensions] += 1.0 if bucket & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _wait(self, count):
+        delay = self.call_latency + self.text_latency * count
+        if delay:
+            time.sleep(delay)
+
+    def embed_documents(self, texts, **kwargs):
+        self._wait(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text, **kwargs):
+        self._wait(1)
+        return self._embed(text)
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers with the opening of the prompt's question after a simulated generation delay"""
+
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    completion_tokens: int = 200
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(message.content) for message in messages)
+        delay = self.first_token_latency + self.token_latency * self.completion_tokens
+        if delay:
+            time.sleep(delay)
+        question = prompt.rsplit("Question:", 1)[-1].strip().splitlines()[0] if "Question:" in prompt else prompt[:200]
+        content = f"Offline answer ({zlib.crc32(prompt.encode('utf-8')):08x}) to: {question}"
+        input_tokens = estimate_tokens(prompt)
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": self.completion_tokens,
+                "total_tokens": input_tokens + self.completion_tokens
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,87 @@
+import sqlite3
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+from metrics import timer, increment
+from usage_store import estimate_tokens, record_usage, current_prompt_sources
+
+# Wrappers that instrument the embedding and chat model clients. They need LangChain, so they live apart
+# from metrics and usage_store, which the login page imports and which must stay light.
+
+class TimedEmbeddings(Embeddings):
+    """Embeddings wrapper that times every batch and query embedding call"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts, **kwargs):
+        with timer("embed", kind="documents"):
+            vectors = self.embeddings.embed_documents(texts, **kwargs)
+        increment("embedded_texts", len(texts))
+        return vectors
+
+    def embed_query(self, text, **kwargs):
+        with timer("embed", kind="query"):
+            return self.embeddings.embed_query(text, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Meter every chat model response under an operation name, splitting answer context by source"""
+
+    def __init__(self, operation, model):
+        self.operation = operation
+        self.model = model
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens = usage.get("input_tokens") or 0
+                context_tokens = {}
+                sources = current_prompt_sources()
+                if sources and input_tokens:
+                    chars_by_source, prompt_chars = sources
+                    context_tokens = {
+                        source: round(input_tokens * chars / prompt_chars)
+                        for source, chars in chars_by_source.items()
+                        if prompt_chars
+                    }
+                try:
+                    record_usage(
+                        self.operation,
+                        self.model,
+                        prompt_tokens=max(0, input_tokens - sum(context_tokens.values())),
+                        completion_tokens=usage.get("output_tokens") or 0,
+                        context_tokens_by_source=context_tokens
+                    )
+                except sqlite3.Error as e:
+                    print(f"Error recording token usage: {e}")
+
+class MeteredEmbeddings(Embeddings):
+    """Embeddings wrapper that meters estimated input tokens; the embedding API reports no usage"""
+
+    def __init__(self, embeddings, model):
+        self.embeddings = embeddings
+        self.model = model
+
+    def _record(self, operation, texts):
+        try:
+            record_usage(operation, self.model, prompt_tokens=sum(estimate_tokens(text) for text in texts))
+        except sqlite3.Error as e:
+            print(f"Error recording token usage: {e}")
+
+    def embed_documents(self, texts, **kwargs):
+        vectors = self.embeddings.embed_documents(texts, **kwargs)
+        self._record("embed_documents", texts)
+        return vectors
+
+    def embed_query(self, text, **kwargs):
+        vector = self.embeddings.embed_query(text, **kwargs)
+        self._record("embed_query", [text])
+        return vector
+
+    def __getattr__(self, name):
+        return getattr(self.embeddings, name)
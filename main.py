@@ -1,17 +1,34 @@
 import streamlit as st
 import os
 import datetime
+from user_store import is_valid_username
+from metrics import render_prometheus, stage_summary
+from usage_store import usage_context, budget_status, usage_report
+from scrape_storage import (
+    count_items,
+    query_items,
+    get_latest_item_date,
+    render_markdown,
+    group_by_date,
+    load_scrape_status
+)
 from utils import (
     verify_user,
     register_user,
     get_conversational_agent,
+    get_general_agent,
     get_combined_conversational_agent,
     process_and_store_docs,
     process_and_store_single_doc,
-    load_vector_store,
+    process_and_store_urls,
+    load_user_vector_store,
+    prefetch_user_vector_store,
     load_global_vector_store,
+    load_regulatory_vector_store,
     create_global_knowledge_base,
     check_global_knowledge_base_status,
+    get_global_vector_store_path,
+    load_dedup_report,
     list_preloaded_documents,
     get_user_uploaded_document,
     has_user_uploaded_document,
@@ -20,13 +37,25 @@ from utils import (
     load_chat_history,
     list_past_chats,
     delete_chat_history,
-    extract_pdf_content,
-    extract_docx_content,
-    get_scraped_data_files,
-    read_scraped_data_file,
-    get_website_full_name
+    get_page_count,
+    get_page_range,
+    get_file_bytes,
+    get_user_web_source_urls,
+    rebuild_web_index,
+    load_web_snapshot,
+    get_web_snapshot,
+    refresh_web_document,
+    get_scraped_websites,
+    get_scraped_update_count,
+    get_scraper,
+    get_website_full_name,
+    get_suggested_questions,
+    get_summary_trees,
+    get_tables,
+    get_query_service_url,
+    RemoteRetrievalQA,
+    is_admin
 )
-from langchain_core.messages import AIMessage, HumanMessage
 
 st.set_page_config(page_title="APMH ChatBot", layout="wide", page_icon="🤖")
 
@@ -52,6 +81,12 @@ if "suggested_questions" not in st.session_state:
     st.session_state.suggested_questions = []
 if "pending_question" not in st.session_state:
     st.session_state.pending_question = None
+if "last_sources" not in st.session_state:
+    st.session_state.last_sources = []
+if "last_timings" not in st.session_state:
+    st.session_state.last_timings = []
+if "last_answer_mode" not in st.session_state:
+    st.session_state.last_answer_mode = None
 
 def show_login_page():
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -76,6 +111,7 @@ def show_login_page():
 
         if st.button("Login"):
             if verify_user(username, password):
+                prefetch_user_vector_store(username)
                 st.session_state.logged_in = True
                 st.session_state.username = username
                 st.session_state.agent_executor = None
@@ -92,13 +128,98 @@ def show_login_page():
         new_password = st.text_input("Password", type='password')
 
         if st.button("Register"):
-            if register_user(new_user, new_password):
+            if not is_valid_username(new_user):
+                st.error("Usernames may only contain letters, digits, '-' and '_'.")
+            elif register_user(new_user, new_password):
                 st.success("You have successfully created an account!")
                 st.info("Go to the Login Menu to login")
             else:
                 st.error("Username already exists.")
 
+def show_paginated_document(file_path, key_prefix, label):
+    try:
+        with st.spinner("Extracting content..."):
+            page_count = get_page_count(file_path)
+    except Exception as e:
+        st.error(f"Could not extract content: {str(e)}")
+        return False
+    if page_count == 0:
+        st.warning("⚠️ No text could be extracted from this document.")
+        return False
+    
+    page_key = f"{key_prefix}_page"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        page = st.number_input(f"Page (1-{page_count})", min_value=1, max_value=page_count, key=page_key)
+    with col2:
+        pages_per_view = st.selectbox("Pages per view", [1, 5, 10, 25], index=1, key=f"{key_prefix}_per_view")
+    
+    start_page = int(page) - 1
+    pages = get_page_range(file_path, start_page, start_page + pages_per_view)
+    content = "\n\n".join(
+        f"--- Page {start_page + offset + 1} ---\n{text}" for offset, text in enumerate(pages)
+    )
+    st.text_area(label, content, height=500, key=f"{key_prefix}_content")
+    st.info(f"📄 Showing pages {start_page + 1}-{start_page + len(pages)} of {page_count}")
+    return True
+
+def open_source_document(doc):
+    source_file = doc.metadata.get("source_file")
+    page = doc.metadata.get("page")
+    if doc.metadata.get("retrieval_source") == "preloaded_docs":
+        st.session_state.viewing_kb_file = source_file
+        page_key = f"kb_{source_file}_page"
+    else:
+        st.session_state.viewing_file = source_file
+        page_key = f"file_{source_file}_page"
+    if isinstance(page, int):
+        st.session_state[page_key] = page + 1
+
+def show_source_links(docs):
+    page_docs = [doc for doc in docs if isinstance(doc.metadata.get("page"), int) and doc.metadata.get("source_file")]
+    if not page_docs:
+        return
+    with st.expander("📑 Sources", expanded=False):
+        for i, doc in enumerate(page_docs):
+            label = f"📄 {doc.metadata['source_file']} — page {doc.metadata['page'] + 1}"
+            if st.button(label, key=f"source_link_{i}", use_container_width=True):
+                open_source_document(doc)
+                st.rerun()
+
+def show_timing_breakdown(timings):
+    if not timings or not is_admin(st.session_state.username):
+        return
+    with st.expander("⏱️ Timing breakdown", expanded=False):
+        for timing in timings:
+            labels = ", ".join(f"{key}={value}" for key, value in timing.items() if key not in ("stage", "seconds"))
+            st.markdown(f"- **{timing['stage']}**" + (f" ({labels})" if labels else "") + f": {timing['seconds'] * 1000:.0f} ms")
+
+def show_answer_mode(mode):
+    if mode == "economy":
+        st.info("💰 You have reached your usage budget, so answers use a shorter context until it resets.")
+    elif mode == "cached":
+        st.info("💰 You have reached your usage budget, so this is your earlier answer to the same question.")
+
+def show_usage(username):
+    with st.expander("💰 Usage", expanded=False):
+        status = budget_status(username)
+        daily = f" of ${status['daily_budget_usd']:.2f}" if status["daily_budget_usd"] is not None else ""
+        monthly = f" of ${status['monthly_budget_usd']:.2f}" if status["monthly_budget_usd"] is not None else ""
+        st.markdown(f"**Today:** ${status['daily_spent_usd']:.4f}{daily}")
+        st.markdown(f"**This month:** ${status['monthly_spent_usd']:.4f}{monthly}")
+        if status["exceeded"]:
+            st.warning("Budget reached: answers use economy mode")
+        if is_admin(username):
+            report = usage_report(days=30, group_by=("username", "operation"))
+            if report:
+                st.markdown("**All users, last 30 days:**")
+                st.dataframe(report, use_container_width=True, hide_index=True)
+
 def show_chat_page():
+    from langchain_core.messages import AIMessage, HumanMessage
     user_dir = os.path.join("user_data", st.session_state.username)
     vector_store_path = os.path.join(user_dir, "faiss_index")
 
@@ -115,6 +236,9 @@ def show_chat_page():
             new_chat_id = f"chat_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
             st.session_state.current_chat_id = new_chat_id
             st.session_state.chat_history = []
+            st.session_state.last_sources = []
+            st.session_state.last_timings = []
+            st.session_state.last_answer_mode = None
             st.session_state.viewing_file = None
             st.session_state.viewing_scraped_data = None
             st.session_state.selected_website = None
@@ -147,7 +271,7 @@ def show_chat_page():
             with st.expander("📄 Document Sources", expanded=True):
                 st.markdown("**Upload documents for analysis**")
                 
-                source_type = st.radio("Choose data source:", ("📄 Upload Document", "🌐 Web URL"))
+                source_type = st.radio("Choose data source:", ("📄 Upload Document", "🌐 Web URL", "🔗 Bulk URLs"))
                 
                 if source_type == "📄 Upload Document":
                     st.markdown("*Supported: PDFs, Word documents, text files, CSV files*")
@@ -159,6 +283,36 @@ def show_chat_page():
                         st.success(f"✅ Document '{uploaded_file.name}' uploaded successfully!")
                         st.info("📁 Go to 'Current Document' section below to build the FAISS index.")
                         st.rerun()
+                elif source_type == "🔗 Bulk URLs":
+                    st.markdown("*One URL per line, e.g. a list of circulars*")
+                    bulk_input = st.text_area("Enter web URLs", height=150)
+                    if bulk_input and st.button("📥 Download and index all"):
+                        progress_bar = st.progress(0)
+                        status_text = st.empty()
+                        
+                        def update_progress(done, total, result):
+                            progress_bar.progress(done / total)
+                            status_text.text(f"{'✅' if result['status'] == 'ok' else '❌'} [{done}/{total}] {result['url']}")
+                        
+                        try:
+                            report = process_and_store_urls(
+                                st.session_state.username,
+                                bulk_input.splitlines(),
+                                progress_callback=update_progress
+                            )
+                            st.success(f"✅ Indexed {report['fetched']} of {report['urls']} URLs ({report['chunks']} chunks) at {report['pages_per_second']} pages/s")
+                            if report["fetched"] > 0:
+                                # A partial batch still replaced the index, so the agent has to pick it up
+                                st.session_state.agent_executor = None
+                            failed = [result for result in report["statuses"] if result["status"] != "ok"]
+                            if failed:
+                                with st.expander(f"⚠️ {len(failed)} URLs failed", expanded=True):
+                                    for result in failed:
+                                        st.text(f"{result['url']}: {result['error']}")
+                            else:
+                                st.rerun()
+                        except Exception as e:
+                            st.error(f"Error processing URLs: {str(e)}")
                 else:
                     st.markdown("*Examples: Web pages, articles, online documents*")
                     url_input = st.text_input("Enter web URL")
@@ -365,7 +519,7 @@ def show_chat_page():
                             st.text(f"🕒 Created: {creation_date}")
                             
                             try:
-                                vector_store = load_vector_store(vector_store_path)
+                                vector_store = load_user_vector_store(st.session_state.username)
                                 if vector_store:
                                     st.info("🤖 **Index is loaded and ready for chat**")
                                 else:
@@ -385,20 +539,11 @@ def show_chat_page():
                         with st.spinner("Building FAISS index..."):
                             try:
                                 if "(Web Content)" in current_doc:
-                                    url_files = [f for f in os.listdir(user_dir) if f.endswith('.url')]
-                                    if url_files:
-                                        marker_file_path = os.path.join(user_dir, url_files[0])
-                                        with open(marker_file_path, 'r') as f:
-                                            content = f.read()
-                                            url_line = [line for line in content.split('\n') if line.startswith('Source URL:')]
-                                            if url_line:
-                                                source_url = url_line[0].replace('Source URL:', '').strip()
-                                                process_and_store_docs(st.session_state.username, source_url)
-                                            else:
-                                                st.error("❌ Could not find source URL in marker file!")
-                                                return
+                                    if get_user_web_source_urls(st.session_state.username):
+                                        # Rebuild from the stored snapshots instead of re-downloading the pages
+                                        rebuild_web_index(st.session_state.username, revalidate=False)
                                     else:
-                                        st.error("❌ Could not find URL marker file!")
+                                        st.error("❌ Could not find source URL in marker file!")
                                         return
                                 else:
                                     file_path = os.path.join(user_dir, current_doc)
@@ -437,6 +582,9 @@ def show_chat_page():
                         st.rerun()
                 else:
                     st.info("📊 Knowledge base is ready and integrated")
+                    dedup_report = load_dedup_report(get_global_vector_store_path())
+                    if dedup_report:
+                        st.caption(f"🧹 {dedup_report['duplicates']} of {dedup_report['chunks']} chunks deduplicated ({dedup_report['dedup_ratio']:.1%}) in the last build")
                     if st.button("🔄 Rebuild Knowledge Base", use_container_width=True):
                         with st.spinner("Rebuilding global knowledge base..."):
                             create_global_knowledge_base()
@@ -447,19 +595,44 @@ def show_chat_page():
                 st.warning("⚠️ No preloaded documents found")
                 st.info("Place PDF files in the 'preloaded_docs' folder to create a knowledge base")
 
-        with st.expander("🏦 RBI Updates", expanded=False):
-            st.markdown("**Latest updates from Reserve Bank of India**")
-            files = get_scraped_data_files("RBI")
-            
-            if files:
-                if st.button(f"📋 RBI ({len(files)} updates)", key="website_RBI", use_container_width=True):
-                    st.session_state.selected_website = "RBI"
-                    st.session_state.viewing_scraped_data = True
-                    st.session_state.current_chat_id = None
-                    st.session_state.viewing_file = None
-                    st.rerun()
-            else:
-                st.text("📋 RBI (No updates)")
+        with st.expander("🏦 Regulatory Updates", expanded=False):
+            st.markdown("**Latest updates from government websites**")
+            scrape_status = load_scrape_status()["sites"]
+            for website in get_scraped_websites():
+                update_count = get_scraped_update_count(website)
+                site_status = scrape_status.get(website)
+                
+                if update_count:
+                    if st.button(f"📋 {website} ({update_count} updates)", key=f"website_{website}", use_container_width=True):
+                        st.session_state.selected_website = website
+                        st.session_state.viewing_scraped_data = True
+                        st.session_state.current_chat_id = None
+                        st.session_state.viewing_file = None
+                        st.rerun()
+                else:
+                    st.text(f"📋 {website} (No updates)")
+                
+                if site_status:
+                    last_run = datetime.datetime.fromisoformat(site_status["last_run_at"])
+                    st.caption(
+                        f"Last run {last_run.strftime('%b %d, %H:%M')} · {site_status['last_status']} · "
+                        f"{site_status['last_new']} new · {site_status['last_seconds']}s · "
+                        f"{site_status['failures']}/{site_status['runs']} runs failed"
+                        + (f" · next {site_status['next_run_at'][5:16].replace('T', ' ')}" if site_status.get("next_run_at") else "")
+                    )
+                    if site_status["last_status"] == "error":
+                        st.warning(f"⚠️ {website} scrape failing: {site_status.get('last_error')}")
+
+        show_usage(st.session_state.username)
+
+        if is_admin(st.session_state.username):
+            with st.expander("📈 Stage Latency", expanded=False):
+                summary = stage_summary()
+                if summary:
+                    st.dataframe(summary, use_container_width=True, hide_index=True)
+                    st.download_button("Download Prometheus metrics", render_prometheus(), file_name="metrics.prom", mime="text/plain", use_container_width=True)
+                else:
+                    st.caption("No stages timed in this session yet")
 
         if st.session_state.current_chat_id and st.session_state.suggested_questions:
             with st.expander("💡 Suggested Questions", expanded=False):
@@ -467,7 +640,7 @@ def show_chat_page():
                 
                 for i, question in enumerate(st.session_state.suggested_questions[-6:]):
                     if st.button(f"💬 {question}", key=f"sidebar_suggestion_{i}", use_container_width=True):
-                        st.session_state.chat_history.append(HumanMessage(content=question))
+                        st.session_state.pending_question = question
                         st.rerun()
                 
                 if len(st.session_state.suggested_questions) > 6:
@@ -494,23 +667,14 @@ def show_chat_page():
         
         try:
             if st.session_state.viewing_kb_file.endswith('.pdf'):
-                with open(kb_file_path, "rb") as pdf_file:
-                    pdf_bytes = pdf_file.read()
-                
                 st.download_button(
                     label="📥 Download PDF",
-                    data=pdf_bytes,
+                    data=get_file_bytes(kb_file_path),
                     file_name=st.session_state.viewing_kb_file,
                     mime="application/pdf"
                 )
                 
-                with st.spinner("Extracting PDF content..."):
-                    content = extract_pdf_content(kb_file_path)
-                if content and not content.startswith("Error"):
-                    st.text_area("PDF Content:", content, height=500)
-                    st.info(f"📄 Knowledge base PDF content extracted successfully. {len(content.split())} words found.")
-                else:
-                    st.error(content if content.startswith("Error") else "Could not extract content from PDF")
+                if not show_paginated_document(kb_file_path, f"kb_{st.session_state.viewing_kb_file}", "PDF Content:"):
                     st.info("📄 This PDF is part of the global knowledge base and is indexed for analysis. Use the chat feature to ask questions about this document.")
             else:
                 st.error("Only PDF files are supported in the knowledge base.")
@@ -532,40 +696,40 @@ def show_chat_page():
         
         if "(Web Content)" in st.session_state.viewing_file:
             try:
-                url_files = [f for f in os.listdir(user_dir) if f.endswith('.url')]
-                if url_files:
-                    marker_file_path = os.path.join(user_dir, url_files[0])
-                    with open(marker_file_path, 'r') as f:
-                        marker_content = f.read()
-                        url_line = [line for line in marker_content.split('\n') if line.startswith('Source URL:')]
-                        if url_line:
-                            source_url = url_line[0].replace('Source URL:', '').strip()
-                            
-                            st.info(f"🌐 **Web Content Source**: {source_url}")
-                            
-                            with st.spinner("Fetching web content..."):
-                                try:
-                                    from langchain_community.document_loaders import WebBaseLoader
-                                    loader = WebBaseLoader(source_url)
-                                    docs = loader.load()
-                                    
-                                    if docs:
-                                        content = docs[0].page_content
-                                        st.text_area("Web Content:", content, height=500)
-                                        st.info(f"🌐 Web content fetched successfully. {len(content.split())} words found.")
-                                        
-                                        if docs[0].metadata:
-                                            with st.expander("📋 Content Metadata", expanded=False):
-                                                for key, value in docs[0].metadata.items():
-                                                    st.text(f"**{key}**: {value}")
-                                    else:
-                                        st.warning("⚠️ No content could be extracted from the web page.")
-                                        
-                                except Exception as e:
-                                    st.error(f"❌ Error fetching web content: {str(e)}")
-                                    st.info("💬 The web content has been processed and indexed for chat. Use the chat feature to ask questions about this content.")
-                        else:
-                            st.error("❌ Could not find source URL in marker file.")
+                source_urls = get_user_web_source_urls(st.session_state.username)
+                if source_urls:
+                    if len(source_urls) > 1:
+                        source_url = st.selectbox(f"🌐 **Web Content Sources** ({len(source_urls)} pages)", source_urls)
+                    else:
+                        source_url = source_urls[0]
+                        st.info(f"🌐 **Web Content Source**: {source_url}")
+                    
+                    snapshot = load_web_snapshot(source_url)
+                    if snapshot is None:
+                        with st.spinner("Fetching web content..."):
+                            snapshot = get_web_snapshot(source_url)
+                    
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        st.caption(f"Snapshot fetched {snapshot.get('fetched_at', 'unknown')}, last checked {snapshot.get('validated_at', 'unknown')}")
+                    with col2:
+                        if st.button("🔄 Check for updates", use_container_width=True):
+                            with st.spinner("Checking web page for changes..."):
+                                result = refresh_web_document(st.session_state.username)
+                            if result["changed"]:
+                                st.session_state.agent_executor = None
+                                st.success(f"✅ {len(result['changed_urls'])} of {len(result['urls'])} pages changed; index rebuilt from the new content.")
+                            else:
+                                st.info("ℹ️ Pages unchanged since the last snapshot.")
+                    
+                    content = snapshot["content"]
+                    st.text_area("Web Content:", content, height=500)
+                    st.info(f"🌐 Web content loaded from snapshot. {len(content.split())} words found.")
+                    
+                    if snapshot.get("metadata"):
+                        with st.expander("📋 Content Metadata", expanded=False):
+                            for key, value in snapshot["metadata"].items():
+                                st.text(f"**{key}**: {value}")
                 else:
                     st.error("❌ Could not find web content marker file.")
                     
@@ -588,33 +752,18 @@ def show_chat_page():
                     st.info(f"📊 CSV file with {len(df)} rows and {len(df.columns)} columns")
                     
                 elif st.session_state.viewing_file.endswith('.pdf'):
-                    with open(file_path, "rb") as pdf_file:
-                        pdf_bytes = pdf_file.read()
-                    
                     st.download_button(
                         label="📥 Download PDF",
-                        data=pdf_bytes,
+                        data=get_file_bytes(file_path),
                         file_name=st.session_state.viewing_file,
                         mime="application/pdf"
                     )
                     
-                    with st.spinner("Extracting PDF content..."):
-                        content = extract_pdf_content(file_path)
-                    if content and not content.startswith("Error"):
-                        st.text_area("PDF Content:", content, height=500)
-                        st.info(f"📄 PDF content extracted successfully. {len(content.split())} words found.")
-                    else:
-                        st.error(content if content.startswith("Error") else "Could not extract content from PDF")
+                    if not show_paginated_document(file_path, f"file_{st.session_state.viewing_file}", "PDF Content:"):
                         st.info("📄 PDF files are processed and indexed for analysis. Use the chat feature to ask questions about this document.")
                     
                 elif st.session_state.viewing_file.endswith('.docx'):
-                    with st.spinner("Extracting Word document content..."):
-                        content = extract_docx_content(file_path)
-                    if content and not content.startswith("Error"):
-                        st.text_area("Document Content:", content, height=500)
-                        st.info(f"📝 Word document content extracted successfully. {len(content.split())} words found.")
-                    else:
-                        st.error(content if content.startswith("Error") else "Could not extract content from Word document")
+                    if not show_paginated_document(file_path, f"file_{st.session_state.viewing_file}", "Document Content:"):
                         st.info("📝 Word documents are processed and indexed for analysis. Use the chat feature to ask questions about this document.")
                     
             except Exception as e:
@@ -636,43 +785,47 @@ def show_chat_page():
         
         st.divider()
         
-        files = get_scraped_data_files(website)
+        latest_date = get_latest_item_date(website)
         
-        if files:
+        if latest_date:
             st.markdown(f"**Latest updates from {full_name}:**")
             
-            if len(files) == 1:
-                file_name = files[0]
-                content = read_scraped_data_file(website, file_name)
-                
-                st.markdown(f"#### 📄 {file_name}")
-                
-                if file_name.endswith('.md'):
-                    st.markdown(content, unsafe_allow_html=True)
-                    st.info(f"📊 Markdown document contains {len(content.split())} words")
-                elif file_name.endswith('.html'):
-                    st.components.v1.html(content, height=600, scrolling=True)
-                    st.info(f"📊 HTML document contains {len(content.split())} words")
-                else:
-                    st.text_area("Content:", content, height=500)
-                    st.info(f"📊 Document contains {len(content.split())} words")
+            col1, col2 = st.columns(2)
+            with col1:
+                start_date = st.date_input("From", value=latest_date - datetime.timedelta(days=30), key=f"scraped_start_{website}")
+            with col2:
+                end_date = st.date_input("To", value=latest_date, key=f"scraped_end_{website}")
+            
+            page_size = 25
+            total = count_items(website, start_date, end_date)
+            page_count = max(1, (total + page_size - 1) // page_size)
+            page_key = f"scraped_page_{website}"
+            if st.session_state.get(page_key, 1) > page_count:
+                st.session_state[page_key] = 1
+            page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key=page_key) if page_count > 1 else 1
+            
+            items = query_items(website, start_date, end_date, limit=page_size, offset=(page - 1) * page_size)
+            for date_str, date_items in group_by_date(items):
+                st.markdown(f"#### 📅 {date_str}")
+                for item in date_items:
+                    st.markdown(f"- [{item['title']}]({item['url']})")
+            
+            if items:
+                st.caption(f"Showing {(page - 1) * page_size + 1}–{(page - 1) * page_size + len(items)} of {total} updates")
+                if st.button("📤 Export range as Markdown", key=f"scraped_export_{website}"):
+                    site = get_scraper(website)
+                    export_items = query_items(website, start_date, end_date, limit=total)
+                    label = f"{start_date.strftime('%b %d, %Y')} to {end_date.strftime('%b %d, %Y')}"
+                    markdown = render_markdown(site.title if site else website, full_name, site.base_url if site else "", export_items, label)
+                    st.download_button(
+                        "⬇️ Download",
+                        markdown,
+                        file_name=f"{website.lower()}_news_{start_date.isoformat()}_{end_date.isoformat()}.md",
+                        mime="text/markdown",
+                        key=f"scraped_download_{website}"
+                    )
             else:
-                tab_names = [f"📄 {file_name}" for file_name in files]
-                tabs = st.tabs(tab_names)
-                
-                for i, (tab, file_name) in enumerate(zip(tabs, files)):
-                    with tab:
-                        content = read_scraped_data_file(website, file_name)
-                        
-                        if file_name.endswith('.md'):
-                            st.markdown(content, unsafe_allow_html=True)
-                            st.info(f"📊 Markdown document contains {len(content.split())} words")
-                        elif file_name.endswith('.html'):
-                            st.components.v1.html(content, height=600, scrolling=True)
-                            st.info(f"📊 HTML document contains {len(content.split())} words")
-                        else:
-                            st.text_area("Content:", content, height=400, key=f"scraped_{website}_{i}")
-                            st.info(f"📊 Document contains {len(content.split())} words")
+                st.info("No updates in this date range")
         else:
             st.info(f"No updates available for {full_name}")
         return
@@ -700,12 +853,17 @@ def show_chat_page():
         """)
         return
 
+    query_service_url = get_query_service_url()
+    if st.session_state.agent_executor is None and query_service_url:
+        st.session_state.agent_executor = RemoteRetrievalQA(query_service_url, st.session_state.username)
+        st.session_state.suggested_questions = get_suggested_questions(st.session_state.username)
+
     if st.session_state.agent_executor is None:
         with st.spinner("Loading AI agent..."):
             user_vector_store = None
             if has_documents and has_faiss_index:
                 try:
-                    user_vector_store = load_vector_store(vector_store_path)
+                    user_vector_store = load_user_vector_store(st.session_state.username)
                     if user_vector_store is None:
                         st.error("❌ Failed to load vector store. Please rebuild the index.")
                 except Exception as e:
@@ -713,31 +871,43 @@ def show_chat_page():
                     st.info("💡 Try rebuilding the index from the 'Current Document' section.")
             
             global_vector_store = load_global_vector_store()
+            regulatory_vector_store = load_regulatory_vector_store()
+            st.session_state.suggested_questions = get_suggested_questions(st.session_state.username)
+            summary_trees = get_summary_trees(st.session_state.username)
+            tables = get_tables(st.session_state.username)
             
             if user_vector_store and global_vector_store:
                 st.session_state.agent_executor = get_combined_conversational_agent(
                     user_vector_store, 
                     global_vector_store, 
-                    "user documents and global knowledge base"
+                    "user documents and global knowledge base",
+                    summary_trees=summary_trees,
+                    tables=tables,
+                    regulatory_vector_store=regulatory_vector_store,
+                    username=st.session_state.username
                 )
                 st.info("🔗 AI agent loaded with access to your documents and global knowledge base")
             elif user_vector_store:
                 st.session_state.agent_executor = get_conversational_agent(
                     user_vector_store, 
-                    "the provided document or web page"
+                    "the provided document or web page",
+                    summary_trees=summary_trees,
+                    tables=tables,
+                    username=st.session_state.username
                 )
                 st.info("📄 AI agent loaded with access to your documents only")
             elif global_vector_store:
                 st.session_state.agent_executor = get_combined_conversational_agent(
                     None, 
                     global_vector_store, 
-                    "global knowledge base"
+                    "global knowledge base",
+                    summary_trees=summary_trees,
+                    tables=tables,
+                    regulatory_vector_store=regulatory_vector_store
                 )
                 st.info("📚 AI agent loaded with access to global knowledge base only")
             else:
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.7)
-                st.session_state.agent_executor = llm
+                st.session_state.agent_executor = get_general_agent()
                 st.warning("⚠️ No documents or knowledge base available. AI will provide general assistance only.")
 
     elif st.session_state.current_chat_id:
@@ -751,17 +921,23 @@ def show_chat_page():
                 st.markdown(user_query)
             
             with st.chat_message("AI"):
-                with st.spinner("Thinking..."):
+                with st.spinner("Thinking..."), usage_context(st.session_state.username, st.session_state.current_chat_id):
+                    st.session_state.last_answer_mode = None
                     try:
                         if hasattr(st.session_state.agent_executor, 'invoke') and hasattr(st.session_state.agent_executor, 'retrieval_fn'):
                             response = st.session_state.agent_executor.invoke({"query": user_query})
                             answer = response["result"]
+                            st.session_state.last_sources = response.get("source_documents", [])
+                            st.session_state.last_timings = response.get("timings", [])
+                            st.session_state.last_answer_mode = response.get("mode")
                         elif hasattr(st.session_state.agent_executor, 'invoke') and not hasattr(st.session_state.agent_executor, 'retrieval_fn'):
                             response = st.session_state.agent_executor.invoke({
                                 "input": user_query,
                                 "chat_history": st.session_state.chat_history
                             })
                             answer = response.get("output", response.get("result", "I couldn't process your question."))
+                            st.session_state.last_timings = response.get("timings", [])
+                            st.session_state.last_answer_mode = response.get("mode")
                         else:
                             response = st.session_state.agent_executor.invoke(user_query)
                             answer = response.content
@@ -790,23 +966,33 @@ def show_chat_page():
             with st.chat_message(role):
                 st.markdown(message.content)
 
+        show_source_links(st.session_state.last_sources)
+        show_answer_mode(st.session_state.last_answer_mode)
+        show_timing_breakdown(st.session_state.last_timings)
+
         if user_query := st.chat_input("Ask questions about your documents or the knowledge base..."):
             st.session_state.chat_history.append(HumanMessage(content=user_query))
             with st.chat_message("Human"):
                 st.markdown(user_query)
 
             with st.chat_message("AI"):
-                with st.spinner("Thinking..."):
+                with st.spinner("Thinking..."), usage_context(st.session_state.username, st.session_state.current_chat_id):
+                    st.session_state.last_answer_mode = None
                     try:
                         if hasattr(st.session_state.agent_executor, 'invoke') and hasattr(st.session_state.agent_executor, 'retrieval_fn'):
                             response = st.session_state.agent_executor.invoke({"query": user_query})
                             answer = response["result"]
+                            st.session_state.last_sources = response.get("source_documents", [])
+                            st.session_state.last_timings = response.get("timings", [])
+                            st.session_state.last_answer_mode = response.get("mode")
                         elif hasattr(st.session_state.agent_executor, 'invoke') and not hasattr(st.session_state.agent_executor, 'retrieval_fn'):
                             response = st.session_state.agent_executor.invoke({
                                 "input": user_query,
                                 "chat_history": st.session_state.chat_history
                             })
                             answer = response.get("output", response.get("result", "I couldn't process your question."))
+                            st.session_state.last_timings = response.get("timings", [])
+                            st.session_state.last_answer_mode = response.get("mode")
                         else:
                             response = st.session_state.agent_executor.invoke(user_query)
                             answer = response.content
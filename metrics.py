@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+from contextlib import contextmanager
+
+# Stage latencies span sub-millisecond FAISS searches to multi-second Gemini calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_LOG_FILE = os.environ.get("METRICS_LOG_FILE", os.path.join("logs", "metrics.jsonl"))
+# The log rolls over at METRICS_LOG_MAX_BYTES and keeps METRICS_LOG_BACKUPS old files, so disk use stays bounded
+METRICS_LOG_MAX_BYTES = int(os.environ.get("METRICS_LOG_MAX_BYTES", 50 * 1024 * 1024))
+METRICS_LOG_BACKUPS = int(os.environ.get("METRICS_LOG_BACKUPS", 5))
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_trace = threading.local()
+_logger = None
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+def _key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("apmh.metrics")
+        logger.propagate = False
+        if METRICS_LOG_FILE:
+            os.makedirs(os.path.dirname(METRICS_LOG_FILE) or ".", exist_ok=True)
+            handler = RotatingFileHandler(
+                METRICS_LOG_FILE, maxBytes=METRICS_LOG_MAX_BYTES, backupCount=METRICS_LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        _logger = logger
+    return _logger
+
+def log_event(event, **fields):
+    """Write one structured JSON log line"""
+    _get_logger().info(json.dumps({"ts": round(time.time(), 3), "event": event, "pid": os.getpid(), **fields}, default=str))
+
+def observe(stage, seconds, **labels):
+    """Record a stage latency in its histogram, the JSON log and the current answer's trace"""
+    with _lock:
+        key = _key("stage_seconds", dict(labels, stage=stage))
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+    timings = getattr(_trace, "timings", None)
+    if timings is not None:
+        timings.append({"stage": stage, "seconds": round(seconds, 4), **labels})
+    log_event("stage", stage=stage, seconds=round(seconds, 6), **labels)
+
+def increment(name, amount=1, **labels):
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + amount
+
+@contextmanager
+def timer(stage, **labels):
+    """Time a block as one stage; failed blocks are still timed and also counted in stage_errors"""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start, **labels)
+        if status == "error":
+            increment("stage_errors", stage=stage, **labels)
+
+@contextmanager
+def collect_timings():
+    """Collect every stage timed on this thread into a list, for a per-answer breakdown"""
+    previous = getattr(_trace, "timings", None)
+    _trace.timings = timings = []
+    try:
+        yield timings
+    finally:
+        _trace.timings = previous
+        if previous is not None:
+            previous.extend(timings)
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in pairs) + "}"
+
+def render_prometheus(prefix="apmh"):
+    """All histograms and counters in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+    if histograms:
+        lines.append(f"# HELP {prefix}_stage_seconds Latency of each pipeline stage.")
+        lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+    for (name, labels), histogram in histograms:
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{prefix}_{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{prefix}_{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+        lines.append(f"{prefix}_{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+        lines.append(f"{prefix}_{name}_count{_format_labels(labels)} {histogram.count}")
+    for name in sorted({name for (name, _), _ in counters}):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        for (counter_name, labels), value in counters:
+            if counter_name == name:
+                lines.append(f"{prefix}_{name}_total{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def stage_summary():
+    """Count, mean and total seconds per stage label set, for the admin panel"""
+    with _lock:
+        return [
+            {**dict(labels), "count": histogram.count, "mean_ms": round(histogram.sum / histogram.count * 1000, 1), "total_s": round(histogram.sum, 3)}
+            for (_, labels), histogram in sorted(_histograms.items())
+            if histogram.count
+        ]
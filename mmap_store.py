@@ -0,0 +1,95 @@
+import os
+import json
+import mmap
+from collections.abc import Mapping
+
+import numpy as np
+import faiss
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "chunks.offsets.npy"
+
+# Flat indexes need IO_FLAG_MMAP_IFC to leave their vectors in the page cache; plain IO_FLAG_MMAP still copies them
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over a memory-mapped JSON-lines file, addressed by index position.
+
+    Chunks are decoded only when a search returns them, so processes share the file's page-cache pages
+    instead of each holding a deserialized copy of every chunk.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, CHUNKS_FILE), "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(f.name) else b""
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def search(self, search):
+        position = int(search)
+        if not 0 <= position < len(self):
+            return f"ID {search} not found."
+        record = json.loads(self.data[int(self.offsets[position]):int(self.offsets[position + 1])])
+        return Document(id=record.get("id"), page_content=record["page_content"], metadata=record["metadata"])
+
+class PositionalIds(Mapping):
+    """index_to_docstore_id for a store whose ids are the index positions themselves"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise KeyError(position)
+        return int(position)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+def chunk_store_is_current(path):
+    offsets_path = os.path.join(path, OFFSETS_FILE)
+    if not os.path.exists(offsets_path) or not os.path.exists(os.path.join(path, CHUNKS_FILE)):
+        return False
+    # The pickled docstore is rewritten with every index build, so an older chunk store is stale
+    pickle_path = os.path.join(path, "index.pkl")
+    return not os.path.exists(pickle_path) or os.path.getmtime(offsets_path) >= os.path.getmtime(pickle_path)
+
+def write_chunk_store(vector_store, path):
+    """Write the store's chunks in index order as JSON lines plus an offsets array"""
+    offsets = [0]
+    chunks_tmp = os.path.join(path, f"{CHUNKS_FILE}.{os.getpid()}.tmp")
+    with open(chunks_tmp, "wb") as f:
+        for position in range(vector_store.index.ntotal):
+            doc_id = vector_store.index_to_docstore_id[position]
+            doc = vector_store.docstore.search(doc_id)
+            line = json.dumps({"id": doc.id or doc_id, "page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+
+    offsets_tmp = os.path.join(path, f"chunks.offsets.{os.getpid()}.tmp.npy")
+    np.save(offsets_tmp, np.asarray(offsets, dtype=np.int64))
+    # Offsets go last: chunk_store_is_current keys on them, so a reader never pairs them with a partial chunks file
+    os.replace(chunks_tmp, os.path.join(path, CHUNKS_FILE))
+    os.replace(offsets_tmp, os.path.join(path, OFFSETS_FILE))
+    return len(offsets) - 1
+
+def load_mmap_vector_store(path, embeddings):
+    """Open a saved FAISS store with the index and chunks memory-mapped read-only"""
+    index = faiss.read_index(os.path.join(path, "index.faiss"), MMAP_FLAGS)
+    docstore = MmapDocstore(path)
+    if len(docstore) != index.ntotal:
+        raise ValueError(f"Chunk store has {len(docstore)} chunks but the index has {index.ntotal} vectors")
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=PositionalIds(index.ntotal)
+    )
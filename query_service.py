@@ -0,0 +1,219 @@
+import os
+import hmac
+import time
+import socket
+import asyncio
+import ipaddress
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import urlsplit
+
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from utils import (
+    load_user_vector_store,
+    load_global_vector_store,
+    get_global_vector_store_path,
+    load_regulatory_vector_store,
+    REGULATORY_INDEX_PATH,
+    get_combined_conversational_agent,
+    get_summary_trees,
+    get_tables,
+    process_and_store_single_doc,
+    vector_store_residency,
+)
+from usage_store import usage_context
+from scrape_storage import load_scrape_status
+from user_store import is_valid_username
+from metrics import render_prometheus
+
+# Run with several processes, e.g. `uvicorn query_service:app --workers 4`.
+# Each worker keeps its own warm indexes and LLM clients; blocking retrieval and
+# generation run in the worker's thread pool so the event loop stays free.
+
+# Clients send `Authorization: Bearer <token>`; without a configured token the data endpoints refuse every request
+QUERY_SERVICE_TOKEN = os.environ.get("QUERY_SERVICE_TOKEN")
+MAX_CACHED_AGENTS = int(os.environ.get("QUERY_SERVICE_MAX_AGENTS", "64"))
+BUILD_LOCK_STRIPES = 64
+
+class QueryRequest(BaseModel):
+    query: str
+    username: Optional[str] = None
+
+class IngestRequest(BaseModel):
+    username: str
+    source: str
+
+_cache_lock = threading.Lock()
+_regulatory_lock = threading.Lock()
+_regulatory_store = {"store": None, "mtime": None}
+_agents = OrderedDict()
+# A fixed set of locks striped by username, so the lock table does not grow with every user seen
+_build_locks = [threading.Lock() for _ in range(BUILD_LOCK_STRIPES)]
+
+def _index_mtime(index_path):
+    index_file = os.path.join(index_path, "index.faiss")
+    return os.path.getmtime(index_file) if os.path.exists(index_file) else None
+
+def _get_regulatory_vector_store():
+    # The scraper rewrites this index after every daily update
+    with _regulatory_lock:
+        mtime = _index_mtime(REGULATORY_INDEX_PATH)
+        if _regulatory_store["mtime"] != mtime:
+            _regulatory_store["store"] = load_regulatory_vector_store()
+            _regulatory_store["mtime"] = mtime
+        return _regulatory_store["store"], mtime
+
+def require_token(authorization: Optional[str] = Header(default=None)):
+    if not QUERY_SERVICE_TOKEN:
+        raise HTTPException(status_code=503, detail="QUERY_SERVICE_TOKEN is not configured")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), QUERY_SERVICE_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing bearer token", headers={"WWW-Authenticate": "Bearer"})
+
+def _check_username(username):
+    if username is not None and not is_valid_username(username):
+        raise HTTPException(status_code=400, detail="Invalid username")
+
+def _is_public_host(host):
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except (socket.gaierror, UnicodeError):
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses)
+
+def _check_source(username, source):
+    """Sources are public web pages or files already uploaded to the user's own directory"""
+    parts = urlsplit(source)
+    if parts.scheme in ("http", "https"):
+        # The service must not be usable to reach hosts on its own network
+        if not parts.hostname or not _is_public_host(parts.hostname):
+            raise HTTPException(status_code=400, detail="Source URL must point to a public host")
+        return
+    user_dir = os.path.realpath(os.path.join("user_data", username))
+    if os.path.dirname(os.path.realpath(source)) != user_dir or not os.path.isfile(source):
+        raise HTTPException(status_code=400, detail="Source must be an http(s) URL or a file in the user's upload directory")
+
+def get_agent(username=None):
+    """Return a cached agent, rebuilding it when the user or global index changed on disk"""
+    # Loading an index can take seconds, so the shared lock only guards the cache itself;
+    # a per-user lock keeps concurrent cold requests for one user from building it twice
+    global_vector_store = load_global_vector_store()
+    regulatory_vector_store, regulatory_mtime = _get_regulatory_vector_store()
+    user_mtime = _index_mtime(os.path.join("user_data", username, "faiss_index")) if username else None
+    key = (username, user_mtime, _index_mtime(get_global_vector_store_path()), regulatory_mtime)
+    
+    with _cache_lock:
+        cached = _agents.get(username)
+        if cached and cached[0] == key:
+            _agents.move_to_end(username)
+            return cached[1]
+    
+    with _build_locks[zlib.crc32((username or "").encode()) % BUILD_LOCK_STRIPES]:
+        with _cache_lock:
+            cached = _agents.get(username)
+            if cached and cached[0] == key:
+                _agents.move_to_end(username)
+                return cached[1]
+        
+        user_vector_store = load_user_vector_store(username) if user_mtime else None
+        if not user_vector_store and not global_vector_store:
+            raise HTTPException(status_code=404, detail="No index available for this user or the knowledge base")
+        
+        agent = get_combined_conversational_agent(
+            user_vector_store,
+            global_vector_store,
+            "query service",
+            summary_trees=get_summary_trees(username),
+            tables=get_tables(username),
+            regulatory_vector_store=regulatory_vector_store,
+            username=username
+        )
+        with _cache_lock:
+            _agents[username] = (key, agent)
+            _agents.move_to_end(username)
+            while len(_agents) > MAX_CACHED_AGENTS:
+                _agents.popitem(last=False)
+        return agent
+
+def _serialize_documents(docs):
+    return [
+        {"page_content": doc.page_content, "metadata": doc.metadata}
+        for doc in docs
+    ]
+
+@asynccontextmanager
+async def lifespan(app):
+    # Best effort: without any index yet the service still starts and answers 404 per request
+    try:
+        await asyncio.to_thread(get_agent)
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else e
+        print(f"Warm-up skipped: {detail}")
+    if not QUERY_SERVICE_TOKEN:
+        print("QUERY_SERVICE_TOKEN is not set; /retrieve, /answer and /ingest will refuse requests")
+    yield
+
+app = FastAPI(title="APMH Query Service", lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "cached_agents": len(_agents),
+        "pid": os.getpid(),
+        "user_index_residency": vector_store_residency.metrics(),
+        "scrapers": load_scrape_status()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Histograms live in each worker process, so with several workers a scrape sees one worker's share
+    return render_prometheus()
+
+@app.post("/retrieve", dependencies=[Depends(require_token)])
+async def retrieve(request: QueryRequest):
+    start = time.perf_counter()
+    _check_username(request.username)
+    agent = await asyncio.to_thread(get_agent, request.username)
+    with usage_context(request.username):
+        docs = await asyncio.to_thread(agent.retrieval_fn, request.query)
+    return {
+        "source_documents": _serialize_documents(docs),
+        "latency_s": round(time.perf_counter() - start, 3)
+    }
+
+@app.post("/answer", dependencies=[Depends(require_token)])
+async def answer(request: QueryRequest):
+    start = time.perf_counter()
+    _check_username(request.username)
+    agent = await asyncio.to_thread(get_agent, request.username)
+    # asyncio.to_thread copies the context, so the worker thread meters tokens to this user
+    with usage_context(request.username):
+        response = await asyncio.to_thread(agent.invoke, {"query": request.query})
+    return {
+        "result": response["result"],
+        "source_documents": _serialize_documents(response.get("source_documents", [])),
+        "usage": response.get("usage") or {},
+        "timings": response.get("timings", []),
+        "mode": response.get("mode"),
+        "latency_s": round(time.perf_counter() - start, 3)
+    }
+
+@app.post("/ingest", dependencies=[Depends(require_token)])
+async def ingest(request: IngestRequest):
+    start = time.perf_counter()
+    _check_username(request.username)
+    _check_source(request.username, request.source)
+    try:
+        await asyncio.to_thread(process_and_store_single_doc, request.username, request.source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with _cache_lock:
+        _agents.pop(request.username, None)
+    return {"status": "ok", "latency_s": round(time.perf_counter() - start, 3)}
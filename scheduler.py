@@ -0,0 +1,141 @@
+import os
+import time
+import random
+import signal
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from scrapers import SCRAPERS, scrape_site, index_new_items
+from scrape_storage import record_scrape_result
+
+# Run as a long-lived process, e.g. `python scheduler.py --interval 6h --interval RBI=2h`.
+# It replaces the external cron job; status lands in scraped_data/.state/status.json.
+
+DEFAULT_INTERVAL = float(os.environ.get("SCRAPE_INTERVAL_HOURS", "24")) * 3600
+
+def parse_duration(value):
+    """Seconds from a duration such as 90, 90s, 15m, 6h or 1d"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    value = value.strip().lower()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+class SiteSchedule:
+    """Next due time, failure count and in-flight flag for one site"""
+
+    def __init__(self, site, interval, jitter, backoff_base, backoff_max):
+        self.site = site
+        self.interval = interval
+        self.jitter = jitter
+        self.backoff_base = backoff_base
+        self.backoff_max = min(backoff_max, interval)
+        self.consecutive_failures = 0
+        self.running = False
+        # Spread the first runs so sites sharing an interval do not all start together
+        self.next_run = time.time() + random.uniform(0, jitter * interval)
+
+    def _jittered(self, delay):
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def finished(self, result):
+        self.running = False
+        if result["status"] == "error":
+            self.consecutive_failures += 1
+            delay = min(self.backoff_base * 2 ** (self.consecutive_failures - 1), self.backoff_max)
+        else:
+            self.consecutive_failures = 0
+            delay = self.interval
+        self.next_run = time.time() + self._jittered(delay)
+
+class ScrapeScheduler:
+    """Run each registered site on its own schedule with a cap on concurrent runs"""
+
+    def __init__(self, intervals=None, max_concurrent=2, jitter=0.1, backoff_base=300, backoff_max=6 * 3600, timeout=30, index_updates=True):
+        intervals = intervals or {}
+        self.schedules = {
+            code: SiteSchedule(site, intervals.get(code, intervals.get("*", DEFAULT_INTERVAL)), jitter, backoff_base, backoff_max)
+            for code, site in SCRAPERS.items()
+        }
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.index_updates = index_updates
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        # Only one thread at a time may rewrite the regulatory updates index
+        self.index_lock = threading.Lock()
+
+    def _run(self, schedule):
+        result = scrape_site(schedule.site, self.timeout)
+        if self.index_updates and result["status"] in ("ok", "unchanged"):
+            try:
+                with self.index_lock:
+                    index_new_items([result])
+            except Exception as e:
+                print(f"Error updating regulatory index for {schedule.site.code}: {e}")
+        with self.lock:
+            schedule.finished(result)
+            next_run = schedule.next_run
+            failures = schedule.consecutive_failures
+        record_scrape_result(
+            result,
+            consecutive_failures=failures,
+            next_run_at=datetime.datetime.fromtimestamp(next_run).isoformat(timespec="seconds")
+        )
+        print(f"[{datetime.datetime.now():%Y-%m-%d %H:%M:%S}] {result['site']}: {result['status']}, {result['new']} new of {result['items']} items, {result['bytes']} bytes in {result['seconds']}s" + (f" ({result['error']})" if result.get("error") else ""))
+
+    def run_forever(self, poll_seconds=5):
+        print(f"Scheduler started for {', '.join(self.schedules)} (max {self.max_concurrent} concurrent runs)")
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as executor:
+            while not self.stop_event.is_set():
+                now = time.time()
+                with self.lock:
+                    in_flight = sum(schedule.running for schedule in self.schedules.values())
+                    due = sorted(
+                        (schedule for schedule in self.schedules.values() if not schedule.running and schedule.next_run <= now),
+                        key=lambda schedule: schedule.next_run
+                    )
+                    # Never queue more than the cap, so an overdue site starts as soon as a slot frees up
+                    for schedule in due[:max(0, self.max_concurrent - in_flight)]:
+                        schedule.running = True
+                        executor.submit(self._run, schedule)
+                    next_due = min(schedule.next_run for schedule in self.schedules.values())
+                self.stop_event.wait(min(poll_seconds, max(0.1, next_due - now)))
+        print("Scheduler stopped")
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the registered scrapers on a schedule")
+    parser.add_argument("--interval", action="append", default=[], help="default interval (e.g. 24h) or SITE=interval; repeatable")
+    parser.add_argument("--max-concurrent", type=int, default=2)
+    parser.add_argument("--jitter", type=float, default=0.1, help="fraction of the interval to randomize start times by")
+    parser.add_argument("--backoff", default="5m", help="first retry delay after a failure, doubled per consecutive failure")
+    parser.add_argument("--max-backoff", default="6h")
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--no-index", action="store_true", help="skip embedding new releases into the regulatory updates index")
+    args = parser.parse_args()
+
+    intervals = {}
+    for value in args.interval:
+        code, _, duration = value.rpartition("=")
+        intervals[code or "*"] = parse_duration(duration)
+
+    scheduler = ScrapeScheduler(
+        intervals,
+        max_concurrent=args.max_concurrent,
+        jitter=args.jitter,
+        backoff_base=parse_duration(args.backoff),
+        backoff_max=parse_duration(args.max_backoff),
+        timeout=args.timeout,
+        index_updates=not args.no_index
+    )
+    signal.signal(signal.SIGINT, scheduler.stop)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    scheduler.run_forever()
+
+if __name__ == "__main__":
+    main()
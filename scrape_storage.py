@@ -0,0 +1,531 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import datetime
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit, parse_qs
+
+SCRAPED_DATA_DIR = "scraped_data"
+SCRAPE_STATE_DIR = os.path.join(SCRAPED_DATA_DIR, ".state")
+SCRAPED_DB_PATH = os.path.join(SCRAPED_DATA_DIR, "scraped_items.db")
+
+def parse_date_string(date_str):
+    """Parse date string to datetime object"""
+    if not date_str or date_str == 'No Date':
+        return None
+    
+    # Common date formats from government websites
+    date_formats = [
+        '%b %d, %Y',      # Aug 05, 2025
+        '%B %d, %Y',      # August 05, 2025
+        '%d %b %Y',       # 05 Aug 2025
+        '%d %B %Y',       # 05 August 2025
+        '%d/%m/%Y',       # 05/08/2025
+        '%d-%m-%Y',       # 05-08-2025
+    ]
+    
+    for fmt in date_formats:
+        try:
+            return datetime.datetime.strptime(date_str.strip(), fmt)
+        except ValueError:
+            continue
+    
+    return None
+
+def create_site_directory(site_code):
+    """Create the site's directory in the scraped_data folder"""
+    site_dir = os.path.join(SCRAPED_DATA_DIR, site_code)
+    os.makedirs(site_dir, exist_ok=True)
+    return site_dir
+
+def group_by_date(data):
+    """Group items by date string, newest date first"""
+    date_groups = defaultdict(list)
+    for item in data:
+        date_groups[item['date']].append(item)
+    
+    # Sort dates - try to parse them for proper sorting
+    sorted_dates = []
+    for date_str in date_groups.keys():
+        parsed_date = parse_date_string(date_str)
+        sorted_dates.append((parsed_date or datetime.datetime.min, date_str))
+    sorted_dates.sort(reverse=True, key=lambda x: x[0])
+    
+    return [(date_str, date_groups[date_str]) for _, date_str in sorted_dates]
+
+def _export_path(site_code, extension):
+    site_dir = create_site_directory(site_code)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    filepath = os.path.join(site_dir, f"{site_code.lower()}_news_{timestamp}.{extension}")
+    # Exports can land in the same second; never overwrite an earlier one
+    suffix = 1
+    while os.path.exists(filepath):
+        filepath = os.path.join(site_dir, f"{site_code.lower()}_news_{timestamp}_{suffix}.{extension}")
+        suffix += 1
+    return filepath
+
+def render_markdown(title, source_name, source_url, data, label="Last 7 Days"):
+    """Markdown listing of items grouped by date, newest first"""
+    lines = [
+        f"# 🏦 {title} - {label}\n\n",
+        f"**Generated on:** {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}  \n",
+        f"**Total items:** {len(data)}  \n",
+        f"**Data source:** [{source_name}]({source_url})\n\n",
+        "---\n\n",
+    ]
+    for date_str, items in group_by_date(data):
+        lines.append(f"## 📅 {date_str} ({len(items)} items)\n\n")
+        for i, item in enumerate(items, 1):
+            lines.append(f"{i}. **[{item['title']}]({item['url']})**\n\n")
+        lines.append("---\n\n")
+    return "".join(lines)
+
+def render_text(title, data, label="Last 7 Days"):
+    """Plain text listing of items grouped by date, newest first"""
+    lines = [
+        f"{title} - {label}\n",
+        "="*50 + "\n",
+        f"Generated on: {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}\n",
+        f"Total items: {len(data)}\n\n",
+    ]
+    for date_str, items in group_by_date(data):
+        lines.append(f"{date_str}\n")
+        lines.append("-" * len(date_str) + "\n")
+        for i, item in enumerate(items, 1):
+            lines.append(f"{i}. {item['title']}\n")
+            lines.append(f"   URL: {item['url']}\n\n")
+        lines.append("\n")
+    return "".join(lines)
+
+def render_html(title, source_name, source_url, data, label="Last 7 Days"):
+    """Styled HTML page of items grouped by date, newest first"""
+    html_content = f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title} - {label}</title>
+    <style>
+        body {{
+            font-family: Arial, sans-serif;
+            max-width: 1200px;
+            margin: 0 auto;
+            padding: 20px;
+            line-height: 1.6;
+            background-color: #f5f5f5;
+        }}
+        .container {{
+            background-color: white;
+            padding: 30px;
+            border-radius: 10px;
+            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+        }}
+        h1 {{
+            color: #1e3a8a;
+            text-align: center;
+            border-bottom: 3px solid #1e3a8a;
+            padding-bottom: 10px;
+        }}
+        .header-info {{
+            text-align: center;
+            color: #666;
+            margin-bottom: 30px;
+            font-style: italic;
+        }}
+        .date-section {{
+            margin-bottom: 30px;
+            border-left: 4px solid #1e3a8a;
+            padding-left: 20px;
+        }}
+        .date-header {{
+            color: #1e3a8a;
+            font-size: 1.3em;
+            font-weight: bold;
+            margin-bottom: 15px;
+            background-color: #f0f4ff;
+            padding: 10px;
+            border-radius: 5px;
+        }}
+        .news-item {{
+            margin-bottom: 15px;
+            padding: 15px;
+            background-color: #fafafa;
+            border-radius: 5px;
+            border: 1px solid #e0e0e0;
+        }}
+        .news-title {{
+            font-weight: bold;
+            margin-bottom: 8px;
+            color: #333;
+        }}
+        .news-link {{
+            color: #1e3a8a;
+            text-decoration: none;
+            font-weight: 500;
+        }}
+        .news-link:hover {{
+            text-decoration: underline;
+            color: #2563eb;
+        }}
+        .stats {{
+            background-color: #f0f4ff;
+            padding: 15px;
+            border-radius: 5px;
+            margin-top: 30px;
+            text-align: center;
+        }}
+        .footer {{
+            text-align: center;
+            margin-top: 30px;
+            color: #666;
+            font-size: 0.9em;
+        }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>🏦 {title} - {label}</h1>
+        <div class="header-info">
+            Generated on: {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}<br>
+            Total items: {len(data)}
+        </div>
+"""
+    
+    # Add each date section
+    date_sections = group_by_date(data)
+    for date_str, items in date_sections:
+        html_content += f"""
+        <div class="date-section">
+            <div class="date-header">📅 {date_str} ({len(items)} items)</div>
+"""
+        
+        for i, item in enumerate(items, 1):
+            html_content += f"""
+            <div class="news-item">
+                <div class="news-title">{i}. {item['title']}</div>
+                <a href="{item['url']}" target="_blank" class="news-link">🔗 View Full Article</a>
+            </div>
+"""
+        
+        html_content += "        </div>\n"
+    
+    # Add footer
+    html_content += f"""
+        <div class="stats">
+            <strong>📊 Summary:</strong> {len(data)} press releases from {len(date_sections)} dates
+        </div>
+        <div class="footer">
+            Data sourced from <a href="{source_url}" target="_blank">{source_name}</a><br>
+            Last updated: {datetime.datetime.now().strftime('%B %d, %Y at %I:%M %p')}
+        </div>
+    </div>
+</body>
+</html>"""
+    
+    return html_content
+
+def save_html(site_code, title, source_name, source_url, data, label="Last 7 Days"):
+    """Export items to an HTML file with clickable links in scraped_data/<site>"""
+    filepath = _export_path(site_code, "html")
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(render_html(title, source_name, source_url, data, label))
+    print(f"Saved {len(data)} items to {filepath}")
+    return filepath
+
+def save_markdown(site_code, title, source_name, source_url, data, label="Last 7 Days"):
+    """Export items to a Markdown file with clickable links in scraped_data/<site>"""
+    filepath = _export_path(site_code, "md")
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(render_markdown(title, source_name, source_url, data, label))
+    print(f"Saved {len(data)} items to {filepath}")
+    return filepath
+
+def save_text(site_code, title, data, label="Last 7 Days"):
+    """Export items to a plain text file in scraped_data/<site>"""
+    filepath = _export_path(site_code, "txt")
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(render_text(title, data, label))
+    print(f"Saved {len(data)} items to {filepath}")
+    return filepath
+
+def item_id(item):
+    """Stable identity of a scraped item: the prid query parameter when present, else the URL"""
+    query = parse_qs(urlsplit(item['url']).query)
+    for key in ("prid", "Id", "id"):
+        if query.get(key):
+            return query[key][0]
+    return item['url']
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+def load_scrape_state(site_code):
+    """Validators and body hash of the last fetched listing for a site"""
+    path = os.path.join(SCRAPE_STATE_DIR, f"{site_code}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError):
+            pass
+    return {"etag": None, "last_modified": None, "content_hash": None}
+
+def save_scrape_state(site_code, state):
+    os.makedirs(SCRAPE_STATE_DIR, exist_ok=True)
+    path = os.path.join(SCRAPE_STATE_DIR, f"{site_code}.json")
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+_local = threading.local()
+_imported_sites = set()
+
+def get_connection():
+    """Per-thread connection to the scraped items database, creating the schema on first use"""
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        os.makedirs(SCRAPED_DATA_DIR, exist_ok=True)
+        connection = sqlite3.connect(SCRAPED_DB_PATH, timeout=30)
+        connection.row_factory = sqlite3.Row
+        # WAL lets the app read while a scraper run is writing
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                site TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                date TEXT,
+                date_label TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                scraped_at TEXT NOT NULL,
+                PRIMARY KEY (site, item_id)
+            );
+            CREATE INDEX IF NOT EXISTS items_site_date ON items (site, date DESC);
+            CREATE TABLE IF NOT EXISTS imported_snapshots (site TEXT PRIMARY KEY);
+        """)
+        _local.connection = connection
+    return connection
+
+def store_items(site_code, items):
+    """Insert items not already stored for the site and return just those new items"""
+    connection = get_connection()
+    scraped_at = datetime.datetime.now().isoformat(timespec="seconds")
+    new_items = []
+    with connection:
+        for item in items:
+            parsed_date = parse_date_string(item['date'])
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO items (site, item_id, date, date_label, title, url, scraped_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (site_code, item_id(item), parsed_date.date().isoformat() if parsed_date else None, item['date'], item['title'], item['url'], scraped_at)
+            )
+            if cursor.rowcount:
+                new_items.append(item)
+    return new_items
+
+def _date_filter(site_code, start_date, end_date):
+    clauses = ["site = ?"]
+    params = [site_code]
+    if start_date:
+        clauses.append("date >= ?")
+        params.append(start_date.isoformat())
+    if end_date:
+        clauses.append("date <= ?")
+        params.append(end_date.isoformat())
+    return " AND ".join(clauses), params
+
+def count_items(site_code, start_date=None, end_date=None):
+    """Number of stored items for a site, optionally within an inclusive date range"""
+    import_markdown_snapshots(site_code)
+    where, params = _date_filter(site_code, start_date, end_date)
+    return get_connection().execute(f"SELECT COUNT(*) FROM items WHERE {where}", params).fetchone()[0]
+
+def query_items(site_code, start_date=None, end_date=None, limit=50, offset=0):
+    """One page of a site's items, newest first, as {date, title, url} dicts"""
+    import_markdown_snapshots(site_code)
+    where, params = _date_filter(site_code, start_date, end_date)
+    rows = get_connection().execute(
+        f"SELECT date_label, title, url FROM items WHERE {where} ORDER BY date DESC, item_id DESC LIMIT ? OFFSET ?",
+        params + [limit, offset]
+    ).fetchall()
+    return [{'date': row['date_label'], 'title': row['title'], 'url': row['url']} for row in rows]
+
+def get_latest_item_date(site_code):
+    import_markdown_snapshots(site_code)
+    row = get_connection().execute("SELECT MAX(date) FROM items WHERE site = ?", (site_code,)).fetchone()
+    return datetime.date.fromisoformat(row[0]) if row[0] else None
+
+MARKDOWN_DATE_PATTERN = re.compile(r"^## 📅 (.+?) \(\d+ items\)$", re.MULTILINE)
+MARKDOWN_ITEM_PATTERN = re.compile(r"^\d+\. \*\*\[(.+)\]\((\S+)\)\*\*$", re.MULTILINE)
+
+def import_markdown_snapshots(site_code):
+    """Load items from Markdown snapshots written before the database existed; runs once per site"""
+    if site_code in _imported_sites:
+        return 0
+    connection = get_connection()
+    if connection.execute("SELECT 1 FROM imported_snapshots WHERE site = ?", (site_code,)).fetchone():
+        _imported_sites.add(site_code)
+        return 0
+    
+    items = []
+    site_dir = os.path.join(SCRAPED_DATA_DIR, site_code)
+    if os.path.isdir(site_dir):
+        for file_name in sorted(os.listdir(site_dir)):
+            if not file_name.endswith(".md"):
+                continue
+            with open(os.path.join(site_dir, file_name), "r", encoding="utf-8") as f:
+                content = f.read()
+            headings = list(MARKDOWN_DATE_PATTERN.finditer(content))
+            for heading, following in zip(headings, headings[1:] + [None]):
+                section = content[heading.end():following.start() if following else len(content)]
+                for title, url in MARKDOWN_ITEM_PATTERN.findall(section):
+                    items.append({'date': heading.group(1), 'title': title, 'url': url})
+    
+    new_items = store_items(site_code, items)
+    with connection:
+        connection.execute("INSERT OR IGNORE INTO imported_snapshots (site) VALUES (?)", (site_code,))
+    _imported_sites.add(site_code)
+    if new_items:
+        print(f"Imported {len(new_items)} {site_code} items from Markdown snapshots")
+    return len(new_items)
+
+SCRAPE_STATUS_PATH = os.path.join(SCRAPE_STATE_DIR, "status.json")
+SCRAPE_STATE_LOCK_PATH = os.path.join(SCRAPE_STATE_DIR, "state.lock")
+_status_lock = threading.Lock()
+
+class FileLock:
+    """Advisory lock on a file, held across processes (the scheduler, cron runs and the app).
+
+    The lock file is created once and never rewritten or removed; the operating system releases the lock
+    when its holder exits, so a crashed run cannot leave it stuck.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self, blocking=True):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.path, "a+")
+        try:
+            try:
+                import fcntl
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except ImportError:
+                import msvcrt
+                self.file.seek(0)
+                # LK_LOCK gives up after ten seconds, so a blocking acquire keeps retrying until the lock is free
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+        except OSError:
+            self.file.close()
+            self.file = None
+            return False
+        return True
+
+    def release(self):
+        if self.file is None:
+            return
+        try:
+            import fcntl
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        except ImportError:
+            import msvcrt
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+def scrape_state_lock():
+    """The one lock for read-modify-write updates of shared scrape state: status.json and the regulatory index manifest"""
+    return FileLock(SCRAPE_STATE_LOCK_PATH)
+
+# Unchanged runs per site since the last status write: {site: {"runs", "seconds", "result", "extra", "at"}}
+_unchanged_runs = {}
+
+def _read_status_file():
+    try:
+        with open(SCRAPE_STATUS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"sites": {}}
+
+def _fold_result(status, result, extra, at, runs=1, seconds=None):
+    site = status["sites"].setdefault(result["site"], {"runs": 0, "failures": 0, "total_seconds": 0.0})
+    site["runs"] += runs
+    site["total_seconds"] = round(site["total_seconds"] + (result.get("seconds", 0) if seconds is None else seconds), 3)
+    if result["status"] == "error":
+        site["failures"] += 1
+        site["last_error"] = result.get("error")
+        site["last_error_at"] = at
+    else:
+        site["last_success_at"] = at
+    site.update({
+        "last_run_at": at,
+        "last_status": result["status"],
+        "last_seconds": result.get("seconds"),
+        "last_items": result.get("items", 0),
+        "last_new": result.get("new", 0),
+        "last_bytes": result.get("bytes", 0),
+    })
+    site.update(extra)
+    status["updated_at"] = at
+
+def _fold_unchanged_runs(status):
+    for pending in _unchanged_runs.values():
+        _fold_result(status, pending["result"], pending["extra"], pending["at"], pending["runs"], pending["seconds"])
+
+def load_scrape_status():
+    """Per-site metrics of the latest runs, as written by the scraper CLI and the scheduler, plus this process's unwritten unchanged runs"""
+    status = _read_status_file()
+    with _status_lock:
+        _fold_unchanged_runs(status)
+    return status
+
+def record_scrape_result(result, **extra):
+    """Fold one scrape_site result into the status file.
+
+    An unchanged listing is only counted in memory and written with the next result that changes something,
+    so a quiet site costs no disk writes; runs counted by a process that exits before then are not persisted.
+    """
+    at = datetime.datetime.now().isoformat(timespec="seconds")
+    with _status_lock:
+        if result["status"] == "unchanged":
+            pending = _unchanged_runs.setdefault(result["site"], {"runs": 0, "seconds": 0.0})
+            pending.update(runs=pending["runs"] + 1, seconds=pending["seconds"] + result.get("seconds", 0), result=result, extra=extra, at=at)
+            return
+        with scrape_state_lock():
+            status = _read_status_file()
+            _fold_unchanged_runs(status)
+            _unchanged_runs.clear()
+            _fold_result(status, result, extra, at)
+            
+            os.makedirs(SCRAPE_STATE_DIR, exist_ok=True)
+            temp_path = f"{SCRAPE_STATUS_PATH}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(status, f, indent=2)
+            os.replace(temp_path, SCRAPE_STATUS_PATH)
+
+class SiteLock(FileLock):
+    """Keeps two processes (cron and the scheduler, say) from scraping one site at once; never waits"""
+
+    def __init__(self, site_code):
+        super().__init__(os.path.join(SCRAPE_STATE_DIR, f"{site_code}.lock"))
+
+    def __enter__(self):
+        return self.acquire(blocking=False)
@@ -0,0 +1,225 @@
+import time
+import argparse
+import datetime
+import threading
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rbi_scraper
+from scrape_storage import (
+    save_markdown, save_text, save_html, load_scrape_state, save_scrape_state, content_hash,
+    store_items, query_items, count_items, import_markdown_snapshots, record_scrape_result, SiteLock
+)
+
+HEADERS = rbi_scraper.HEADERS
+
+SCRAPERS = {}
+
+class SiteScraper:
+    """A registered site: where to fetch its listing, how to parse it and how to label its output"""
+
+    def __init__(self, code, full_name, title, listing_url, parse, filter_items=None, min_interval=1.0):
+        self.code = code
+        self.full_name = full_name
+        self.title = title
+        self.listing_url = listing_url
+        self.parse = parse
+        self.filter_items = filter_items
+        self.min_interval = min_interval
+
+    @property
+    def base_url(self):
+        parts = urlsplit(self.listing_url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+def register_scraper(code, full_name, title, listing_url, parse, filter_items=None, min_interval=1.0):
+    """Add a site to the registry; parse(content) must return a list of {date, title, url} items"""
+    SCRAPERS[code] = SiteScraper(code, full_name, title, listing_url, parse, filter_items, min_interval)
+    return SCRAPERS[code]
+
+register_scraper(
+    "RBI",
+    "Reserve Bank of India",
+    "RBI Press Releases",
+    rbi_scraper.LISTING_URL,
+    rbi_scraper.parse_rbi_listing,
+    filter_items=rbi_scraper.filter_last_7_days_data,
+)
+
+class HostRateLimiter:
+    """Enforce a minimum interval between requests to the same host across all threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_allowed = {}
+
+    def wait(self, host, min_interval):
+        with self.lock:
+            now = time.monotonic()
+            scheduled = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = scheduled + min_interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+
+_session = None
+_session_lock = threading.Lock()
+rate_limiter = HostRateLimiter()
+
+def get_session(pool_size=16, retries=3):
+    """Shared session so every site reuses pooled keep-alive connections"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+                max_retries=Retry(
+                    total=retries,
+                    backoff_factor=1.0,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET", "HEAD"]
+                )
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+def fetch(url, min_interval=1.0, timeout=30, headers=None):
+    """Rate-limited GET through the shared session"""
+    rate_limiter.wait(urlsplit(url).netloc, min_interval)
+    response = get_session().get(url, timeout=timeout, headers=headers)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+def _fetch_and_store(site, result, timeout, save, full):
+    state = {} if full else load_scrape_state(site.code)
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    response = fetch(site.listing_url, site.min_interval, timeout, headers=headers)
+    result["bytes"] = len(response.content)
+    digest = content_hash(response.content) if response.status_code != 304 else None
+    if response.status_code == 304 or digest == state.get("content_hash"):
+        result["status"] = "unchanged"
+        return
+
+    items = site.parse(response.content)
+    if site.filter_items:
+        items = site.filter_items(items)
+    result["items"] = len(items)
+
+    if save:
+        # Items from snapshots written before the database existed must not count as new
+        import_markdown_snapshots(site.code)
+        new_items = store_items(site.code, items)
+        result["new"] = len(new_items)
+        result["new_items"] = new_items
+        save_scrape_state(site.code, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_hash": digest
+        })
+
+def scrape_site(site, timeout=30, save=True, full=False):
+    """Fetch a site's listing and store items not seen before; never raises so one failing site cannot stop the run.
+
+    Unchanged listings (304, or an identical body when the server sends no validators) cost no parsing and no disk writes:
+    the site lock is an flock on a lock file that already exists, and record_scrape_result keeps unchanged runs in memory.
+    full=True ignores the saved validators and re-parses the listing. A run of the same site already in progress
+    in any process makes this one return with status "skipped".
+    """
+    start = time.perf_counter()
+    result = {"site": site.code, "status": "ok", "items": 0, "new": 0, "bytes": 0, "new_items": []}
+    lock = SiteLock(site.code)
+    if lock.acquire(blocking=False):
+        try:
+            _fetch_and_store(site, result, timeout, save, full)
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = str(e)
+        finally:
+            lock.release()
+    else:
+        result["status"] = "skipped"
+        result["error"] = "another run of this site is in progress"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+EXPORTERS = {"md": save_markdown, "html": save_html}
+
+def export_site(site, export_format="md", days=7):
+    """Write the site's stored items from the last `days` days to a Markdown, HTML or text file"""
+    start_date = datetime.date.today() - datetime.timedelta(days=days)
+    items = query_items(site.code, start_date=start_date, limit=count_items(site.code, start_date=start_date))
+    label = f"Last {days} Days"
+    if export_format == "txt":
+        return save_text(site.code, site.title, items, label)
+    return EXPORTERS[export_format](site.code, site.title, site.full_name, site.base_url, items, label)
+
+def run_scrapers(codes=None, max_workers=8, timeout=30, full=False):
+    """Scrape the selected (default: all) sites concurrently; total time tracks the slowest site"""
+    sites = [SCRAPERS[code] for code in (codes or SCRAPERS)]
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sites)))) as executor:
+        futures = [executor.submit(scrape_site, site, timeout, True, full) for site in sites]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            record_scrape_result(result)
+            status = {"ok": "✅", "unchanged": "⏸️ unchanged", "skipped": "⏭️ skipped (already running)"}.get(result["status"], f"❌ {result.get('error')}")
+            print(f"{result['site']}: {result['new']} new of {result['items']} items, {result['bytes']} bytes in {result['seconds']}s {status}")
+    return results
+
+def index_new_items(results):
+    """Embed the bodies of newly scraped releases into the rolling regulatory updates index"""
+    # Imported lazily: utils pulls in the embedding stack and itself imports this registry
+    from utils import update_regulatory_index
+    new_items_by_site = {result["site"]: result["new_items"] for result in results if result["status"] == "ok"}
+    return update_regulatory_index(new_items_by_site)
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape registered regulatory websites")
+    parser.add_argument("sites", nargs="*", help=f"site codes to scrape (default: all of {', '.join(SCRAPERS)})")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--timeout", type=int, default=30)
+    parser.add_argument("--full", action="store_true", help="ignore saved validators and re-parse every listing")
+    parser.add_argument("--export", choices=["md", "html", "txt"], help="export stored items instead of scraping")
+    parser.add_argument("--days", type=int, default=7, help="days of items to export")
+    parser.add_argument("--no-index", action="store_true", help="skip embedding new releases into the regulatory updates index")
+    parser.add_argument("--fixture", help="parse a saved listing page with the (single) given site's parser instead of fetching")
+    args = parser.parse_args()
+
+    if args.fixture:
+        site = SCRAPERS[args.sites[0] if args.sites else "RBI"]
+        with open(args.fixture, "rb") as f:
+            items = site.parse(f.read())
+        for item in items:
+            print(f"{item['date']} | {item['title']} | {item['url']}")
+        print(f"\n{len(items)} items parsed from {args.fixture}")
+        return
+
+    if args.export:
+        for code in args.sites or SCRAPERS:
+            export_site(SCRAPERS[code], args.export, args.days)
+        return
+
+    start = time.perf_counter()
+    results = run_scrapers(args.sites or None, args.workers, args.timeout, args.full)
+    failed = [result for result in results if result["status"] == "error"]
+    print(f"\nScraped {len(results)} sites in {time.perf_counter() - start:.1f}s ({len(failed)} failed)")
+    if not args.no_index:
+        index_new_items(results)
+
+if __name__ == "__main__":
+    main()
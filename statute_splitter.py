@@ -0,0 +1,234 @@
+import re
+import bisect
+import argparse
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Heading levels, outermost first: chapters/parts/schedules, sections, sub-sections, clauses
+SCHEDULE_PATTERN = re.compile(
+    r"^[ \t]*(?:THE[ \t]+)?((?:[A-Z]+[ \t]+)?SCHEDULE(?:[ \t]+[IVXLC]+)?|CHAPTER[ \t]+[IVXLC]+[A-Z]*|PART[ \t]+[IVXLC]+[A-Z]*)[ \t]*$",
+    re.MULTILINE
+)
+SECTION_PATTERN = re.compile(r"^[ \t]*(\d{1,3}(?:-?[A-Z]{1,4})?)\.[ \t]+(?=[A-Z\[“\"])", re.MULTILINE)
+SUBSECTION_PATTERN = re.compile(r"^[ \t]*\([ \t]*(\d{1,3}[A-Z]{0,3})[ \t]*\)[ \t]*", re.MULTILINE)
+CLAUSE_PATTERN = re.compile(r"^[ \t]*\([ \t]*([a-z]{1,2}|[ivx]{1,5})[ \t]*\)[ \t]*", re.MULTILINE)
+
+LEVEL_PATTERNS = [SCHEDULE_PATTERN, SECTION_PATTERN, SUBSECTION_PATTERN, CLAUSE_PATTERN]
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+
+class StatuteTextSplitter:
+    """Split Indian statutory text along schedule, section, sub-section and clause boundaries"""
+
+    def __init__(self, chunk_size=1500, fallback_overlap=200, min_sections=3, plain_overlap=300):
+        self.chunk_size = chunk_size
+        self.min_sections = min_sections
+        # Overlap is only used when a single clause is itself longer than a chunk
+        self.fallback_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=fallback_overlap,
+            separators=DEFAULT_SEPARATORS
+        )
+        self.plain_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=plain_overlap,
+            separators=DEFAULT_SEPARATORS
+        )
+
+    def split_documents(self, docs):
+        """Split page documents, grouping consecutive pages of the same source file"""
+        chunks = []
+        group = []
+        for doc in docs:
+            if group and doc.metadata.get("source_file") != group[0].metadata.get("source_file"):
+                chunks.extend(self._split_source(group))
+                group = []
+            group.append(doc)
+        if group:
+            chunks.extend(self._split_source(group))
+        return chunks
+
+    def _split_source(self, pages):
+        text_parts = []
+        page_starts = []
+        position = 0
+        for page in pages:
+            page_starts.append(position)
+            text_parts.append(page.page_content)
+            position += len(page.page_content) + 1
+        text = "\n".join(text_parts)
+
+        headings = [
+            [(match.start(), match.group(1).strip()) for match in pattern.finditer(text)]
+            for pattern in LEVEL_PATTERNS
+        ]
+        # Documents without statutory structure keep the original character splitter
+        if len(headings[1]) < self.min_sections:
+            return self.plain_splitter.split_documents(pages)
+        positions = [[position for position, _ in level_headings] for level_headings in headings]
+
+        chunks = []
+        for start, end, forced in self._merge(self._pack(text, 0, len(text), 0, positions)):
+            content = text[start:end].strip()
+            if not content:
+                continue
+            page = pages[bisect.bisect_right(page_starts, start) - 1]
+            metadata = dict(page.metadata)
+            metadata.update(self._locate(start, end, headings, positions))
+            if forced:
+                metadata["forced_split"] = True
+            chunks.append(Document(page_content=content, metadata=metadata))
+        return chunks
+
+    def _pack(self, text, start, end, level, positions):
+        """Return (start, end, forced) spans no longer than chunk_size, splitting at the given level or deeper"""
+        if end - start <= self.chunk_size:
+            return [(start, end, False)]
+        if level >= len(positions):
+            spans = []
+            search_from = start
+            for piece in self.fallback_splitter.split_text(text[start:end]):
+                offset = text.find(piece, search_from, end)
+                offset = search_from if offset == -1 else offset
+                spans.append((offset, offset + len(piece), True))
+                search_from = offset + 1
+            return spans
+
+        level_positions = positions[level]
+        boundaries = level_positions[bisect.bisect_right(level_positions, start):bisect.bisect_left(level_positions, end)]
+        if not boundaries:
+            return self._pack(text, start, end, level + 1, positions)
+
+        spans = []
+        edges = [start] + boundaries + [end]
+        for piece_start, piece_end in zip(edges, edges[1:]):
+            spans.extend(self._pack(text, piece_start, piece_end, level + 1, positions))
+        return spans
+
+    def _merge(self, spans):
+        """Greedily join adjacent structural pieces while they fit in one chunk"""
+        merged = []
+        for start, end, forced in spans:
+            if merged and not forced and not merged[-1][2] and end - merged[-1][0] <= self.chunk_size:
+                merged[-1] = (merged[-1][0], end, False)
+            else:
+                merged.append((start, end, forced))
+        return merged
+
+    def _locate(self, start, end, headings, positions):
+        metadata = {}
+        section_start = None
+        for level, name in enumerate(["schedule", "section_id", "subsection", "clause"]):
+            index = bisect.bisect_right(positions[level], start) - 1
+            if index < 0:
+                continue
+            position, label = headings[level][index]
+            # Sub-section and clause labels only count inside the section the chunk starts in
+            if level >= 2 and (section_start is None or position < section_start):
+                continue
+            metadata[name] = label
+            if level == 1:
+                section_start = position
+
+        section_positions = positions[1]
+        inside = headings[1][bisect.bisect_right(section_positions, start):bisect.bisect_left(section_positions, end)]
+        section_ids = ([metadata["section_id"]] if "section_id" in metadata else []) + [label for _, label in inside]
+        if section_ids:
+            metadata["section_ids"] = ",".join(section_ids)
+        return metadata
+
+def _load_pdf_pages(path):
+    import os
+    from pypdf import PdfReader
+    source_file = os.path.basename(path)
+    return [
+        Document(page_content=page.extract_text() or "", metadata={"source_file": source_file, "page": number})
+        for number, page in enumerate(PdfReader(path).pages)
+    ]
+
+def _normalize(text):
+    return " ".join(text.split()).lower()
+
+def _section_probes(pages, limit=200):
+    """Build (query, passage) probes from section headings: the title is the query, its opening text the passage"""
+    text = "\n".join(page.page_content for page in pages)
+    matches = list(SECTION_PATTERN.finditer(text))
+    probes = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        body = text[match.end():following.start() if following else len(text)]
+        title, separator, rest = body.partition(".—")
+        if not separator or len(rest.strip()) < 80:
+            continue
+        probes.append((" ".join(title.split()), _normalize(rest)[:120]))
+    step = max(1, len(probes) // limit)
+    return probes[::step][:limit]
+
+def _bm25_search(chunks, queries, k):
+    import math
+    from collections import Counter
+    tokenize = lambda value: re.findall(r"[a-z0-9]+", value.lower())
+    documents = [Counter(tokenize(chunk.page_content)) for chunk in chunks]
+    lengths = [sum(counts.values()) for counts in documents]
+    average_length = sum(lengths) / max(1, len(lengths))
+    document_frequency = Counter(term for counts in documents for term in counts)
+    total = len(documents)
+    results = []
+    for query in queries:
+        scores = []
+        for index, counts in enumerate(documents):
+            score = 0.0
+            for term in set(tokenize(query)):
+                if term not in counts:
+                    continue
+                idf = math.log(1 + (total - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                frequency = counts[term]
+                score += idf * frequency * 2.2 / (frequency + 1.2 * (0.25 + 0.75 * lengths[index] / average_length))
+            scores.append((score, index))
+        scores.sort(reverse=True)
+        results.append([index for _, index in scores[:k]])
+    return results
+
+def compare_splitters(paths, k=6, chunk_size=1500):
+    """Report chunk count, embedded characters and retrieval hit rate for both splitters"""
+    baseline = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=300, separators=DEFAULT_SEPARATORS)
+    structured = StatuteTextSplitter(chunk_size=chunk_size)
+    report = []
+    for path in paths:
+        pages = _load_pdf_pages(path)
+        probes = _section_probes(pages)
+        source_chars = sum(len(page.page_content) for page in pages)
+        for name, splitter in (("recursive 1500/300", baseline), ("statute", structured)):
+            chunks = splitter.split_documents(pages)
+            normalized = [_normalize(chunk.page_content) for chunk in chunks]
+            hits = 0
+            if probes:
+                for (_, passage), top in zip(probes, _bm25_search(chunks, [query for query, _ in probes], k)):
+                    hits += any(passage[:80] in normalized[index] for index in top)
+            embedded_chars = sum(len(chunk.page_content) for chunk in chunks)
+            report.append({
+                "file": path,
+                "splitter": name,
+                "chunks": len(chunks),
+                "embedded_chars": embedded_chars,
+                "chars_vs_source": round(embedded_chars / max(1, source_chars), 3),
+                "probes": len(probes),
+                f"hit_rate@{k}": round(hits / len(probes), 3) if probes else None,
+            })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the statute splitter against the fixed 1500/300 splitter")
+    parser.add_argument("paths", nargs="+", help="PDF files, e.g. preloaded_docs/*.pdf")
+    parser.add_argument("--k", type=int, default=6, help="top-k used for the retrieval hit rate")
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    args = parser.parse_args()
+
+    report = compare_splitters(args.paths, args.k, args.chunk_size)
+    columns = list(report[0].keys())
+    print(" | ".join(columns))
+    for row in report:
+        print(" | ".join(str(row[column]) for column in columns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The app modules live at the repository root and read their settings from the environment on import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_state_dir = tempfile.mkdtemp(prefix="apmh-tests-")
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ["METRICS_LOG_FILE"] = ""
+os.environ["USER_DB_PATH"] = os.path.join(_state_dir, "users.db")
+os.environ["USAGE_DB_PATH"] = os.path.join(_state_dir, "usage.db")
+
+# Imported after the environment is set, since usage_store reads its database path on import
+from fake_backends import FakeChatModel, FakeEmbeddings
+
+class CountingEmbeddings(FakeEmbeddings):
+    """Counts the texts sent for embedding, to tell a re-embedded page from a skipped one"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.embedded_texts = 0
+
+    def embed_documents(self, texts):
+        self.embedded_texts += len(texts)
+        return super().embed_documents(texts)
+
+@pytest.fixture
+def fake_models(tmp_path, monkeypatch):
+    """Offline embeddings and chat model, in an empty working directory"""
+    import utils
+    monkeypatch.chdir(tmp_path)
+    embeddings = CountingEmbeddings(dimensions=64)
+    monkeypatch.setattr(utils, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(utils, "get_llm", lambda *args, **kwargs: FakeChatModel(completion_tokens=5))
+    return embeddings
+
+class WebServer:
+    """Serves `pages` ({path: {"body", "etag", "last_modified", "status"}}) and answers conditional requests with 304"""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                page = server.pages.get(self.path)
+                if page is None or page.get("status", 200) != 200:
+                    self.send_response(page.get("status", 404) if page else 404)
+                    self.end_headers()
+                    return
+                etag, last_modified = page.get("etag"), page.get("last_modified")
+                if (etag and self.headers.get("If-None-Match") == etag) or (
+                    not etag and last_modified and self.headers.get("If-Modified-Since") == last_modified
+                ):
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = page["body"].encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                if last_modified:
+                    self.send_header("Last-Modified", last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def request_headers(self, path):
+        return [headers for requested, headers in self.requests if requested == path]
+
+@pytest.fixture
+def web_server():
+    server = WebServer()
+    server.thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
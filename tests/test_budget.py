@@ -0,0 +1,76 @@
+import os
+import uuid
+
+import pytest
+
+import usage_store
+import utils
+from usage_store import set_budget, usage_context
+
+@pytest.fixture
+def over_budget_user():
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    set_budget(username, daily_usd=0.0)
+    with usage_context(username, "chat"):
+        yield username
+
+def test_table_answers_go_through_economy_mode_and_the_answer_cache(fake_models, over_budget_user, monkeypatch):
+    calls = []
+    def answer_from_table(llm, query, tables):
+        calls.append(query)
+        return {"result": "Total: 42", "source_documents": []}
+    monkeypatch.setattr(utils, "answer_from_table", answer_from_table)
+    agent = utils.CombinedRetrievalQA(utils.get_llm(), None, lambda query, query_embedding=None: [], tables={"sales": {}})
+
+    first = agent.invoke({"query": "What is the total revenue by region?"})
+    second = agent.invoke({"query": "What is the total revenue by region?"})
+
+    assert first["mode"] == "economy"
+    assert second["mode"] == "cached"
+    assert second["result"] == "Total: 42"
+    assert len(calls) == 1
+
+def test_agent_without_documents_applies_the_budget(fake_models, over_budget_user):
+    agent = utils.get_general_agent()
+
+    first = agent.invoke("What is a non-banking financial company?")
+    second = agent.invoke("What is a non-banking financial company?")
+
+    assert first["mode"] == "economy"
+    assert second["mode"] == "cached"
+
+def test_within_budget_answers_are_unchanged(fake_models):
+    with usage_context(f"user-{uuid.uuid4().hex[:8]}", "chat"):
+        response = utils.get_general_agent().invoke("What is a repo rate?")
+    assert "mode" not in response
+
+def test_rebuilt_index_does_not_serve_answers_about_the_old_document(fake_models, over_budget_user, tmp_path):
+    index_file = tmp_path / "user_data" / over_budget_user / "faiss_index" / "index.faiss"
+    index_file.parent.mkdir(parents=True)
+    index_file.write_bytes(b"old")
+    agent = utils.get_general_agent()
+    agent.invoke("What does clause 4 say?")
+    assert agent.invoke("What does clause 4 say?")["mode"] == "cached"
+
+    index_file.write_bytes(b"new")
+    os.utime(index_file, (index_file.stat().st_atime, index_file.stat().st_mtime + 10))
+
+    assert agent.invoke("What does clause 4 say?")["mode"] == "economy"
+
+def test_deleting_a_document_clears_the_users_answers(fake_models, over_budget_user):
+    agent = utils.get_general_agent()
+    agent.invoke("What does clause 4 say?")
+    utils.delete_user_document_and_index(over_budget_user)
+    assert agent.invoke("What does clause 4 say?")["mode"] == "economy"
+
+def test_expired_answers_are_pruned(over_budget_user):
+    connection = usage_store.get_connection()
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO answer_cache (username, question_hash, response, created_at) VALUES (?, 'stale', '{}', '2000-01-01T00:00:00')",
+            (over_budget_user,)
+        )
+    usage_store.cache_answer(over_budget_user, "fresh question", {"result": "answer"})
+    rows = connection.execute("SELECT question_hash FROM answer_cache WHERE username = ?", (over_budget_user,)).fetchall()
+    assert len(rows) == 1
+    assert rows[0][0] != "stale"
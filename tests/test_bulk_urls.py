@@ -0,0 +1,54 @@
+import utils
+
+PAGE = "<html><head><title>{title}</title></head><body><p>{body}</p></body></html>"
+
+CIRCULARS = {
+    "/kyc": ("KYC directions", "Regulated entities shall complete periodic KYC updation for high risk customers every two years."),
+    "/liquidity": ("Liquidity coverage", "Banks shall maintain a liquidity coverage ratio of at least one hundred percent at all times."),
+    "/fraud": ("Fraud reporting", "Frauds above one crore rupees shall be reported to the central fraud registry within seven days."),
+}
+
+def serve_circulars(web_server):
+    for path, (title, body) in CIRCULARS.items():
+        web_server.pages[path] = {"body": PAGE.format(title=title, body=body), "etag": f'"{path}-1"'}
+    return [web_server.url(path) for path in CIRCULARS] + [web_server.url("/missing")]
+
+def indexed_sources():
+    store = utils.load_vector_store("user_data/alice/faiss_index")
+    return {doc.metadata["source_file"] for doc in store.docstore._dict.values()}
+
+def test_bulk_ingestion_reports_each_url(fake_models, web_server):
+    urls = serve_circulars(web_server)
+
+    report = utils.process_and_store_urls("alice", urls, max_workers=4)
+
+    assert report["urls"] == 4
+    assert report["fetched"] == 3
+    assert report["failed"] == 1
+    statuses = {result["url"]: result for result in report["statuses"]}
+    assert statuses[web_server.url("/missing")]["status"] == "error"
+    assert "404" in statuses[web_server.url("/missing")]["error"]
+    for path in CIRCULARS:
+        assert statuses[web_server.url(path)]["status"] == "ok"
+        assert statuses[web_server.url(path)]["chunks"] == 1
+    assert report["chunks"] == 3
+    assert indexed_sources() == {web_server.url(path) for path in CIRCULARS}
+    assert sorted(utils.get_user_web_source_urls("alice")) == sorted(web_server.url(path) for path in CIRCULARS)
+
+def test_rebuild_and_refresh_cover_every_stored_url(fake_models, web_server):
+    utils.process_and_store_urls("alice", serve_circulars(web_server), max_workers=4)
+    web_server.requests.clear()
+
+    utils.rebuild_web_index("alice")
+    assert web_server.requests == []
+    assert indexed_sources() == {web_server.url(path) for path in CIRCULARS}
+
+    web_server.pages["/fraud"] = {"body": PAGE.format(title="Fraud reporting", body="Frauds shall be reported within three days."), "etag": '"/fraud-2"'}
+    fake_models.embedded_texts = 0
+    result = utils.refresh_web_document("alice")
+
+    assert sorted(path for path, _ in web_server.requests) == sorted(CIRCULARS)
+    assert result["changed"] is True
+    assert result["changed_urls"] == [web_server.url("/fraud")]
+    assert indexed_sources() == {web_server.url(path) for path in CIRCULARS}
+    assert fake_models.embedded_texts > 0
@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+
+from dedup import dedupe_chunks
+
+SECTION = (
+    "Section 115BAC. The income-tax payable in respect of the total income of a person, being an individual "
+    "or a Hindu undivided family, shall, at the option of such person, be computed at the rate of {rate} per cent "
+    "where the total income exceeds fifteen lakh rupees, subject to the conditions specified in sub-section (2)."
+)
+
+def chunk(text, source_file):
+    return Document(page_content=text, metadata={"source_file": source_file, "page": 0})
+
+def test_chunks_differing_in_one_amount_are_both_kept():
+    chunks = [chunk(SECTION.format(rate=30), "finance_bill_2023.pdf"), chunk(SECTION.format(rate=25), "finance_bill_2024.pdf")]
+
+    canonical, report = dedupe_chunks(chunks)
+
+    assert [doc.page_content for doc in canonical] == [doc.page_content for doc in chunks]
+    assert report["duplicates"] == 0
+    assert "aliases" not in canonical[0].metadata
+
+def test_identical_chunks_become_aliases():
+    chunks = [chunk(SECTION.format(rate=30), "finance_bill_2023.pdf"), chunk(SECTION.format(rate=30), "finance_act_2023.pdf")]
+
+    canonical, report = dedupe_chunks(chunks)
+
+    assert len(canonical) == 1
+    assert report["duplicates"] == 1
+    assert canonical[0].metadata["aliases"] == [{"source_file": "finance_act_2023.pdf", "page": 0}]
+
+def test_alias_with_different_formatting_keeps_its_text():
+    reformatted = SECTION.format(rate=30).upper().replace(",", "")
+    canonical, _ = dedupe_chunks([chunk(SECTION.format(rate=30), "a.pdf"), chunk(reformatted, "b.pdf")])
+
+    assert len(canonical) == 1
+    assert canonical[0].metadata["aliases"][0]["text"] == reformatted
@@ -0,0 +1,44 @@
+import utils
+
+def test_caches_stay_bounded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "FILE_HASH_CACHE_ENTRIES", 3)
+    monkeypatch.setattr(utils, "PAGE_OFFSETS_CACHE_ENTRIES", 3)
+    monkeypatch.setattr(utils, "EXTRACTION_CACHE_ENTRIES", 3)
+    for cache in (utils._file_hash_cache, utils._page_offsets_cache, utils._extraction_cache):
+        cache.clear()
+
+    for number in range(10):
+        path = tmp_path / f"doc{number}.txt"
+        path.write_text(f"Document number {number}")
+        assert utils.get_page_texts(str(path), max_memory_entries=3) == [f"Document number {number}"]
+
+    assert len(utils._file_hash_cache) == 3
+    assert len(utils._page_offsets_cache) == 3
+    assert len(utils._extraction_cache) == 3
+
+def test_docx_tables_are_extracted_in_body_order(tmp_path, monkeypatch):
+    from docx import Document
+    monkeypatch.chdir(tmp_path)
+    document = Document()
+    document.add_paragraph("Schedule of tax rates")
+    table = document.add_table(rows=2, cols=2)
+    table.rows[0].cells[0].text, table.rows[0].cells[1].text = "Income slab", "Rate"
+    table.rows[1].cells[0].text, table.rows[1].cells[1].text = "Above 15 lakh", "30%"
+    document.add_paragraph("Surcharge applies separately.")
+    document.save(tmp_path / "rates.docx")
+
+    assert utils.get_page_texts(str(tmp_path / "rates.docx")) == [
+        "Schedule of tax rates\nIncome slab | Rate\nAbove 15 lakh | 30%\nSurcharge applies separately."
+    ]
+
+def test_large_files_are_not_kept_for_download(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "FILE_BYTES_CACHE_MAX_FILE_BYTES", 16)
+    utils._file_bytes_cache.clear()
+    small, large = tmp_path / "small.pdf", tmp_path / "large.pdf"
+    small.write_bytes(b"%PDF small")
+    large.write_bytes(b"%PDF " + b"x" * 64)
+
+    assert utils.get_file_bytes(str(small)) == b"%PDF small"
+    assert utils.get_file_bytes(str(large)) == large.read_bytes()
+    assert [key[0] for key in utils._file_bytes_cache] == [str(small)]
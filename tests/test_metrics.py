@@ -0,0 +1,23 @@
+import logging
+
+import metrics
+
+def test_metrics_log_rotates_at_the_size_cap(tmp_path, monkeypatch):
+    log_path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(metrics, "METRICS_LOG_FILE", str(log_path))
+    monkeypatch.setattr(metrics, "METRICS_LOG_MAX_BYTES", 500)
+    monkeypatch.setattr(metrics, "METRICS_LOG_BACKUPS", 2)
+    monkeypatch.setattr(metrics, "_logger", None)
+    logger = logging.getLogger("apmh.metrics")
+    handlers = list(logger.handlers)
+    try:
+        for number in range(100):
+            metrics.log_event("stage", stage="retrieval", number=number)
+    finally:
+        for handler in logger.handlers:
+            if handler not in handlers:
+                handler.close()
+                logger.removeHandler(handler)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["metrics.jsonl", "metrics.jsonl.1", "metrics.jsonl.2"]
+    assert all(path.stat().st_size <= 500 for path in tmp_path.iterdir())
@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import query_service
+
+TOKEN = "test-token"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # An empty working directory has no global, regulatory or user index
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(query_service, "QUERY_SERVICE_TOKEN", TOKEN)
+    query_service._agents.clear()
+    with TestClient(query_service.app, headers={"Authorization": f"Bearer {TOKEN}"}) as client:
+        yield client
+
+def test_starts_without_any_index(client):
+    assert client.get("/health").json()["status"] == "ok"
+
+def test_answer_without_index_is_404(client):
+    response = client.post("/answer", json={"query": "What is a company?", "username": "alice"})
+    assert response.status_code == 404
+
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong-token", f"Basic {TOKEN}", TOKEN])
+def test_data_endpoints_require_the_bearer_token(client, authorization):
+    headers = {"Authorization": authorization} if authorization else {}
+    client.headers.pop("Authorization")
+    for endpoint, body in [("retrieve", {"query": "q", "username": "alice"}), ("answer", {"query": "q", "username": "alice"}), ("ingest", {"username": "alice", "source": "https://example.com"})]:
+        assert client.post(f"/{endpoint}", json=body, headers=headers).status_code == 401
+
+def test_data_endpoints_refuse_requests_without_a_configured_token(client, monkeypatch):
+    monkeypatch.setattr(query_service, "QUERY_SERVICE_TOKEN", None)
+    assert client.post("/answer", json={"query": "q", "username": "alice"}).status_code == 503
+
+@pytest.mark.parametrize("username", ["../alice", "alice/..", "a b", ""])
+def test_rejects_unsafe_usernames(client, username):
+    for endpoint in ("retrieve", "answer"):
+        assert client.post(f"/{endpoint}", json={"query": "q", "username": username}).status_code == 400
+    assert client.post("/ingest", json={"username": username, "source": "https://example.com"}).status_code == 400
+
+def test_ingest_rejects_files_outside_the_upload_directory(client, tmp_path):
+    (tmp_path / "user_data" / "bob").mkdir(parents=True)
+    (tmp_path / "user_data" / "alice").mkdir(parents=True)
+    (tmp_path / "user_data" / "alice" / "notes.txt").write_text("private")
+    (tmp_path / "outside.txt").write_text("server file")
+    for source in ["/etc/passwd", str(tmp_path / "outside.txt"), "user_data/alice/notes.txt", "user_data/bob/../alice/notes.txt", "file:///etc/passwd"]:
+        response = client.post("/ingest", json={"username": "bob", "source": source})
+        assert response.status_code == 400, source
+
+@pytest.mark.parametrize("source", [
+    "http://127.0.0.1:8000/metrics",
+    "http://localhost/admin",
+    "http://10.0.0.5/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/",
+    "http://192.168.1.1/",
+    "https:///no-host",
+])
+def test_ingest_rejects_urls_on_internal_hosts(client, source):
+    assert client.post("/ingest", json={"username": "bob", "source": source}).status_code == 400
+
+def test_agent_cache_is_capped(client, monkeypatch):
+    monkeypatch.setattr(query_service, "MAX_CACHED_AGENTS", 2)
+    monkeypatch.setattr(query_service, "load_global_vector_store", lambda: object())
+    monkeypatch.setattr(query_service, "get_combined_conversational_agent", lambda *args, **kwargs: object())
+    for username in ("alice", "bob", "carol"):
+        query_service.get_agent(username)
+    assert list(query_service._agents) == ["bob", "carol"]
@@ -0,0 +1,20 @@
+import glob
+import json
+import os
+
+import pytest
+
+from rbi_scraper import parse_rbi_listing
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "rbi")
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html"))), ids=os.path.basename)
+def test_listing_fixture_parses_to_expected_items(path):
+    with open(path, "rb") as f:
+        items = parse_rbi_listing(f.read())
+    with open(path[:-len(".html")] + ".expected.json", "r", encoding="utf-8") as f:
+        expected = json.load(f)
+    assert items == expected
+
+def test_fixtures_are_present():
+    assert glob.glob(os.path.join(FIXTURE_DIR, "*.html"))
@@ -0,0 +1,56 @@
+import datetime
+import json
+import threading
+
+import utils
+
+def release(web_server, path, date, title):
+    web_server.pages[path] = {"body": f"<html><body><h1>{title}</h1><p>{title} takes effect immediately.</p></body></html>"}
+    return {"date": date, "title": title, "url": web_server.url(path)}
+
+def load_manifest():
+    with open("regulatory_updates_index/manifest.json", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_undated_releases_expire_by_first_seen(fake_models, web_server):
+    recent = (datetime.datetime.now() - datetime.timedelta(days=2)).strftime("%b %d, %Y")
+    old = (datetime.datetime.now() - datetime.timedelta(days=60)).strftime("%b %d, %Y")
+    items = [
+        release(web_server, "/recent", recent, "Repo rate decision"),
+        release(web_server, "/undated", "No Date", "Draft framework on digital lending"),
+        release(web_server, "/old", old, "Withdrawn circular"),
+    ]
+
+    result = utils.update_regulatory_index({"RBI": items})
+
+    assert result == {"added": 2, "evicted": 0, "pending": 0, "indexed": 2}
+    manifest = load_manifest()
+    assert all("first_seen" in entry for entry in manifest["items"].values())
+
+    undated = next(key for key, entry in manifest["items"].items() if entry["date"] == "No Date")
+    manifest["items"][undated]["first_seen"] = (datetime.datetime.now() - datetime.timedelta(days=31)).isoformat(timespec="seconds")
+    utils._save_regulatory_manifest(manifest)
+
+    result = utils.update_regulatory_index({})
+
+    assert result["evicted"] == 1
+    assert undated not in load_manifest()["items"]
+
+def test_concurrent_updates_keep_every_release(fake_models, web_server):
+    today = datetime.datetime.now().strftime("%b %d, %Y")
+    batches = [
+        {"RBI": [release(web_server, f"/rbi/{number}", today, f"RBI notice {number}") for number in range(3)]},
+        {"SEBI": [release(web_server, f"/sebi/{number}", today, f"SEBI circular {number}") for number in range(3)]},
+    ]
+
+    threads = [threading.Thread(target=utils.update_regulatory_index, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    manifest = load_manifest()
+    assert len(manifest["items"]) == 6
+    store = utils.load_regulatory_vector_store()
+    indexed_ids = set(store.index_to_docstore_id.values())
+    assert all(set(entry["doc_ids"]) <= indexed_ids for entry in manifest["items"].values())
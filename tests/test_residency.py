@@ -0,0 +1,36 @@
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+import utils
+
+@pytest.fixture
+def residency(fake_models, monkeypatch):
+    residency = utils.VectorStoreResidency(budget_bytes=1 << 30, idle_seconds=60)
+    monkeypatch.setattr(utils, "vector_store_residency", residency)
+    return residency
+
+def build_user_index(username, text):
+    store = FAISS.from_documents([Document(page_content=text, metadata={"source_file": "notes.txt"})], utils.get_embeddings())
+    store.save_local(f"user_data/{username}/faiss_index")
+
+def test_agent_reloads_the_user_index_after_eviction(residency):
+    build_user_index("alice", "Section 149 requires independent directors.")
+    agent = utils.get_conversational_agent(utils.load_user_vector_store("alice"), "test", username="alice")
+    assert agent.invoke({"query": "independent directors"})["source_documents"]
+
+    residency.evict("alice")
+    assert not residency.is_resident("alice")
+    assert agent.invoke({"query": "independent directors"})["source_documents"]
+    assert residency.metrics()["loads"] == 2
+
+def test_idle_indexes_are_evicted_on_access(residency):
+    build_user_index("alice", "Alice's board minutes.")
+    build_user_index("bob", "Bob's annual report.")
+    residency.get("alice")
+    residency.get("bob")
+    residency.entries["alice"]["last_used"] -= 120
+
+    residency.get("bob")
+    assert not residency.is_resident("alice")
+    assert residency.is_resident("bob")
@@ -0,0 +1,35 @@
+import os
+import threading
+
+import scrape_storage
+import scrapers
+
+def parse_listing(content):
+    return [{"date": "Oct 01, 2026", "title": "Circular on KYC", "url": "https://example.org/kyc"}]
+
+def state_files():
+    return {name: os.stat(os.path.join(scrape_storage.SCRAPE_STATE_DIR, name)).st_mtime_ns
+            for name in os.listdir(scrape_storage.SCRAPE_STATE_DIR)}
+
+def test_unchanged_listing_writes_nothing(tmp_path, monkeypatch, web_server):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scrape_storage, "_local", threading.local())
+    monkeypatch.setattr(scrape_storage, "_unchanged_runs", {})
+    web_server.pages["/listing"] = {"body": "<html>listing</html>", "etag": '"listing-1"'}
+    site = scrapers.SiteScraper("TEST", "Test Regulator", "Test", web_server.url("/listing"), parse_listing, min_interval=0)
+
+    first = scrapers.scrape_site(site)
+    assert (first["status"], first["new"]) == ("ok", 1)
+    scrape_storage.record_scrape_result(first)
+    before = state_files()
+
+    second = scrapers.scrape_site(site)
+    assert second["status"] == "unchanged"
+    assert web_server.request_headers("/listing")[-1]["If-None-Match"] == '"listing-1"'
+    scrape_storage.record_scrape_result(second)
+    assert state_files() == before
+    assert scrape_storage.load_scrape_status()["sites"]["TEST"]["runs"] == 2
+
+    web_server.pages["/listing"] = {"body": "<html>listing 2</html>", "etag": '"listing-2"'}
+    scrape_storage.record_scrape_result(scrapers.scrape_site(site))
+    assert scrape_storage._read_status_file()["sites"]["TEST"]["runs"] == 3
@@ -0,0 +1,33 @@
+import pytest
+from langchain_core.prompts import PromptTemplate
+
+import utils
+from fake_backends import FakeChatModel
+
+DOCUMENT_QUESTIONS = [
+    "Summarize this document",
+    "Give me an overview",
+    "What are the key points of the act?",
+    "What is this bill about?",
+    "Main points of the entire circular, please",
+]
+SPECIFIC_QUESTIONS = [
+    "What are the key points of section 80C?",
+    "Give me an overview of the TDS provisions for NRIs",
+    "Summarize clause 4(b)",
+    "Key points about capital gains exemptions",
+    "Summarize section 10 of this act",
+]
+
+@pytest.mark.parametrize("question, routed_to_summary", [(q, True) for q in DOCUMENT_QUESTIONS] + [(q, False) for q in SPECIFIC_QUESTIONS])
+def test_only_document_level_questions_use_the_summary_tree(monkeypatch, question, routed_to_summary):
+    summarized, retrieved = [], []
+    monkeypatch.setattr(utils, "answer_from_summaries", lambda llm, query, trees, max_chars: summarized.append(query) or {"result": "summary"})
+    def retrieval(query, query_embedding=None):
+        retrieved.append(query)
+        return []
+    prompt = PromptTemplate(template="{context}\n{question}", input_variables=["context", "question"])
+    agent = utils.CombinedRetrievalQA(FakeChatModel(), prompt, retrieval, summary_trees={"finance_act.pdf": {}})
+
+    agent._route(question, {}, economy=False)
+    assert (summarized, retrieved) == (([question], []) if routed_to_summary else ([], [question]))
@@ -0,0 +1,29 @@
+import json
+
+import pandas as pd
+import pytest
+from langchain_core.messages import AIMessage
+
+import utils
+
+DF = pd.DataFrame({"region": ["North", "South", "North"], "revenue": [10.0, 20.0, 30.0]})
+
+@pytest.mark.parametrize("operation, expected", [("sum", 60.0), ("mean", 20.0), ("max", 30.0), ("count", 3)])
+def test_whitelisted_operations(operation, expected):
+    result, rows = utils.run_table_query(DF, {"operation": operation, "column": "revenue"})
+    assert result == expected
+    assert rows == 3
+
+@pytest.mark.parametrize("operation", ["to_pickle", "cumsum", "summ", None])
+def test_other_operations_are_rejected(operation):
+    with pytest.raises(ValueError):
+        utils.run_table_query(DF, {"operation": operation, "column": "revenue", "group_by": ["region"]})
+
+def test_unknown_operation_falls_back_to_retrieval(tmp_path):
+    table_path = tmp_path / "sales.parquet"
+    DF.to_parquet(table_path)
+    class Planner:
+        def invoke(self, prompt):
+            return AIMessage(content=json.dumps({"table": "sales", "operation": "to_clipboard", "column": "revenue"}))
+    tables = {"sales": {"schema": "region, revenue", "table_path": str(table_path)}}
+    assert utils.answer_from_table(Planner(), "What is the total revenue?", tables) is None
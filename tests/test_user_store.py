@@ -0,0 +1,49 @@
+import json
+import threading
+
+import pytest
+
+import user_store
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    """A fresh user database, with users.json looked up in an empty directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(user_store, "USER_DB_PATH", str(tmp_path / "users.db"))
+    monkeypatch.setattr(user_store, "_local", threading.local())
+    monkeypatch.setattr(user_store, "_hash_cache", {})
+    return user_store
+
+def test_created_user_can_be_looked_up(users):
+    assert users.create_user("alice", "hash-a")
+    assert users.get_password_hash("alice") == "hash-a"
+    assert users.get_password_hash("bob") is None
+    assert users.get_all_users() == {"alice": "hash-a"}
+
+def test_duplicate_username_is_rejected(users):
+    assert users.create_user("alice", "hash-a")
+    assert not users.create_user("alice", "hash-b")
+    assert users.get_password_hash("alice") == "hash-a"
+    assert users.count_users() == 1
+
+def test_concurrent_registrations_of_one_name_succeed_once(users):
+    results = []
+    threads = [threading.Thread(target=lambda n=n: results.append(users.create_user("carol", f"hash-{n}"))) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+    assert users.count_users() == 1
+
+def test_users_json_is_migrated_once(users, tmp_path):
+    (tmp_path / "users.json").write_text(json.dumps({"alice": "hash-a", "bob": "hash-b"}))
+    assert users.get_all_users() == {"alice": "hash-a", "bob": "hash-b"}
+
+    (tmp_path / "users.json").write_text(json.dumps({"mallory": "hash-m"}))
+    assert users.migrate_users_json() == 0
+    assert users.get_password_hash("mallory") is None
+
+@pytest.mark.parametrize("username, valid", [("alice", True), ("a_b-1", True), ("", False), ("../alice", False), ("a b", False), ("ali.ce", False)])
+def test_username_validation(username, valid):
+    assert user_store.is_valid_username(username) is valid
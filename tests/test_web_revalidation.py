@@ -0,0 +1,47 @@
+import utils
+
+PAGE = "<html><head><title>Circular {version}</title></head><body><p>Banks shall report {detail} by the fifth of every month.</p></body></html>"
+
+def ingest(url):
+    utils.process_and_store_single_doc("alice", url)
+    with open("user_data/alice/web_content_page.url", "w") as f:
+        f.write(f"Source URL: {url}\nProcessed: 2024-01-01 00:00:00\n")
+
+def index_text():
+    store = utils.load_vector_store("user_data/alice/faiss_index")
+    return " ".join(doc.page_content for doc in store.docstore._dict.values())
+
+def test_unchanged_page_is_revalidated_without_re_embedding(fake_models, web_server):
+    web_server.pages["/circular"] = {"body": PAGE.format(version=1, detail="liquidity"), "etag": '"v1"'}
+    url = web_server.url("/circular")
+    ingest(url)
+    fake_models.embedded_texts = 0
+
+    result = utils.refresh_web_document("alice")
+
+    assert result["changed"] is False
+    assert web_server.request_headers("/circular")[-1]["If-None-Match"] == '"v1"'
+    assert fake_models.embedded_texts == 0
+
+def test_last_modified_is_sent_when_there_is_no_etag(fake_models, web_server):
+    last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+    web_server.pages["/circular"] = {"body": PAGE.format(version=1, detail="liquidity"), "last_modified": last_modified}
+    ingest(web_server.url("/circular"))
+    fake_models.embedded_texts = 0
+
+    assert utils.refresh_web_document("alice")["changed"] is False
+    assert web_server.request_headers("/circular")[-1]["If-Modified-Since"] == last_modified
+    assert fake_models.embedded_texts == 0
+
+def test_changed_page_is_re_embedded(fake_models, web_server):
+    web_server.pages["/circular"] = {"body": PAGE.format(version=1, detail="liquidity"), "etag": '"v1"'}
+    ingest(web_server.url("/circular"))
+    fake_models.embedded_texts = 0
+
+    web_server.pages["/circular"] = {"body": PAGE.format(version=2, detail="capital adequacy"), "etag": '"v2"'}
+    result = utils.refresh_web_document("alice")
+
+    assert result["changed"] is True
+    assert fake_models.embedded_texts > 0
+    assert "capital adequacy" in index_text()
+    assert "liquidity" not in index_text()
@@ -0,0 +1,254 @@
+import os
+import json
+import sqlite3
+import hashlib
+import argparse
+import datetime
+import threading
+import contextvars
+from contextlib import contextmanager
+
+USAGE_DB_PATH = os.environ.get("USAGE_DB_PATH", "usage.db")
+
+# USD per million tokens as (input, output); override with TOKEN_PRICES='{"model": [input, output]}'
+TOKEN_PRICES = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "models/embedding-001": (0.0, 0.0),
+}
+TOKEN_PRICES.update({model: tuple(prices) for model, prices in json.loads(os.environ.get("TOKEN_PRICES", "{}")).items()})
+
+# Budgets apply to users without their own row in the budgets table; unset means unlimited
+DEFAULT_DAILY_BUDGET_USD = float(os.environ["DAILY_BUDGET_USD"]) if os.environ.get("DAILY_BUDGET_USD") else None
+DEFAULT_MONTHLY_BUDGET_USD = float(os.environ["MONTHLY_BUDGET_USD"]) if os.environ.get("MONTHLY_BUDGET_USD") else None
+ANSWER_CACHE_TTL_HOURS = float(os.environ.get("ANSWER_CACHE_TTL_HOURS", "24"))
+
+_local = threading.local()
+# Context variables follow the call into LangChain's batch executor and asyncio.to_thread, unlike thread-locals
+_usage_context = contextvars.ContextVar("usage_context", default={})
+_prompt_sources = contextvars.ContextVar("prompt_sources", default=None)
+
+def get_connection():
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(USAGE_DB_PATH, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        # One row per day, user, chat, operation, context source and model, incremented in place
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS usage_daily (
+                day TEXT NOT NULL,
+                username TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                source TEXT NOT NULL,
+                model TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                context_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                cost_usd REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, username, chat_id, operation, source, model)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS usage_daily_user_day ON usage_daily (username, day);
+            CREATE TABLE IF NOT EXISTS budgets (
+                username TEXT PRIMARY KEY,
+                daily_usd REAL,
+                monthly_usd REAL
+            );
+            CREATE TABLE IF NOT EXISTS answer_cache (
+                username TEXT NOT NULL,
+                question_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (username, question_hash)
+            );
+            CREATE INDEX IF NOT EXISTS answer_cache_created_at ON answer_cache (created_at);
+        """)
+        _local.connection = connection
+    return connection
+
+def estimate_tokens(text):
+    # Gemini averages roughly four characters per token on English text
+    return max(1, len(text) // 4)
+
+def token_cost(model, input_tokens, output_tokens):
+    input_price, output_price = TOKEN_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1e6
+
+@contextmanager
+def usage_context(username=None, chat_id=None):
+    """Attribute every model call made inside the block to this user and chat"""
+    token = _usage_context.set({"username": username or "", "chat_id": chat_id or ""})
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+def current_username():
+    return _usage_context.get().get("username") or None
+
+@contextmanager
+def prompt_sources(chars_by_source, prompt_chars):
+    """Mark how many prompt characters came from each retrieval source, to split context tokens by source"""
+    token = _prompt_sources.set((chars_by_source, prompt_chars))
+    try:
+        yield
+    finally:
+        _prompt_sources.reset(token)
+
+def current_prompt_sources():
+    return _prompt_sources.get()
+
+def record_usage(operation, model, prompt_tokens=0, completion_tokens=0, context_tokens_by_source=None):
+    context = _usage_context.get()
+    day = datetime.date.today().isoformat()
+    context_tokens_by_source = context_tokens_by_source or {}
+    rows = [(operation, "", 1, prompt_tokens, 0, completion_tokens, token_cost(model, prompt_tokens, completion_tokens))]
+    rows.extend(
+        (operation, source, 0, 0, tokens, 0, token_cost(model, tokens, 0))
+        for source, tokens in context_tokens_by_source.items()
+    )
+    connection = get_connection()
+    with connection:
+        connection.executemany("""
+            INSERT INTO usage_daily (day, username, chat_id, operation, source, model, calls, prompt_tokens, context_tokens, completion_tokens, cost_usd)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (day, username, chat_id, operation, source, model) DO UPDATE SET
+                calls = calls + excluded.calls,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                context_tokens = context_tokens + excluded.context_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens,
+                cost_usd = cost_usd + excluded.cost_usd
+        """, [
+            (day, context.get("username", ""), context.get("chat_id", ""), operation, source, model, calls, prompt, context_tokens, completion, cost)
+            for operation, source, calls, prompt, context_tokens, completion, cost in rows
+        ])
+
+def set_budget(username, daily_usd=None, monthly_usd=None):
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO budgets (username, daily_usd, monthly_usd) VALUES (?, ?, ?)",
+            (username, daily_usd, monthly_usd)
+        )
+
+def get_budget(username):
+    row = get_connection().execute("SELECT daily_usd, monthly_usd FROM budgets WHERE username = ?", (username,)).fetchone()
+    return row if row else (DEFAULT_DAILY_BUDGET_USD, DEFAULT_MONTHLY_BUDGET_USD)
+
+def get_spend(username, since_day):
+    row = get_connection().execute(
+        "SELECT COALESCE(SUM(cost_usd), 0) FROM usage_daily WHERE username = ? AND day >= ?",
+        (username, since_day)
+    ).fetchone()
+    return row[0]
+
+def budget_status(username):
+    today = datetime.date.today()
+    daily_budget, monthly_budget = get_budget(username)
+    daily_spent = get_spend(username, today.isoformat())
+    monthly_spent = get_spend(username, today.replace(day=1).isoformat())
+    return {
+        "daily_spent_usd": round(daily_spent, 6),
+        "daily_budget_usd": daily_budget,
+        "monthly_spent_usd": round(monthly_spent, 6),
+        "monthly_budget_usd": monthly_budget,
+        "exceeded": (daily_budget is not None and daily_spent >= daily_budget)
+                    or (monthly_budget is not None and monthly_spent >= monthly_budget)
+    }
+
+def budget_exceeded(username):
+    if not username:
+        return False
+    daily_budget, monthly_budget = get_budget(username)
+    if daily_budget is None and monthly_budget is None:
+        return False
+    return budget_status(username)["exceeded"]
+
+def _question_hash(question, version=""):
+    # The version names the indexes the answer came from, so replacing a document misses the old answers
+    return hashlib.sha256(f"{version}\n{' '.join(question.lower().split())}".encode("utf-8")).hexdigest()
+
+def get_cached_answer(username, question, version=""):
+    row = get_connection().execute(
+        "SELECT response, created_at FROM answer_cache WHERE username = ? AND question_hash = ?",
+        (username, _question_hash(question, version))
+    ).fetchone()
+    if not row:
+        return None
+    age = datetime.datetime.now() - datetime.datetime.fromisoformat(row[1])
+    if age > datetime.timedelta(hours=ANSWER_CACHE_TTL_HOURS):
+        return None
+    return json.loads(row[0])
+
+def cache_answer(username, question, response, version=""):
+    """Keep a user's answer so a repeated question costs nothing once they are over budget; expired answers are pruned"""
+    payload = {
+        "result": response["result"],
+        "source_documents": [
+            {"page_content": doc.page_content, "metadata": doc.metadata}
+            for doc in response.get("source_documents", [])
+        ]
+    }
+    now = datetime.datetime.now()
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "DELETE FROM answer_cache WHERE created_at < ?",
+            ((now - datetime.timedelta(hours=ANSWER_CACHE_TTL_HOURS)).isoformat(timespec="seconds"),)
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO answer_cache (username, question_hash, response, created_at) VALUES (?, ?, ?, ?)",
+            (username, _question_hash(question, version), json.dumps(payload, ensure_ascii=False, default=str), now.isoformat(timespec="seconds"))
+        )
+
+def clear_cached_answers(username):
+    connection = get_connection()
+    with connection:
+        connection.execute("DELETE FROM answer_cache WHERE username = ?", (username,))
+
+def usage_report(days=30, username=None, group_by=("username",)):
+    """Token and cost totals over the last `days` days, grouped by any of day/username/chat_id/operation/source/model"""
+    columns = [column for column in group_by if column in ("day", "username", "chat_id", "operation", "source", "model")]
+    since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+    query = f"""
+        SELECT {", ".join(columns + [""]) if columns else ""}
+            SUM(calls), SUM(prompt_tokens), SUM(context_tokens), SUM(completion_tokens), SUM(cost_usd)
+        FROM usage_daily WHERE day >= ?{" AND username = ?" if username else ""}
+        {"GROUP BY " + ", ".join(columns) if columns else ""}
+        ORDER BY SUM(cost_usd) DESC
+    """
+    params = [since] + ([username] if username else [])
+    keys = columns + ["calls", "prompt_tokens", "context_tokens", "completion_tokens", "cost_usd"]
+    return [dict(zip(keys, row)) for row in get_connection().execute(query, params).fetchall()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Report token usage and manage per-user budgets")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report")
+    report.add_argument("--days", type=int, default=30)
+    report.add_argument("--user")
+    report.add_argument("--by", default="username", help="comma-separated: day, username, chat_id, operation, source, model")
+    budget = commands.add_parser("budget")
+    budget.add_argument("username")
+    budget.add_argument("--daily", type=float, help="USD per day")
+    budget.add_argument("--monthly", type=float, help="USD per calendar month")
+    args = parser.parse_args()
+
+    if args.command == "budget":
+        if args.daily is not None or args.monthly is not None:
+            set_budget(args.username, args.daily, args.monthly)
+        print(json.dumps(dict(budget_status(args.username), username=args.username), indent=4))
+        return
+
+    rows = usage_report(args.days, args.user, args.by.split(","))
+    if not rows:
+        print("No usage recorded")
+        return
+    columns = list(rows[0])
+    print(" | ".join(columns))
+    for row in rows:
+        print(" | ".join(f"{value:.4f}" if isinstance(value, float) else str(value) for value in row.values()))
+
+if __name__ == "__main__":
+    main()
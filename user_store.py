@@ -0,0 +1,92 @@
+import os
+import re
+import json
+import sqlite3
+import datetime
+import threading
+
+USER_DB_PATH = os.environ.get("USER_DB_PATH", "users.db")
+LEGACY_USERS_FILE = "users.json"
+
+# Usernames name directories under user_data/, so only plain name characters are allowed
+USERNAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+_local = threading.local()
+# Password hashes never change once registered, so found users can be cached for the life of the process
+_hash_cache = {}
+
+def get_connection():
+    """Per-thread connection to the user database; the first connection migrates users.json"""
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(USER_DB_PATH, timeout=30)
+        # WAL keeps logins reading while another Streamlit process registers a user
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password_hash TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at TEXT NOT NULL);
+        """)
+        _local.connection = connection
+        migrate_users_json(connection)
+    return connection
+
+def migrate_users_json(connection=None, path=LEGACY_USERS_FILE):
+    """Copy accounts from the old users.json once; existing database rows win over the file"""
+    connection = connection or get_connection()
+    if connection.execute("SELECT 1 FROM migrations WHERE name = 'users_json'").fetchone():
+        return 0
+
+    users = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            users = json.load(f)
+
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    with connection:
+        before = connection.total_changes
+        connection.executemany(
+            "INSERT OR IGNORE INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+            [(username, password_hash, now) for username, password_hash in users.items()]
+        )
+        migrated = connection.total_changes - before
+        connection.execute("INSERT OR IGNORE INTO migrations (name, applied_at) VALUES ('users_json', ?)", (now,))
+    if migrated:
+        print(f"Migrated {migrated} users from {path} to {USER_DB_PATH}")
+    return migrated
+
+def is_valid_username(username):
+    return bool(username) and USERNAME_PATTERN.fullmatch(username) is not None
+
+def get_password_hash(username):
+    if username in _hash_cache:
+        return _hash_cache[username]
+    row = get_connection().execute("SELECT password_hash FROM users WHERE username = ?", (username,)).fetchone()
+    if row is None:
+        return None
+    _hash_cache[username] = row[0]
+    return row[0]
+
+def create_user(username, password_hash):
+    """Insert a user atomically; False when the name is already taken, even by a concurrent registration"""
+    connection = get_connection()
+    try:
+        with connection:
+            connection.execute(
+                "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                (username, password_hash, datetime.datetime.now().isoformat(timespec="seconds"))
+            )
+    except sqlite3.IntegrityError:
+        return False
+    _hash_cache[username] = password_hash
+    return True
+
+def get_all_users():
+    return dict(get_connection().execute("SELECT username, password_hash FROM users").fetchall())
+
+def count_users():
+    return get_connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
@@ -1,49 +1,48 @@
 import os
+import re
 import json
+import time
+import datetime
 import hashlib
+import threading
+from collections import OrderedDict
 import streamlit as st
-import google.generativeai as genai
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    UnstructuredWordDocumentLoader,
-    TextLoader,
-    WebBaseLoader,
-    CSVLoader,
-)
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_core.messages import HumanMessage, AIMessage
-from pypdf import PdfReader
-from docx import Document
+from user_store import get_password_hash, create_user, get_all_users, is_valid_username
+from metrics import timer, collect_timings
+from usage_store import prompt_sources, current_username, budget_exceeded, get_cached_answer, cache_answer, clear_cached_answers
+from scrape_storage import count_items
+
+# LangChain, Gemini, FAISS and the document parsers are imported inside the functions that use them,
+# so the login page renders without loading them; check with `python bench_import_time.py`
 
 try:
     GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
-    genai.configure(api_key=GOOGLE_API_KEY)
     os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
-except KeyError:
-    st.error("`GOOGLE_API_KEY` not found in `.streamlit/secrets.toml`. Please add it to your secrets file.")
-    st.stop()
+except (KeyError, FileNotFoundError):
+    # Headless entry points (batch runner, services) configure the key through the environment;
+    # the Gemini clients read it from there
+    if not os.environ.get("GOOGLE_API_KEY"):
+        st.error("`GOOGLE_API_KEY` not found in `.streamlit/secrets.toml`. Please add it to your secrets file.")
+        st.stop()
 
 def get_user_db():
-    if not os.path.exists("users.json"):
-        with open("users.json", "w") as f:
-            json.dump({}, f)
-    with open("users.json", "r") as f:
-        return json.load(f)
+    return get_all_users()
 
 def save_user_db(db):
-    with open("users.json", "w") as f:
-        json.dump(db, f, indent=4)
+    for username, password_hash in db.items():
+        create_user(username, password_hash)
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 def verify_user(username, password):
-    db = get_user_db()
-    if username in db and db[username] == hash_password(password):
-        return True
-    return False
+    password_hash = get_password_hash(username)
+    return password_hash is not None and password_hash == hash_password(password)
+
+ADMIN_USERS = {name.strip() for name in os.environ.get("ADMIN_USERS", "admin").split(",") if name.strip()}
+
+def is_admin(username):
+    return username in ADMIN_USERS
 
 def _ensure_chat_dir(username):
     chat_dir = os.path.join("user_data", username, "chats")
@@ -51,60 +50,961 @@ def _ensure_chat_dir(username):
     return chat_dir
 
 def register_user(username, password):
-    db = get_user_db()
-    if username in db:
+    if not is_valid_username(username) or not create_user(username, hash_password(password)):
         return False
-    db[username] = hash_password(password)
-    save_user_db(db)
     os.makedirs(os.path.join("user_data", username), exist_ok=True)
     _ensure_chat_dir(username)
     return True
 
-def load_document(file_path_or_url):
+EMBEDDING_MODEL = "models/embedding-001"
+LLM_MODEL = "gemini-1.5-flash"
+
+def get_embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from instrumented_models import TimedEmbeddings, MeteredEmbeddings
+    return TimedEmbeddings(MeteredEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL))
+
+def get_llm(temperature=0.7, operation="answer"):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from instrumented_models import UsageCallbackHandler
+    return ChatGoogleGenerativeAI(
+        model=LLM_MODEL,
+        temperature=temperature,
+        callbacks=[UsageCallbackHandler(operation, LLM_MODEL)]
+    )
+
+def load_document(file_path_or_url, revalidate=True):
+    with timer("document_load", source_type="file" if os.path.exists(file_path_or_url) else "url"):
+        return _load_document(file_path_or_url, revalidate)
+
+def _load_document(file_path_or_url, revalidate=True):
+    from langchain_community.document_loaders import TextLoader
     if os.path.exists(file_path_or_url): 
         _, file_extension = os.path.splitext(file_path_or_url)
-        if file_extension.lower() == '.pdf':
-            loader = PyPDFLoader(file_path_or_url)
-        elif file_extension.lower() == '.docx':
-            loader = UnstructuredWordDocumentLoader(file_path_or_url)
+        if file_extension.lower() in ('.pdf', '.docx'):
+            loader = None
         elif file_extension.lower() == '.txt':
             loader = TextLoader(file_path_or_url)
         elif file_extension.lower() == '.csv':
-            loader = CSVLoader(file_path_or_url)
+            loader = None
         else:
             raise ValueError(f"Unsupported file type: {file_extension}")
         
-        docs = loader.load()
+        if loader:
+            docs = loader.load()
+        elif file_extension.lower() == '.csv':
+            docs = load_csv_documents(file_path_or_url)
+        else:
+            docs = load_extracted_pages(file_path_or_url)
         for doc in docs:
             doc.metadata['source_file'] = os.path.basename(file_path_or_url)
             doc.metadata['source_type'] = 'uploaded_file'
         return docs
     else: 
         try:
-            loader = WebBaseLoader(file_path_or_url)
-            docs = loader.load()
-            
-            from urllib.parse import urlparse
-            parsed_url = urlparse(file_path_or_url)
-            domain = parsed_url.netloc
-            
-            for doc in docs:
-                doc.metadata['source_file'] = f"{domain} (Web Content)"
-                doc.metadata['source_type'] = 'web_url'
-                doc.metadata['source_url'] = file_path_or_url
-            return docs
+            snapshot = get_web_snapshot(file_path_or_url, revalidate=revalidate)
         except Exception as e:
             raise ValueError(f"Could not load from URL. Error: {e}")
+        return web_snapshot_documents(snapshot)
+
+WEB_SNAPSHOT_DIR = "web_snapshots"
+
+WEB_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
+
+_http_session = None
+
+def get_http_session(pool_size=32, retries=3):
+    global _http_session
+    if _http_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        session = requests.Session()
+        session.headers.update(WEB_HEADERS)
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET", "HEAD"]
+            )
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _http_session = session
+    return _http_session
+
+def _web_snapshot_path(url):
+    return os.path.join(WEB_SNAPSHOT_DIR, f"{hashlib.sha256(url.encode()).hexdigest()}.json")
+
+def load_web_snapshot(url):
+    snapshot_path = _web_snapshot_path(url)
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        with open(snapshot_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return None
+
+def _save_web_snapshot(snapshot):
+    os.makedirs(WEB_SNAPSHOT_DIR, exist_ok=True)
+    snapshot_path = _web_snapshot_path(snapshot["url"])
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=4)
+    os.replace(tmp_path, snapshot_path)
+
+def parse_web_page(html, url):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    # Same text and metadata as WebBaseLoader so indexes built before snapshots stay comparable
+    metadata = {"source": url}
+    if soup.find("title"):
+        metadata["title"] = soup.find("title").get_text()
+    description = soup.find("meta", attrs={"name": "description"})
+    if description:
+        metadata["description"] = description.get("content", "No description found.")
+    html_tag = soup.find("html")
+    if html_tag:
+        metadata["language"] = html_tag.get("lang", "No language found.")
+    return soup.get_text(), metadata
+
+def fetch_web_snapshot(url, snapshot=None, timeout=30):
+    headers = {}
+    if snapshot:
+        if snapshot.get("etag"):
+            headers["If-None-Match"] = snapshot["etag"]
+        if snapshot.get("last_modified"):
+            headers["If-Modified-Since"] = snapshot["last_modified"]
+    
+    response = get_http_session().get(url, headers=headers, timeout=timeout)
+    fetched_at = datetime.datetime.now().isoformat(timespec="seconds")
+    if response.status_code == 304 and snapshot:
+        snapshot = dict(snapshot, validated_at=fetched_at)
+        _save_web_snapshot(snapshot)
+        return snapshot, False
+    response.raise_for_status()
+    
+    content, metadata = parse_web_page(response.content, url)
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    changed = not snapshot or snapshot.get("content_hash") != content_hash
+    snapshot = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": content_hash,
+        "fetched_at": fetched_at if changed else snapshot.get("fetched_at", fetched_at),
+        "validated_at": fetched_at,
+        "metadata": metadata,
+        "content": content
+    }
+    _save_web_snapshot(snapshot)
+    return snapshot, changed
+
+def get_web_snapshot(url, revalidate=True):
+    snapshot = load_web_snapshot(url)
+    if snapshot and not revalidate:
+        return snapshot
+    snapshot, _ = fetch_web_snapshot(url, snapshot)
+    return snapshot
+
+def web_snapshot_documents(snapshot):
+    from urllib.parse import urlparse
+    from langchain_core.documents import Document as LangchainDocument
+    domain = urlparse(snapshot["url"]).netloc
+    metadata = dict(snapshot.get("metadata") or {"source": snapshot["url"]})
+    metadata['source_file'] = f"{domain} (Web Content)"
+    metadata['source_type'] = 'web_url'
+    metadata['source_url'] = snapshot["url"]
+    return [LangchainDocument(page_content=snapshot["content"], metadata=metadata)]
+
+def normalize_url(url):
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+    url = url.strip()
+    if not url:
+        return None
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if not host:
+        return None
+    port = parts.port
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    path = parts.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+def dedupe_urls(urls):
+    seen = set()
+    unique = []
+    for url in urls:
+        normalized = normalize_url(url)
+        if normalized and normalized not in seen:
+            seen.add(normalized)
+            unique.append(normalized)
+    return unique
+
+def _fetch_url_with_host_limit(url, host_limits, host_limits_lock, per_host_limit, timeout):
+    from urllib.parse import urlsplit
+    host = urlsplit(url).netloc
+    with host_limits_lock:
+        semaphore = host_limits.setdefault(host, threading.Semaphore(per_host_limit))
+    start = time.perf_counter()
+    with semaphore:
+        try:
+            snapshot, _ = fetch_web_snapshot(url, load_web_snapshot(url), timeout=timeout)
+            return {"url": url, "status": "ok", "snapshot": snapshot, "seconds": time.perf_counter() - start}
+        except Exception as e:
+            return {"url": url, "status": "error", "error": str(e), "seconds": time.perf_counter() - start}
+
+def process_and_store_urls(username, urls, max_workers=16, per_host_limit=4, timeout=30, embed_batch_size=64, progress_callback=None):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from langchain_community.vectorstores import FAISS
+    from dedup import NearDuplicateIndex
+    
+    user_dir = os.path.join("user_data", username)
+    vector_store_path = os.path.join(user_dir, "faiss_index")
+    urls = dedupe_urls(urls)
+    if not urls:
+        raise ValueError("No valid URLs provided")
+    
+    embeddings = get_embeddings()
+    vectordb = None
+    all_docs = []
+    all_chunks = []
+    pending_chunks = []
+    statuses = []
+    host_limits = {}
+    host_limits_lock = threading.Lock()
+    duplicate_index = NearDuplicateIndex()
+    
+    def flush(chunks):
+        nonlocal vectordb
+        if not chunks:
+            return
+        if vectordb is None:
+            vectordb = FAISS.from_documents(chunks, embeddings)
+        else:
+            vectordb.add_documents(chunks)
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_fetch_url_with_host_limit, url, host_limits, host_limits_lock, per_host_limit, timeout)
+            for url in urls
+        ]
+        # Pages are split and embedded as they arrive, while slower hosts are still downloading
+        for future in as_completed(futures):
+            result = future.result()
+            snapshot = result.pop("snapshot", None)
+            if snapshot:
+                docs = web_snapshot_documents(snapshot)
+                for doc in docs:
+                    doc.metadata['source_file'] = snapshot["url"]
+                chunks = split_documents(docs)
+                result["chunks"] = len(chunks)
+                all_docs.extend(docs)
+                all_chunks.extend(chunks)
+                # Boilerplate repeated across pages becomes an alias of the first copy instead of a new vector
+                pending_chunks.extend(chunk for chunk in chunks if duplicate_index.add(chunk))
+                if len(pending_chunks) >= embed_batch_size:
+                    flush(pending_chunks)
+                    pending_chunks = []
+            statuses.append(result)
+            if progress_callback:
+                progress_callback(len(statuses), len(urls), result)
+    flush(pending_chunks)
+    
+    elapsed = time.perf_counter() - start
+    fetched = sum(1 for result in statuses if result["status"] == "ok")
+    report = {
+        "urls": len(urls),
+        "fetched": fetched,
+        "failed": len(urls) - fetched,
+        "chunks": len(all_chunks),
+        "seconds": round(elapsed, 2),
+        "pages_per_second": round(fetched / elapsed, 2) if elapsed else 0.0,
+        "dedup": duplicate_index.report(),
+        "statuses": statuses
+    }
+    if vectordb is None:
+        return report
+    
+    with timer("index_write", index="user"):
+        vectordb.save_local(vector_store_path)
+    save_dedup_report(vector_store_path, report["dedup"])
+    generate_suggested_questions(vector_store_path, all_docs, all_chunks)
+    build_summary_trees(vector_store_path, all_docs, all_chunks)
+    
+    with open(os.path.join(user_dir, "web_content_bulk.url"), 'w') as f:
+        for result in statuses:
+            if result["status"] == "ok":
+                f.write(f"Source URL: {result['url']}\n")
+        f.write(f"Processed: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    
+    print(f"Bulk ingestion: {fetched}/{len(urls)} URLs, {len(all_chunks)} chunks in {elapsed:.1f}s ({report['pages_per_second']} pages/s)")
+    return report
+
+def get_user_web_source_urls(username):
+    """Every URL recorded in the user's .url marker; bulk ingestion writes one Source URL line per page"""
+    user_dir = os.path.join("user_data", username)
+    if not os.path.exists(user_dir):
+        return []
+    url_files = [f for f in os.listdir(user_dir) if f.endswith('.url')]
+    if not url_files:
+        return []
+    with open(os.path.join(user_dir, url_files[0]), 'r') as f:
+        return [
+            line.replace('Source URL:', '').strip()
+            for line in f.read().split('\n')
+            if line.startswith('Source URL:')
+        ]
+
+def index_web_snapshots(username, snapshots):
+    """Build the user's index from stored page snapshots, the same way bulk ingestion does"""
+    from langchain_community.vectorstores import FAISS
+    from dedup import NearDuplicateIndex
+    vector_store_path = os.path.join("user_data", username, "faiss_index")
+    duplicate_index = NearDuplicateIndex()
+    all_docs = []
+    all_chunks = []
+    for snapshot in snapshots:
+        docs = web_snapshot_documents(snapshot)
+        for doc in docs:
+            doc.metadata['source_file'] = snapshot["url"]
+        all_docs.extend(docs)
+        all_chunks.extend(split_documents(docs))
+    canonical_chunks = [chunk for chunk in all_chunks if duplicate_index.add(chunk)]
+    vectordb = FAISS.from_documents(canonical_chunks, get_embeddings())
+    with timer("index_write", index="user"):
+        vectordb.save_local(vector_store_path)
+    save_dedup_report(vector_store_path, duplicate_index.report())
+    generate_suggested_questions(vector_store_path, all_docs, all_chunks)
+    build_summary_trees(vector_store_path, all_docs, all_chunks)
+
+def rebuild_web_index(username, revalidate=False):
+    """Re-ingest every URL in the user's marker, from the stored snapshots unless revalidate is set"""
+    urls = get_user_web_source_urls(username)
+    if not urls:
+        raise ValueError("No web content source found for this user")
+    if len(urls) == 1:
+        process_and_store_docs(username, urls[0], revalidate=revalidate)
+        return urls
+    index_web_snapshots(username, [get_web_snapshot(url, revalidate=revalidate) for url in urls])
+    return urls
+
+def refresh_web_document(username):
+    urls = get_user_web_source_urls(username)
+    if not urls:
+        raise ValueError("No web content source found for this user")
+    changed_urls = []
+    content_hashes = {}
+    for url in urls:
+        snapshot, changed = fetch_web_snapshot(url, load_web_snapshot(url))
+        content_hashes[url] = snapshot["content_hash"]
+        if changed:
+            changed_urls.append(url)
+    if changed_urls:
+        rebuild_web_index(username, revalidate=False)
+    return {"urls": urls, "changed": bool(changed_urls), "changed_urls": changed_urls, "content_hashes": content_hashes}
+
+SUGGESTED_QUESTIONS_FILE = "suggested_questions.json"
+
+SUGGESTED_QUESTIONS_TEMPLATE = """You are helping users explore a document called "{source}".
+Based on the following representative excerpts, write {num_questions} short, specific questions a user could ask about this document.
+Return one question per line with no numbering or extra text.
+
+Excerpts:
+{excerpts}
+
+Questions:"""
+
+def _content_hash(docs):
+    content_hash = hashlib.sha256()
+    for doc in docs:
+        content_hash.update(doc.page_content.encode("utf-8", errors="ignore"))
+    return content_hash.hexdigest()
+
+def _group_by_source(docs):
+    groups = {}
+    for doc in docs:
+        groups.setdefault(doc.metadata.get('source_file', 'unknown'), []).append(doc)
+    return groups
+
+def _representative_chunks(chunks, max_chunks=6, max_chars=1200):
+    if len(chunks) > max_chunks:
+        step = len(chunks) / max_chunks
+        chunks = [chunks[int(i * step)] for i in range(max_chunks)]
+    return [chunk.page_content[:max_chars] for chunk in chunks]
+
+def _parse_questions(text, num_questions):
+    questions = []
+    for line in text.split('\n'):
+        line = line.strip().lstrip('-*•0123456789.) ').strip()
+        if line.endswith('?'):
+            questions.append(line)
+    return questions[:num_questions]
+
+def load_suggested_questions(index_path):
+    questions_file = os.path.join(index_path, SUGGESTED_QUESTIONS_FILE)
+    if not os.path.exists(questions_file):
+        return {}
+    try:
+        with open(questions_file, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+def generate_suggested_questions(index_path, docs, chunks, num_questions=5):
+    cached = load_suggested_questions(index_path)
+    chunks_by_source = _group_by_source(chunks)
+    
+    suggestions = {}
+    pending = []
+    for source, source_docs in _group_by_source(docs).items():
+        content_hash = _content_hash(source_docs)
+        entry = cached.get(source)
+        if entry and entry.get("hash") == content_hash:
+            suggestions[source] = entry
+        else:
+            pending.append((source, content_hash, chunks_by_source.get(source, source_docs)))
+    
+    if pending:
+        llm = get_llm(temperature=0.3, operation="suggested_questions")
+        prompts = [
+            SUGGESTED_QUESTIONS_TEMPLATE.format(
+                source=source,
+                num_questions=num_questions,
+                excerpts="\n\n---\n\n".join(_representative_chunks(source_chunks))
+            )
+            for source, _, source_chunks in pending
+        ]
+        try:
+            responses = llm.batch(prompts, return_exceptions=True)
+        except Exception as e:
+            print(f"Error generating suggested questions: {e}")
+            responses = [e] * len(pending)
+        
+        for (source, content_hash, _), response in zip(pending, responses):
+            if isinstance(response, Exception):
+                print(f"Error generating suggested questions for {source}: {response}")
+                continue
+            questions = _parse_questions(response.content, num_questions)
+            if questions:
+                suggestions[source] = {"hash": content_hash, "questions": questions}
+    
+    os.makedirs(index_path, exist_ok=True)
+    with open(os.path.join(index_path, SUGGESTED_QUESTIONS_FILE), "w") as f:
+        json.dump(suggestions, f, indent=4)
+    return suggestions
+
+def get_suggested_questions(username=None):
+    index_paths = [get_global_vector_store_path()]
+    if username:
+        index_paths.append(os.path.join("user_data", username, "faiss_index"))
+    
+    questions = []
+    for index_path in index_paths:
+        for entry in load_suggested_questions(index_path).values():
+            questions.extend(entry.get("questions", []))
+    return questions
+
+SUMMARIES_FILE = "summaries.json"
+
+SUMMARY_QUESTION_PATTERN = re.compile(
+    r"\b(summar\w*|overview|gist|tl;?dr|key (points|takeaways|highlights)|main (topic|points|idea)s?|what is (this|the) (document|act|bill) about)\b",
+    re.IGNORECASE
+)
+# Summary wording only routes to the summary tree for the whole document: a question naming a section, or asking
+# about a topic ("key points of the TDS provisions"), is answered from retrieved passages instead
+DOCUMENT_REFERENCE_PATTERN = re.compile(
+    r"\b(this|the|entire|whole)\s+(document|act|bill|file|report|circular|notification|pdf|paper)s?\b",
+    re.IGNORECASE
+)
+SECTION_REFERENCE_PATTERN = re.compile(
+    r"\b(sections?|sec\.|clauses?|sub-?sections?|rules?|chapters?|schedules?|articles?|para(graph)?s?|regulations?|pages?)\s*[\dIVXivx(]",
+    re.IGNORECASE
+)
+TOPIC_REFERENCE_PATTERN = re.compile(
+    r"\b(of|on|about|regarding|concerning|for|under|related to)\s+(?!(me|us)\b)\w",
+    re.IGNORECASE
+)
+
+CHUNK_SUMMARY_TEMPLATE = """Summarize the following excerpt from "{source}" in 2-3 sentences. Keep section numbers, defined terms, amounts and dates.
+
+Excerpt:
+{text}
+
+Summary:"""
+
+SECTION_SUMMARY_TEMPLATE = """The following are consecutive passage summaries from "{source}"{pages}. Combine them into one concise section summary of at most 150 words, keeping section numbers, defined terms, amounts and dates.
+
+Passage summaries:
+{text}
+
+Section summary:"""
+
+DOCUMENT_SUMMARY_TEMPLATE = """The following are section-by-section summaries of "{source}". Write an overall summary of the document of at most 300 words covering its purpose, structure and most important provisions.
+
+Section summaries:
+{text}
+
+Document summary:"""
+
+SUMMARY_ANSWER_TEMPLATE = """You are an intelligent document analysis AI assistant. Answer the question using the precomputed document and section summaries below.
+Mention which document each point comes from. If the summaries do not contain enough detail, say so and suggest asking a more specific question.
+
+Summaries: {context}
+
+Question: {question}
+
+Analysis: """
+
+def is_summary_question(query):
+    if not query or not SUMMARY_QUESTION_PATTERN.search(query) or SECTION_REFERENCE_PATTERN.search(query):
+        return False
+    return bool(DOCUMENT_REFERENCE_PATTERN.search(query) or not TOPIC_REFERENCE_PATTERN.search(query))
+
+def _page_label(chunks):
+    pages = [chunk.metadata['page'] for chunk in chunks if isinstance(chunk.metadata.get('page'), int)]
+    if not pages:
+        return None
+    return [min(pages) + 1, max(pages) + 1]
+
+def _batch_generate(llm, prompts, max_concurrency):
+    if not prompts:
+        return []
+    responses = llm.batch(prompts, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    results = []
+    for response in responses:
+        if isinstance(response, Exception):
+            print(f"Error generating summary: {response}")
+            results.append("")
+        else:
+            results.append(response.content.strip())
+    return results
+
+def load_summaries(index_path):
+    summaries_file = os.path.join(index_path, SUMMARIES_FILE)
+    if not os.path.exists(summaries_file):
+        return {}
+    try:
+        with open(summaries_file, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+def build_summary_trees(index_path, docs, chunks, section_size=8, max_concurrency=8):
+    cached = load_summaries(index_path)
+    # Table row blocks are answered by the structured query path; their tree is built from the schema only
+    chunks_by_source = _group_by_source([chunk for chunk in chunks if chunk.metadata.get("content_type") != "table_rows"])
+    
+    trees = {}
+    pending = []
+    for source, source_docs in _group_by_source(docs).items():
+        content_hash = _content_hash(source_docs)
+        entry = cached.get(source)
+        if entry and entry.get("hash") == content_hash:
+            trees[source] = entry
+        else:
+            pending.append((source, content_hash, chunks_by_source.get(source, source_docs)))
+    
+    if pending:
+        llm = get_llm(temperature=0.2, operation="summary_trees")
+        
+        # Map: every chunk of every changed document in one parallel batch
+        chunk_jobs = [(source, chunk) for source, _, source_chunks in pending for chunk in source_chunks]
+        chunk_summaries = _batch_generate(llm, [
+            CHUNK_SUMMARY_TEMPLATE.format(source=source, text=chunk.page_content)
+            for source, chunk in chunk_jobs
+        ], max_concurrency)
+        
+        # Reduce chunk summaries into sections of consecutive chunks
+        section_jobs = []
+        position = 0
+        for source, _, source_chunks in pending:
+            for start in range(0, len(source_chunks), section_size):
+                group = source_chunks[start:start + section_size]
+                texts = [text for text in chunk_summaries[position + start:position + start + len(group)] if text]
+                if texts:
+                    section_jobs.append((source, _page_label(group), texts))
+            position += len(source_chunks)
+        
+        section_summaries = _batch_generate(llm, [
+            SECTION_SUMMARY_TEMPLATE.format(
+                source=source,
+                pages=f" (pages {pages[0]}-{pages[1]})" if pages else "",
+                text="\n".join(f"- {text}" for text in texts)
+            )
+            for source, pages, texts in section_jobs
+        ], max_concurrency)
+        
+        sections_by_source = {}
+        for (source, pages, _), summary in zip(section_jobs, section_summaries):
+            if summary:
+                sections_by_source.setdefault(source, []).append({"pages": pages, "summary": summary})
+        
+        # Reduce sections into one summary per document
+        document_sources = [source for source, _, _ in pending if sections_by_source.get(source)]
+        document_summaries = _batch_generate(llm, [
+            DOCUMENT_SUMMARY_TEMPLATE.format(
+                source=source,
+                text="\n\n".join(section["summary"] for section in sections_by_source[source])
+            )
+            for source in document_sources
+        ], max_concurrency)
+        
+        hashes = {source: content_hash for source, content_hash, _ in pending}
+        for source, summary in zip(document_sources, document_summaries):
+            if summary:
+                trees[source] = {
+                    "hash": hashes[source],
+                    "document": summary,
+                    "sections": sections_by_source[source]
+                }
+    
+    os.makedirs(index_path, exist_ok=True)
+    with open(os.path.join(index_path, SUMMARIES_FILE), "w") as f:
+        json.dump(trees, f, indent=4)
+    return trees
+
+def get_summary_trees(username=None):
+    index_paths = []
+    if username:
+        index_paths.append(("user_docs", os.path.join("user_data", username, "faiss_index")))
+    index_paths.append(("preloaded_docs", get_global_vector_store_path()))
+    
+    trees = {}
+    for retrieval_source, index_path in index_paths:
+        for source, entry in load_summaries(index_path).items():
+            trees.setdefault(source, dict(entry, retrieval_source=retrieval_source))
+    return trees
+
+def _select_summary_trees(query, summary_trees):
+    lowered = query.lower()
+    mentioned = {
+        source: tree for source, tree in summary_trees.items()
+        if os.path.splitext(source)[0].lower() in lowered
+    }
+    if mentioned:
+        return mentioned
+    user_trees = {source: tree for source, tree in summary_trees.items() if tree.get("retrieval_source") == "user_docs"}
+    return user_trees or summary_trees
+
+def answer_from_summaries(llm, query, summary_trees, max_chars=24000):
+    from langchain_core.documents import Document as LangchainDocument
+    selected = _select_summary_trees(query, summary_trees)
+    
+    parts = [f"Document: {source}\n{tree['document']}" for source, tree in selected.items()]
+    used = sum(len(part) for part in parts)
+    for source, tree in selected.items():
+        for section in tree.get("sections", []):
+            pages = section.get("pages")
+            part = f"Section of {source}" + (f" (pages {pages[0]}-{pages[1]})" if pages else "") + f":\n{section['summary']}"
+            if used + len(part) > max_chars:
+                break
+            parts.append(part)
+            used += len(part)
+    
+    prompt = SUMMARY_ANSWER_TEMPLATE.format(context="\n\n".join(parts), question=query)
+    with timer("llm_generation", route="summary"):
+        response = llm.invoke(prompt)
+    source_documents = [
+        LangchainDocument(
+            page_content=tree["document"],
+            metadata={
+                "source_file": source,
+                "retrieval_source": tree.get("retrieval_source", "unknown"),
+                "summary_level": "document"
+            }
+        )
+        for source, tree in selected.items()
+    ]
+    return {
+        "result": response.content,
+        "source_documents": source_documents,
+        "usage": getattr(response, "usage_metadata", None) or {}
+    }
+
+TABLE_CACHE_DIR = "table_cache"
+TABLES_FILE = "tables.json"
+
+AGGREGATION_QUESTION_PATTERN = re.compile(
+    r"\b(total|sum|average|mean|median|count|how many|how much|maximum|minimum|max|min|highest|lowest|largest|smallest|per (month|quarter|year)|group(ed)? by|breakdown)\b",
+    re.IGNORECASE
+)
+
+TABLE_QUERY_TEMPLATE = """You translate questions about tabular data into a JSON query. Available tables:
+
+{schemas}
+
+Return only a JSON object with these keys:
+"table": the table name,
+"operation": one of "sum", "mean", "median", "count", "min", "max",
+"column": the column to aggregate (null for count),
+"group_by": a list of columns to group by (empty list for none),
+"filters": a list of objects with "column", "op" (one of "==", "!=", ">", ">=", "<", "<=", "contains", "in", "year", "quarter", "month") and "value"
+
+Question: {question}
+JSON:"""
+
+# The planner's JSON picks the aggregation, so only these names ever reach pandas
+TABLE_OPERATIONS = {"sum", "mean", "median", "min", "max", "count"}
+
+TABLE_FILTER_OPS = {
+    "==": lambda column, value: column == value,
+    "!=": lambda column, value: column != value,
+    ">": lambda column, value: column > value,
+    ">=": lambda column, value: column >= value,
+    "<": lambda column, value: column < value,
+    "<=": lambda column, value: column <= value,
+}
+
+def is_aggregation_question(query):
+    return bool(query and AGGREGATION_QUESTION_PATTERN.search(query))
+
+def load_csv_table(file_path):
+    import pandas as pd
+    content_hash = file_content_hash(file_path)
+    table_path = os.path.join(TABLE_CACHE_DIR, f"{content_hash}.parquet")
+    if os.path.exists(table_path):
+        return pd.read_parquet(table_path), table_path
+    
+    df = pd.read_csv(file_path)
+    os.makedirs(TABLE_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{table_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, table_path)
+    return df, table_path
+
+def describe_table(df, source_file):
+    import pandas as pd
+    lines = [f"Table {source_file}: {len(df)} rows, {len(df.columns)} columns.", "Columns:"]
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series):
+            lines.append(f"- {column} ({series.dtype}): min {series.min()}, max {series.max()}, total {series.sum()}")
+        else:
+            examples = series.dropna().astype(str).value_counts().head(5).index.tolist()
+            lines.append(f"- {column} ({series.dtype}): {series.nunique()} distinct values, e.g. {', '.join(examples)}")
+    return "\n".join(lines)
+
+def load_csv_documents(file_path, target_chars=1400):
+    from langchain_core.documents import Document as LangchainDocument
+    df, table_path = load_csv_table(file_path)
+    metadata = {"source": file_path, "table_path": table_path}
+    docs = [LangchainDocument(
+        page_content=describe_table(df, os.path.basename(file_path)),
+        metadata=dict(metadata, content_type="table_schema")
+    )]
+    if df.empty:
+        return docs
+    
+    # Rows are embedded in blocks sized to fit one chunk instead of one document per row
+    sample = df.head(100).to_csv(index=False)
+    avg_row_chars = max(1, len(sample) // min(len(df), 100))
+    rows_per_block = max(1, target_chars // avg_row_chars)
+    for start in range(0, len(df), rows_per_block):
+        block = df.iloc[start:start + rows_per_block]
+        docs.append(LangchainDocument(
+            page_content=block.to_csv(index=False),
+            metadata=dict(metadata, content_type="table_rows", row_start=start, row_end=start + len(block) - 1)
+        ))
+    return docs
+
+def save_table_registry(index_path, docs):
+    tables = {
+        doc.metadata['source_file']: {"table_path": doc.metadata['table_path'], "schema": doc.page_content}
+        for doc in docs
+        if doc.metadata.get("content_type") == "table_schema"
+    }
+    tables_file = os.path.join(index_path, TABLES_FILE)
+    if tables:
+        with open(tables_file, "w") as f:
+            json.dump(tables, f, indent=4)
+    elif os.path.exists(tables_file):
+        os.remove(tables_file)
+
+def get_tables(username=None):
+    if not username:
+        return {}
+    tables_file = os.path.join("user_data", username, "faiss_index", TABLES_FILE)
+    if not os.path.exists(tables_file):
+        return {}
+    try:
+        with open(tables_file, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+def _parse_json_object(text):
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError("No JSON object in response")
+    return json.loads(text[start:end + 1])
 
-def get_conversational_agent(vector_store, source_description):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash",
-        temperature=0.7
+def run_table_query(df, spec):
+    import pandas as pd
+    operation = spec.get("operation")
+    if operation not in TABLE_OPERATIONS:
+        raise ValueError(f"Unsupported table operation: {operation!r}")
+    mask = pd.Series(True, index=df.index)
+    for condition in spec.get("filters") or []:
+        column = df[condition["column"]]
+        op = condition["op"]
+        value = condition.get("value")
+        if op not in TABLE_FILTER_OPS and op not in ("year", "quarter", "month", "contains", "in"):
+            raise ValueError(f"Unsupported table filter: {op!r}")
+        if op in ("year", "quarter", "month"):
+            dates = pd.to_datetime(column, errors="coerce", dayfirst=True)
+            mask &= getattr(dates.dt, op) == int(value)
+        elif op == "contains":
+            mask &= column.astype(str).str.contains(str(value), case=False, na=False)
+        elif op == "in":
+            mask &= column.isin(value if isinstance(value, list) else [value])
+        else:
+            if pd.api.types.is_numeric_dtype(column):
+                value = float(value)
+            mask &= TABLE_FILTER_OPS[op](column, value)
+    
+    filtered = df[mask]
+    group_by = spec.get("group_by") or []
+    if operation == "count":
+        result = filtered.groupby(group_by).size() if group_by else len(filtered)
+    else:
+        values = pd.to_numeric(filtered[spec["column"]], errors="coerce")
+        if group_by:
+            result = values.groupby([filtered[column] for column in group_by]).agg(operation)
+        else:
+            result = getattr(values, operation)()
+    return result, len(filtered)
+
+def answer_from_table(llm, query, tables):
+    import pandas as pd
+    from langchain_core.documents import Document as LangchainDocument
+    schemas = "\n\n".join(f"Table name: {name}\n{table['schema']}" for name, table in tables.items())
+    try:
+        with timer("llm_generation", route="table"):
+            spec = _parse_json_object(llm.invoke(TABLE_QUERY_TEMPLATE.format(schemas=schemas, question=query)).content)
+        table_name = spec.get("table") if spec.get("table") in tables else next(iter(tables))
+        df = pd.read_parquet(tables[table_name]["table_path"])
+        result, matched_rows = run_table_query(df, spec)
+    except Exception as e:
+        # Anything the planner gets wrong falls back to the regular retrieval path
+        print(f"Structured table query failed, falling back to retrieval: {e}")
+        return None
+    
+    description = spec["operation"] if spec["operation"] == "count" else f"{spec['operation']} of `{spec['column']}`"
+    if isinstance(result, pd.Series):
+        result_text = f"```\n{result.to_string()}\n```"
+    else:
+        result_text = f"**{result:,.2f}**" if isinstance(result, float) else f"**{result}**"
+    filters = spec.get("filters") or []
+    filter_text = "; ".join(f"{f['column']} {f['op']} {f.get('value')}" for f in filters) or "none"
+    answer = (
+        f"Computed {description} over {matched_rows} matching rows of **{table_name}**"
+        + (f", grouped by {', '.join(spec['group_by'])}" if spec.get("group_by") else "")
+        + f".\n\nFilters: {filter_text}\n\nResult: {result_text}"
     )
-    retriever = vector_store.as_retriever(search_kwargs={"k": 6})
+    return {
+        "result": answer,
+        "source_documents": [LangchainDocument(
+            page_content=tables[table_name]["schema"],
+            metadata={"source_file": table_name, "retrieval_source": "user_docs", "content_type": "table_schema"}
+        )],
+        "table_query": spec
+    }
+
+class CombinedRetrievalQA:
+    def __init__(self, llm, prompt, retrieval_fn, summary_trees=None, tables=None):
+        self.llm = llm
+        self.prompt = prompt
+        self.retrieval_fn = retrieval_fn
+        self.summary_trees = summary_trees or {}
+        self.tables = tables or {}
+    
+    def invoke(self, inputs):
+        with collect_timings() as timings:
+            with timer("answer"):
+                response = self._answer(inputs)
+        return dict(response, timings=timings)
+    
+    def _answer(self, inputs):
+        query = inputs if isinstance(inputs, str) else (inputs.get("query") or inputs.get("input"))
+        inputs = {} if isinstance(inputs, str) else inputs
+        # Every route below calls the model, so the budget is checked once here: over budget,
+        # a repeated question is served from the answer cache and anything else runs in economy mode
+        username = current_username()
+        economy = budget_exceeded(username)
+        if economy:
+            cached = cached_response(username, query)
+            if cached:
+                return cached
+        response = self._route(query, inputs, economy)
+        remember_answer(username, query, response)
+        return dict(response, mode="economy") if economy else response
     
-    from langchain.chains import RetrievalQA
-    from langchain.prompts import PromptTemplate
+    def _route(self, query, inputs, economy):
+        if self.tables and is_aggregation_question(query):
+            response = answer_from_table(self.llm, query, self.tables)
+            if response:
+                return response
+        if self.summary_trees and is_summary_question(query):
+            return answer_from_summaries(
+                self.llm, query, self.summary_trees,
+                max_chars=ECONOMY_SUMMARY_CHARS if economy else 24000
+            )
+        
+        docs = self.retrieval_fn(query, inputs.get("query_embedding"))
+        if economy:
+            docs = docs[:ECONOMY_K]
+        
+        with timer("prompt_assembly"):
+            parts = [
+                (
+                    doc.metadata.get('retrieval_source', 'unknown'),
+                    f"Source: {doc.metadata.get('retrieval_source', 'unknown')} - {doc.metadata.get('source_file', 'unknown file')}\n"
+                    + (doc.page_content[:ECONOMY_CHUNK_CHARS] if economy else doc.page_content)
+                )
+                for doc in docs
+            ]
+            context = "\n\n".join(part for _, part in parts)
+            formatted_prompt = self.prompt.format(context=context, question=query + (ECONOMY_INSTRUCTION if economy else ""))
+            context_chars = {}
+            for source, part in parts:
+                context_chars[source] = context_chars.get(source, 0) + len(part)
+        with timer("llm_generation", route="retrieval"), prompt_sources(context_chars, len(formatted_prompt)):
+            response = self.llm.invoke(formatted_prompt)
+        
+        return {
+            "result": response.content,
+            "source_documents": docs,
+            "usage": getattr(response, "usage_metadata", None) or {}
+        }
+
+def get_conversational_agent(vector_store, source_description, summary_trees=None, tables=None, username=None):
+    from langchain_core.prompts import PromptTemplate
+    llm = get_llm()
+    get_vector_store = resident_vector_store(vector_store, username)
+    
+    def user_retrieval(query, query_embedding=None):
+        user_vector_store = get_vector_store()
+        if user_vector_store is None:
+            return []
+        if query_embedding is None:
+            query_embedding = user_vector_store.embedding_function.embed_query(query)
+        with timer("retrieval", source="user_docs"):
+            docs = user_vector_store.similarity_search_by_vector(query_embedding, k=RETRIEVAL_K)
+        for doc in docs:
+            doc.metadata['retrieval_source'] = 'user_docs'
+        return docs
     
     template = """You are an intelligent document analysis AI assistant. Use the following document context to answer questions about the content, extract insights, and provide detailed information from the uploaded documents.
 
@@ -129,34 +1029,270 @@ def get_conversational_agent(vector_store, source_description):
         input_variables=["context", "question"]
     )
     
-    qa_chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        chain_type="stuff",
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": prompt}
+    return CombinedRetrievalQA(llm, prompt, user_retrieval, summary_trees, tables)
+
+def get_general_agent():
+    """Agent for users with no documents and no knowledge base, answered through the same budget checks"""
+    from langchain_core.prompts import PromptTemplate
+    prompt = PromptTemplate(
+        template="You are a helpful document analysis AI assistant. No documents are loaded yet, so answer from general knowledge.{context}\n\nQuestion: {question}\n\nAnswer: ",
+        input_variables=["context", "question"]
     )
-    
-    return qa_chain
+    return CombinedRetrievalQA(get_llm(), prompt, lambda query, query_embedding=None: [])
+
+DEDUP_REPORT_FILE = "dedup_report.json"
+
+def save_dedup_report(index_path, report):
+    report = dict(report, built_at=datetime.datetime.now().isoformat(timespec="seconds"))
+    with open(os.path.join(index_path, DEDUP_REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Dedup: {report['duplicates']} of {report['chunks']} chunks stored as aliases ({report['dedup_ratio']:.1%})")
+
+def load_dedup_report(index_path):
+    report_file = os.path.join(index_path, DEDUP_REPORT_FILE)
+    if not os.path.exists(report_file):
+        return None
+    try:
+        with open(report_file, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return None
+
+# Defaults for chunking and top-k; compare alternatives with eval_retrieval.py before changing them
+CHUNK_SIZE = int(os.environ.get("CHUNK_SIZE", "1500"))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", "300"))
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K", "6"))
+COMBINED_K_PER_SOURCE = int(os.environ.get("COMBINED_K_PER_SOURCE", "3"))
+
+# Economy mode for users over their token budget: fewer, shorter chunks and a brief answer
+ECONOMY_K = int(os.environ.get("ECONOMY_K", "2"))
+ECONOMY_CHUNK_CHARS = int(os.environ.get("ECONOMY_CHUNK_CHARS", "600"))
+ECONOMY_SUMMARY_CHARS = int(os.environ.get("ECONOMY_SUMMARY_CHARS", "6000"))
+ECONOMY_INSTRUCTION = "\n\nAnswer briefly, in at most five sentences."
+
+def _answer_cache_version(username):
+    """Modification times of the user's and the global index; a rebuilt index starts a fresh answer cache"""
+    mtimes = []
+    for index_path in (os.path.join("user_data", username, "faiss_index"), get_global_vector_store_path()):
+        index_file = os.path.join(index_path, "index.faiss")
+        mtimes.append(str(os.path.getmtime(index_file)) if os.path.exists(index_file) else "-")
+    return ":".join(mtimes)
+
+def cached_response(username, query):
+    from langchain_core.documents import Document as LangchainDocument
+    cached = get_cached_answer(username, query, _answer_cache_version(username))
+    if not cached:
+        return None
+    return {
+        "result": cached["result"],
+        "source_documents": [
+            LangchainDocument(page_content=doc["page_content"], metadata=doc["metadata"])
+            for doc in cached["source_documents"]
+        ],
+        "usage": {},
+        "mode": "cached"
+    }
 
-def process_and_store_docs(username, file_or_url):
+def remember_answer(username, query, response):
+    if not username:
+        return
+    try:
+        cache_answer(username, query, response, _answer_cache_version(username))
+    except Exception as e:
+        print(f"Error caching answer: {e}")
+
+def split_documents(docs, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    with timer("split"):
+        return _split_documents(docs, chunk_size, chunk_overlap)
+
+def _split_documents(docs, chunk_size, chunk_overlap):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from statute_splitter import StatuteTextSplitter
+    # Table blocks are already sized to one chunk; everything else goes through the structure-aware splitter,
+    # which falls back to the plain character splitter for text without statutory headings
+    table_docs = [doc for doc in docs if doc.metadata.get("content_type")]
+    text_docs = [doc for doc in docs if not doc.metadata.get("content_type")]
+    chunks = StatuteTextSplitter(
+        chunk_size=chunk_size,
+        fallback_overlap=min(200, chunk_overlap),
+        plain_overlap=chunk_overlap
+    ).split_documents(text_docs)
+    if table_docs:
+        chunks.extend(RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, 
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+        ).split_documents(table_docs))
+    return chunks
+
+def process_and_store_docs(username, file_or_url, revalidate=True):
+    from langchain_community.vectorstores import FAISS
+    from dedup import dedupe_chunks
     user_dir = os.path.join("user_data", username)
     vector_store_path = os.path.join(user_dir, "faiss_index")
-    docs = load_document(file_or_url)
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    documents = RecursiveCharacterTextSplitter(
-        chunk_size=1500, 
-        chunk_overlap=300,
-        separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
-    ).split_documents(docs)
-    vectordb = FAISS.from_documents(documents, embeddings)
-    vectordb.save_local(vector_store_path)
+    docs = load_document(file_or_url, revalidate=revalidate)
+    embeddings = get_embeddings()
+    documents = split_documents(docs)
+    canonical_documents, dedup_report = dedupe_chunks(documents)
+    vectordb = FAISS.from_documents(canonical_documents, embeddings)
+    with timer("index_write", index="user"):
+        vectordb.save_local(vector_store_path)
+    save_dedup_report(vector_store_path, dedup_report)
+    save_table_registry(vector_store_path, docs)
+    generate_suggested_questions(vector_store_path, docs, documents)
+    build_summary_trees(vector_store_path, docs, documents)
 
 def load_vector_store(path):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+    from langchain_community.vectorstores import FAISS
+    embeddings = get_embeddings()
+    with timer("index_load", index="user"):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+def _index_size_bytes(vector_store_path):
+    # The on-disk index and docstore sizes are a close proxy for their deserialized footprint
+    return sum(
+        os.path.getsize(os.path.join(vector_store_path, name))
+        for name in ("index.faiss", "index.pkl")
+        if os.path.exists(os.path.join(vector_store_path, name))
+    )
+
+class VectorStoreResidency:
+    def __init__(self, budget_bytes, idle_seconds=1800):
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.entries = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "load_seconds": 0.0}
+        self.reaper = None
+    
+    def _evict(self, username):
+        entry = self.entries.pop(username, None)
+        if entry:
+            self.stats["evictions"] += 1
+            print(f"Evicted vector index for user: {username}")
+    
+    def _evict_idle(self):
+        now = time.monotonic()
+        for username in [u for u, entry in self.entries.items() if now - entry["last_used"] > self.idle_seconds]:
+            self._evict(username)
+    
+    def _enforce_budget(self, incoming_bytes=0):
+        self._evict_idle()
+        while self.entries and self.resident_bytes() + incoming_bytes > self.budget_bytes:
+            self._evict(next(iter(self.entries)))
+    
+    def resident_bytes(self):
+        return sum(entry["size"] for entry in self.entries.values())
+    
+    def is_resident(self, username):
+        return username in self.entries
+    
+    def _reap(self):
+        while True:
+            time.sleep(max(1, self.idle_seconds / 4))
+            with self.lock:
+                self._evict_idle()
+    
+    def _start_reaper(self):
+        # Idle indexes are also dropped on a timer, so a quiet server does not hold them until the next load
+        if self.reaper is None:
+            self.reaper = threading.Thread(target=self._reap, name="vector-store-reaper", daemon=True)
+            self.reaper.start()
+    
+    def get(self, username):
+        vector_store_path = os.path.join("user_data", username, "faiss_index")
+        index_file = os.path.join(vector_store_path, "index.faiss")
+        if not os.path.exists(index_file):
+            self.evict(username)
+            return None
+        mtime = os.path.getmtime(index_file)
+        
+        with self.lock:
+            self._start_reaper()
+            self._evict_idle()
+            entry = self.entries.get(username)
+            if entry and entry["mtime"] == mtime:
+                entry["last_used"] = time.monotonic()
+                self.entries.move_to_end(username)
+                self.stats["hits"] += 1
+                return entry["store"]
+            self.stats["misses"] += 1
+            # Concurrent requests for the same user (e.g. login prefetch and first question) share one load
+            loading = self.loading.get(username)
+            if loading is None:
+                loading = self.loading[username] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        
+        if not owner:
+            loading.wait()
+            with self.lock:
+                entry = self.entries.get(username)
+            return entry["store"] if entry else load_vector_store(vector_store_path)
+        
+        try:
+            start = time.perf_counter()
+            store = load_vector_store(vector_store_path)
+            size = _index_size_bytes(vector_store_path)
+            with self.lock:
+                self.stats["loads"] += 1
+                self.stats["load_seconds"] += time.perf_counter() - start
+                self.entries.pop(username, None)
+                self._enforce_budget(size)
+                self.entries[username] = {"store": store, "size": size, "mtime": mtime, "last_used": time.monotonic()}
+            return store
+        finally:
+            with self.lock:
+                self.loading.pop(username, None)
+            loading.set()
+    
+    def prefetch(self, username):
+        thread = threading.Thread(target=self.get, args=(username,), daemon=True)
+        thread.start()
+        return thread
+    
+    def evict(self, username):
+        with self.lock:
+            self._evict(username)
+    
+    def metrics(self):
+        with self.lock:
+            loads = self.stats["loads"]
+            return {
+                "resident_users": len(self.entries),
+                "resident_bytes": self.resident_bytes(),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "loads": loads,
+                "evictions": self.stats["evictions"],
+                "avg_load_seconds": self.stats["load_seconds"] / loads if loads else 0.0
+            }
+
+vector_store_residency = VectorStoreResidency(
+    budget_bytes=int(os.environ.get("USER_INDEX_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024,
+    idle_seconds=int(os.environ.get("USER_INDEX_IDLE_SECONDS", "1800"))
+)
+
+def load_user_vector_store(username):
+    return vector_store_residency.get(username)
+
+def resident_vector_store(vector_store, username=None):
+    """Getter an agent calls per query; a user's index goes through residency so a cached agent never pins it after eviction"""
+    if username:
+        return lambda: load_user_vector_store(username)
+    return lambda: vector_store
+
+def prefetch_user_vector_store(username):
+    return vector_store_residency.prefetch(username)
+
+def get_vector_store_residency_metrics():
+    return vector_store_residency.metrics()
 
 def save_chat_history(username, chat_id, chat_history):
+    from langchain_core.messages import HumanMessage, AIMessage
     chat_dir = _ensure_chat_dir(username)
     history_file = os.path.join(chat_dir, f"{chat_id}.json")
     
@@ -176,6 +1312,7 @@ def save_chat_history(username, chat_id, chat_history):
         json.dump({"title": title, "messages": serializable_history}, f, indent=4)
 
 def load_chat_history(username, chat_id):
+    from langchain_core.messages import HumanMessage, AIMessage
     chat_dir = _ensure_chat_dir(username)
     history_file = os.path.join(chat_dir, f"{chat_id}.json")
     if not os.path.exists(history_file):
@@ -221,57 +1358,200 @@ def delete_chat_history(username, chat_id):
     if os.path.exists(history_file):
         os.remove(history_file)
 
+EXTRACTION_CACHE_DIR = "extraction_cache"
+# Bumped when extraction output changes (2: Word tables), so files cached by an older version are re-extracted
+EXTRACTION_VERSION = 2
+
+# In-memory caches are LRUs so a long-running server does not grow with every file it has seen
+FILE_HASH_CACHE_ENTRIES = 1024
+PAGE_OFFSETS_CACHE_ENTRIES = 256
+EXTRACTION_CACHE_ENTRIES = 16
+FILE_BYTES_CACHE_ENTRIES = 4
+# Larger files are read again on each rerun rather than pinned in memory
+FILE_BYTES_CACHE_MAX_FILE_BYTES = 8 * 1024 * 1024
+
+_file_hash_cache = OrderedDict()
+_page_offsets_cache = OrderedDict()
+_extraction_cache = OrderedDict()
+_extraction_cache_lock = threading.Lock()
+_file_bytes_cache = OrderedDict()
+
+def _cache_get(cache, key):
+    with _extraction_cache_lock:
+        if key not in cache:
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+
+def _cache_put(cache, key, value, max_entries):
+    with _extraction_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_entries:
+            cache.popitem(last=False)
+
+def file_content_hash(file_path):
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    cached = _cache_get(_file_hash_cache, key)
+    if cached:
+        return cached
+    content_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            content_hash.update(block)
+    _cache_put(_file_hash_cache, key, content_hash.hexdigest(), FILE_HASH_CACHE_ENTRIES)
+    return content_hash.hexdigest()
+
+def _docx_text(document):
+    """Paragraphs and tables in body order, one line per table row with cells separated by pipes"""
+    from docx.table import Table
+    lines = []
+    for block in document.iter_inner_content():
+        if isinstance(block, Table):
+            for row in block.rows:
+                cells = []
+                for cell in row.cells:
+                    text = " ".join(cell.text.split())
+                    # A merged cell is returned once per grid column it spans
+                    if not cells or cells[-1] != text:
+                        cells.append(text)
+                lines.append(" | ".join(cells))
+        else:
+            lines.append(block.text)
+    return "\n".join(lines)
+
+def _extract_pages(file_path):
+    from pypdf import PdfReader
+    from docx import Document
+    _, file_extension = os.path.splitext(file_path)
+    if file_extension.lower() == '.pdf':
+        return [page.extract_text() or "" for page in PdfReader(file_path).pages]
+    if file_extension.lower() == '.docx':
+        # Word documents have no fixed pagination, so the whole body is stored as one page
+        return [_docx_text(Document(file_path))]
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        return [f.read()]
+
+def _ensure_extracted(file_path):
+    # Extracted text is stored as one UTF-8 file per content hash plus the byte offset of every page,
+    # so any page range can be read with a single seek without loading the whole document
+    content_hash = file_content_hash(file_path)
+    cached = _cache_get(_page_offsets_cache, content_hash)
+    if cached:
+        return content_hash, cached
+    
+    text_file = os.path.join(EXTRACTION_CACHE_DIR, f"{content_hash}.txt")
+    offsets_file = os.path.join(EXTRACTION_CACHE_DIR, f"{content_hash}.offsets.json")
+    offsets = None
+    if os.path.exists(text_file) and os.path.exists(offsets_file):
+        try:
+            with open(offsets_file, "r") as f:
+                extracted = json.load(f)
+            offsets = extracted["offsets"] if extracted.get("version") == EXTRACTION_VERSION else None
+        except (json.JSONDecodeError, KeyError):
+            offsets = None
+    
+    if offsets is None:
+        pages = _extract_pages(file_path)
+        encoded = [page.encode("utf-8") for page in pages]
+        offsets = [0]
+        for page in encoded:
+            offsets.append(offsets[-1] + len(page))
+        
+        os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(text_file + suffix, "wb") as f:
+            f.write(b"".join(encoded))
+        with open(offsets_file + suffix, "w") as f:
+            json.dump({"source_file": os.path.basename(file_path), "version": EXTRACTION_VERSION, "offsets": offsets}, f)
+        os.replace(text_file + suffix, text_file)
+        os.replace(offsets_file + suffix, offsets_file)
+        _cache_put(_extraction_cache, content_hash, pages, EXTRACTION_CACHE_ENTRIES)
+    
+    _cache_put(_page_offsets_cache, content_hash, offsets, PAGE_OFFSETS_CACHE_ENTRIES)
+    return content_hash, offsets
+
+def get_page_count(file_path):
+    _, offsets = _ensure_extracted(file_path)
+    return len(offsets) - 1
+
+def get_page_range(file_path, start_page, end_page):
+    content_hash, offsets = _ensure_extracted(file_path)
+    start_page = max(0, start_page)
+    end_page = min(len(offsets) - 1, end_page)
+    if start_page >= end_page:
+        return []
+    
+    with open(os.path.join(EXTRACTION_CACHE_DIR, f"{content_hash}.txt"), "rb") as f:
+        f.seek(offsets[start_page])
+        data = f.read(offsets[end_page] - offsets[start_page])
+    base = offsets[start_page]
+    return [
+        data[offsets[page] - base:offsets[page + 1] - base].decode("utf-8")
+        for page in range(start_page, end_page)
+    ]
+
+def get_page_texts(file_path, max_memory_entries=EXTRACTION_CACHE_ENTRIES):
+    content_hash, offsets = _ensure_extracted(file_path)
+    cached = _cache_get(_extraction_cache, content_hash)
+    if cached is not None:
+        return cached
+    
+    pages = get_page_range(file_path, 0, len(offsets) - 1)
+    _cache_put(_extraction_cache, content_hash, pages, max_memory_entries)
+    return pages
+
+def get_file_bytes(file_path, max_entries=FILE_BYTES_CACHE_ENTRIES):
+    # Download buttons get the same bytes object on every rerun instead of re-reading small files
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    cached = _cache_get(_file_bytes_cache, key)
+    if cached is not None:
+        return cached
+    
+    with open(file_path, "rb") as f:
+        data = f.read()
+    
+    if len(data) <= FILE_BYTES_CACHE_MAX_FILE_BYTES:
+        _cache_put(_file_bytes_cache, key, data, max_entries)
+    return data
+
+def load_extracted_pages(file_path):
+    from langchain_core.documents import Document as LangchainDocument
+    return [
+        LangchainDocument(page_content=text, metadata={"source": file_path, "page": page_number})
+        for page_number, text in enumerate(get_page_texts(file_path))
+    ]
+
 def extract_pdf_content(file_path):
     try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        return "\n".join(get_page_texts(file_path)).strip()
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
 def extract_docx_content(file_path):
     try:
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text.strip()
+        return "\n".join(get_page_texts(file_path)).strip()
     except Exception as e:
         return f"Error reading Word document: {str(e)}"
 
 def get_scraped_websites():
-    return ["RBI"]
+    from scrapers import SCRAPERS
+    return list(SCRAPERS)
 
-def get_scraped_data_files(website):
-    website_dir = os.path.join("scraped_data", website)
-    if not os.path.exists(website_dir):
-        return []
-    
-    files = []
-    for file_name in os.listdir(website_dir):
-        if file_name.endswith(('.txt', '.pdf', '.csv', '.json', '.md', '.html')):
-            file_path = os.path.join(website_dir, file_name)
-            mod_time = os.path.getmtime(file_path)
-            files.append((file_name, mod_time))
-    
-    files.sort(key=lambda x: x[1], reverse=True)
-    return [file_name for file_name, _ in files]
+SCRAPED_UPDATES_WINDOW_DAYS = 30
 
-def read_scraped_data_file(website, file_name):
-    file_path = os.path.join("scraped_data", website, file_name)
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return f"Error reading file: {str(e)}"
+def get_scraped_update_count(website, days=SCRAPED_UPDATES_WINDOW_DAYS):
+    return count_items(website, start_date=datetime.date.today() - datetime.timedelta(days=days))
+
+def get_scraper(website_code):
+    from scrapers import SCRAPERS
+    return SCRAPERS.get(website_code)
 
 def get_website_full_name(website_code):
-    website_names = {
-        "RBI": "Reserve Bank of India"
-    }
-    return website_names.get(website_code, website_code)
+    site = get_scraper(website_code)
+    return site.full_name if site else website_code
 
 def get_preloaded_docs_path():
     return os.path.join("preloaded_docs")
@@ -290,8 +1570,7 @@ def load_preloaded_documents():
     for pdf_file in pdf_files:
         file_path = os.path.join(preloaded_path, pdf_file)
         try:
-            loader = PyPDFLoader(file_path)
-            docs = loader.load()
+            docs = load_extracted_pages(file_path)
             for doc in docs:
                 doc.metadata['source_file'] = pdf_file
                 doc.metadata['source_type'] = 'preloaded'
@@ -302,6 +1581,9 @@ def load_preloaded_documents():
     return documents
 
 def create_global_knowledge_base():
+    from langchain_community.vectorstores import FAISS
+    from dedup import dedupe_chunks
+    from mmap_store import write_chunk_store
     global_vector_path = get_global_vector_store_path()
     
     preloaded_docs = load_preloaded_documents()
@@ -310,59 +1592,253 @@ def create_global_knowledge_base():
         print("No preloaded documents found")
         return None
     
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+    embeddings = get_embeddings()
     
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1500, 
-        chunk_overlap=300,
-        separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
-    )
-    documents = text_splitter.split_documents(preloaded_docs)
+    documents = split_documents(preloaded_docs)
+    canonical_documents, dedup_report = dedupe_chunks(documents)
     
-    vectordb = FAISS.from_documents(documents, embeddings)
+    vectordb = FAISS.from_documents(canonical_documents, embeddings)
     
     os.makedirs(global_vector_path, exist_ok=True)
-    vectordb.save_local(global_vector_path)
+    with timer("index_write", index="global"):
+        vectordb.save_local(global_vector_path)
+        write_chunk_store(vectordb, global_vector_path)
+    save_dedup_report(global_vector_path, dedup_report)
+    generate_suggested_questions(global_vector_path, preloaded_docs, documents)
+    build_summary_trees(global_vector_path, preloaded_docs, documents)
     
-    print(f"Global knowledge base created with {len(documents)} document chunks from {len(set([doc.metadata['source_file'] for doc in preloaded_docs]))} PDF files")
+    print(f"Global knowledge base created with {len(canonical_documents)} unique of {len(documents)} document chunks from {len(set([doc.metadata['source_file'] for doc in preloaded_docs]))} PDF files")
     return vectordb
 
+GLOBAL_INDEX_MMAP = os.environ.get("GLOBAL_INDEX_MMAP", "1") != "0"
+
+_global_vector_store = {"store": None, "mtime": None}
+_global_vector_store_lock = threading.Lock()
+
 def load_global_vector_store():
+    """Return this process's shared copy of the global index, reloading only when it was rebuilt on disk"""
+    from langchain_community.vectorstores import FAISS
+    from mmap_store import chunk_store_is_current, write_chunk_store, load_mmap_vector_store
     global_vector_path = get_global_vector_store_path()
-    if not os.path.exists(global_vector_path):
+    index_file = os.path.join(global_vector_path, "index.faiss")
+    if not os.path.exists(index_file):
         return None
     
+    with _global_vector_store_lock:
+        mtime = os.path.getmtime(index_file)
+        if _global_vector_store["store"] is not None and _global_vector_store["mtime"] == mtime:
+            return _global_vector_store["store"]
+        
+        try:
+            embeddings = get_embeddings()
+            vector_store = None
+            if GLOBAL_INDEX_MMAP:
+                try:
+                    if not chunk_store_is_current(global_vector_path):
+                        write_chunk_store(
+                            FAISS.load_local(global_vector_path, embeddings, allow_dangerous_deserialization=True),
+                            global_vector_path
+                        )
+                    with timer("index_load", index="global", mode="mmap"):
+                        vector_store = load_mmap_vector_store(global_vector_path, embeddings)
+                except Exception as e:
+                    print(f"Memory-mapped load of global vector store failed, loading a private copy: {e}")
+            if vector_store is None:
+                with timer("index_load", index="global", mode="private"):
+                    vector_store = FAISS.load_local(global_vector_path, embeddings, allow_dangerous_deserialization=True)
+            _global_vector_store.update(store=vector_store, mtime=mtime)
+            return vector_store
+        except Exception as e:
+            print(f"Error loading global vector store: {e}")
+            return None
+
+REGULATORY_INDEX_PATH = "regulatory_updates_index"
+REGULATORY_MANIFEST_FILE = "manifest.json"
+REGULATORY_RETENTION_DAYS = 30
+
+def _load_regulatory_manifest():
+    manifest_path = os.path.join(REGULATORY_INDEX_PATH, REGULATORY_MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            pass
+    return {"items": {}, "pending": {}}
+
+def _save_regulatory_manifest(manifest):
+    os.makedirs(REGULATORY_INDEX_PATH, exist_ok=True)
+    manifest_path = os.path.join(REGULATORY_INDEX_PATH, REGULATORY_MANIFEST_FILE)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, manifest_path)
+
+def fetch_press_release_documents(site_code, item, timeout=30):
+    """Fetch a scraped item's page and return its body as documents tagged with site, id and release date"""
+    from scrape_storage import item_id
+    from langchain_core.documents import Document as LangchainDocument
+    response = get_http_session().get(item["url"], timeout=timeout)
+    response.raise_for_status()
+    content, _ = parse_web_page(response.content, item["url"])
+    content = re.sub(r"\n\s*\n+", "\n\n", content).strip()
+    metadata = {
+        "source_file": f"{site_code}: {item['title']}",
+        "source_type": "regulatory_update",
+        "source_url": item["url"],
+        "site": site_code,
+        "item_id": item_id(item),
+        "release_date": item["date"],
+        "title": item["title"]
+    }
+    return [LangchainDocument(page_content=f"{item['title']}\n{item['date']}\n\n{content}", metadata=metadata)]
+
+def _regulatory_item_date(entry):
+    """Release date of a manifest entry; undated releases age from when they were first seen"""
+    from scrape_storage import parse_date_string
+    return parse_date_string(entry.get("date") or entry.get("item", {}).get("date")) or datetime.datetime.fromisoformat(entry["first_seen"])
+
+def update_regulatory_index(new_items_by_site, retention_days=REGULATORY_RETENTION_DAYS, max_workers=4):
+    """Embed only releases not yet in the rolling updates index and evict those past the retention window.
+
+    Items whose page could not be fetched stay pending and are retried on the next update.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from scrape_storage import item_id, scrape_state_lock
+    from langchain_community.vectorstores import FAISS
+
+    now = datetime.datetime.now()
+    first_seen = now.isoformat(timespec="seconds")
+    cutoff = now - datetime.timedelta(days=retention_days)
+    manifest = _load_regulatory_manifest()
+
+    candidates = {}
+    for key, entry in manifest["pending"].items():
+        candidates[key] = {"site": entry["site"], "item": entry["item"], "first_seen": entry.get("first_seen", first_seen)}
+    for site_code, items in new_items_by_site.items():
+        for item in items:
+            key = f"{site_code}:{item_id(item)}"
+            if key not in manifest["items"] and key not in candidates:
+                candidates[key] = {"site": site_code, "item": item, "first_seen": first_seen}
+    candidates = {key: entry for key, entry in candidates.items() if _regulatory_item_date(entry) >= cutoff}
+
+    def fetch(entry):
+        key, candidate = entry
+        try:
+            return key, candidate, fetch_press_release_documents(candidate["site"], candidate["item"])
+        except Exception as e:
+            print(f"Error fetching {candidate['item']['url']}: {e}")
+            return key, candidate, None
+
+    # Pages are fetched without the lock; the manifest is re-read under it, since the scheduler,
+    # a cron run or the CLI may have updated the index in the meantime
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fetched = list(executor.map(fetch, candidates.items()))
+
+    with scrape_state_lock():
+        manifest = _load_regulatory_manifest()
+        pending_before = dict(manifest["pending"])
+        vector_store = load_regulatory_vector_store()
+        added = 0
+        for key, candidate, docs in fetched:
+            if key in manifest["items"]:
+                manifest["pending"].pop(key, None)
+                continue
+            if docs is None:
+                manifest["pending"][key] = candidate
+                continue
+            manifest["pending"].pop(key, None)
+            chunks = split_documents(docs)
+            if not chunks:
+                continue
+            if vector_store is None:
+                embeddings = get_embeddings()
+                vector_store = FAISS.from_documents(chunks, embeddings)
+                doc_ids = list(vector_store.index_to_docstore_id.values())
+            else:
+                doc_ids = vector_store.add_documents(chunks)
+            item = candidate["item"]
+            manifest["items"][key] = {"date": item["date"], "title": item["title"], "first_seen": candidate["first_seen"], "doc_ids": doc_ids}
+            added += 1
+
+        # Manifests written before first_seen existed start the clock for their undated items now
+        migrated = 0
+        for entry in list(manifest["items"].values()) + list(manifest["pending"].values()):
+            if "first_seen" not in entry:
+                entry["first_seen"] = first_seen
+                migrated += 1
+
+        expired = [key for key, entry in manifest["items"].items() if _regulatory_item_date(entry) < cutoff]
+        if expired and vector_store is not None:
+            vector_store.delete([doc_id for key in expired for doc_id in manifest["items"][key]["doc_ids"]])
+        for key in expired:
+            del manifest["items"][key]
+        stale_pending = [key for key, entry in manifest["pending"].items() if _regulatory_item_date(entry) < cutoff]
+        for key in stale_pending:
+            del manifest["pending"][key]
+
+        if vector_store is not None and (added or expired):
+            with timer("index_write", index="regulatory"):
+                vector_store.save_local(REGULATORY_INDEX_PATH)
+        if added or expired or migrated or manifest["pending"] != pending_before:
+            _save_regulatory_manifest(manifest)
+
+    print(f"Regulatory updates index: {added} releases embedded, {len(expired)} evicted, {len(manifest['pending'])} pending, {len(manifest['items'])} indexed")
+    return {"added": added, "evicted": len(expired), "pending": len(manifest["pending"]), "indexed": len(manifest["items"])}
+
+def load_regulatory_vector_store():
+    from langchain_community.vectorstores import FAISS
+    if not os.path.exists(os.path.join(REGULATORY_INDEX_PATH, "index.faiss")):
+        return None
+
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        return FAISS.load_local(global_vector_path, embeddings, allow_dangerous_deserialization=True)
+        embeddings = get_embeddings()
+        with timer("index_load", index="regulatory"):
+            vector_store = FAISS.load_local(REGULATORY_INDEX_PATH, embeddings, allow_dangerous_deserialization=True)
+        return vector_store if vector_store.index.ntotal else None
     except Exception as e:
-        print(f"Error loading global vector store: {e}")
+        print(f"Error loading regulatory updates index: {e}")
         return None
 
-def get_combined_conversational_agent(user_vector_store, global_vector_store, source_description):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash",
-        temperature=0.7
-    )
+def embed_queries(embeddings, queries, batch_size=100):
+    vectors = []
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        try:
+            vectors.extend(embeddings.embed_documents(batch, task_type="retrieval_query"))
+        except TypeError:
+            vectors.extend(embeddings.embed_documents(batch))
+    return vectors
+
+def get_combined_conversational_agent(user_vector_store, global_vector_store, source_description, summary_trees=None, tables=None, regulatory_vector_store=None, username=None):
+    llm = get_llm()
     
     retrievers = []
     if user_vector_store:
-        user_retriever = user_vector_store.as_retriever(search_kwargs={"k": 3})
-        retrievers.append(("user_docs", user_retriever))
+        retrievers.append(("user_docs", resident_vector_store(user_vector_store, username)))
     
     if global_vector_store:
-        global_retriever = global_vector_store.as_retriever(search_kwargs={"k": 3})
-        retrievers.append(("preloaded_docs", global_retriever))
+        retrievers.append(("preloaded_docs", resident_vector_store(global_vector_store)))
+    
+    if regulatory_vector_store:
+        retrievers.append(("regulatory_updates", resident_vector_store(regulatory_vector_store)))
     
-    from langchain.prompts import PromptTemplate
+    from langchain_core.prompts import PromptTemplate
     
-    def combined_retrieval(query):
+    def combined_retrieval(query, query_embedding=None):
         all_docs = []
         sources = []
+        vector_stores = [(source_name, get_vector_store()) for source_name, get_vector_store in retrievers]
+        vector_stores = [(source_name, vector_store) for source_name, vector_store in vector_stores if vector_store is not None]
         
-        for source_name, retriever in retrievers:
+        # All indexes share one embedding model, so the query is embedded once for all sources
+        if query_embedding is None and vector_stores:
+            query_embedding = vector_stores[0][1].embedding_function.embed_query(query)
+        
+        for source_name, vector_store in vector_stores:
             try:
-                docs = retriever.get_relevant_documents(query)
+                with timer("retrieval", source=source_name):
+                    docs = vector_store.similarity_search_by_vector(query_embedding, k=COMBINED_K_PER_SOURCE)
                 for doc in docs:
                     doc.metadata['retrieval_source'] = source_name
                 all_docs.extend(docs)
@@ -370,13 +1846,14 @@ def get_combined_conversational_agent(user_vector_store, global_vector_store, so
             except Exception as e:
                 print(f"Error retrieving from {source_name}: {e}")
         
-        return all_docs[:6]
+        return all_docs[:max(RETRIEVAL_K, COMBINED_K_PER_SOURCE * len(retrievers))]
     
     template = """You are an intelligent document analysis AI assistant. You have access to both user-uploaded documents and a preloaded knowledge base of important documents.
 
     Use the following document context to answer questions. The context includes documents from:
     - User uploaded documents (marked as 'user_docs')
     - Preloaded knowledge base (marked as 'preloaded_docs')
+    - Recent regulator press releases (marked as 'regulatory_updates', with their release date)
 
     Focus on providing:
     - Accurate information directly from the document content
@@ -401,30 +1878,60 @@ def get_combined_conversational_agent(user_vector_store, global_vector_store, so
         input_variables=["context", "question"]
     )
     
-    class CombinedRetrievalQA:
-        def __init__(self, llm, prompt, retrieval_fn):
-            self.llm = llm
-            self.prompt = prompt
-            self.retrieval_fn = retrieval_fn
-        
-        def invoke(self, inputs):
-            query = inputs.get("query") or inputs.get("input")
-            docs = self.retrieval_fn(query)
-            
-            context = "\n\n".join([
-                f"Source: {doc.metadata.get('retrieval_source', 'unknown')} - {doc.metadata.get('source_file', 'unknown file')}\n{doc.page_content}"
-                for doc in docs
-            ])
-            
-            formatted_prompt = self.prompt.format(context=context, question=query)
-            response = self.llm.invoke(formatted_prompt)
-            
-            return {
-                "result": response.content,
-                "source_documents": docs
-            }
+    return CombinedRetrievalQA(llm, prompt, combined_retrieval, summary_trees, tables)
+
+class RemoteRetrievalQA:
+    def __init__(self, service_url, username=None, timeout=120, token=None):
+        import requests
+        self.session = requests.Session()
+        token = token or get_query_service_token()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self.service_url = service_url.rstrip('/')
+        self.username = username
+        self.timeout = timeout
     
-    return CombinedRetrievalQA(llm, prompt, combined_retrieval)
+    def _post(self, endpoint, query):
+        response = self.session.post(
+            f"{self.service_url}/{endpoint}",
+            json={"query": query, "username": self.username},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    def _documents(self, payload):
+        from langchain_core.documents import Document as LangchainDocument
+        return [
+            LangchainDocument(page_content=doc["page_content"], metadata=doc["metadata"])
+            for doc in payload.get("source_documents", [])
+        ]
+    
+    def retrieval_fn(self, query, query_embedding=None):
+        return self._documents(self._post("retrieve", query))
+    
+    def invoke(self, inputs):
+        query = inputs.get("query") or inputs.get("input")
+        payload = self._post("answer", query)
+        return {
+            "result": payload["result"],
+            "source_documents": self._documents(payload),
+            "usage": payload.get("usage", {}),
+            "timings": payload.get("timings", []),
+            "mode": payload.get("mode")
+        }
+
+def get_query_service_url():
+    try:
+        return os.environ.get("QUERY_SERVICE_URL") or st.secrets.get("QUERY_SERVICE_URL")
+    except FileNotFoundError:
+        return None
+
+def get_query_service_token():
+    try:
+        return os.environ.get("QUERY_SERVICE_TOKEN") or st.secrets.get("QUERY_SERVICE_TOKEN")
+    except FileNotFoundError:
+        return None
 
 def list_preloaded_documents():
     preloaded_path = get_preloaded_docs_path()
@@ -459,7 +1966,7 @@ def get_user_uploaded_document(username):
         return url_files[0].replace('.url', ' (Web Content)')
     return None
 
-def delete_user_document_and_index(username, filename=None):
+def delete_user_document_and_index(username, filename=None, keep=None):
     user_dir = os.path.join("user_data", username)
     vector_store_path = os.path.join(user_dir, "faiss_index")
     
@@ -467,10 +1974,14 @@ def delete_user_document_and_index(username, filename=None):
         for file in os.listdir(user_dir):
             if file.endswith(('.pdf', '.docx', '.txt', '.csv', '.url')):
                 file_path = os.path.join(user_dir, file)
+                if keep and os.path.exists(keep) and os.path.samefile(file_path, keep):
+                    continue
                 if os.path.exists(file_path):
                     os.remove(file_path)
                     print(f"Deleted file: {file}")
     
+    vector_store_residency.evict(username)
+    clear_cached_answers(username)
     if os.path.exists(vector_store_path):
         import shutil
         shutil.rmtree(vector_store_path)
@@ -482,6 +1993,7 @@ def has_user_uploaded_document(username):
     return get_user_uploaded_document(username) is not None
 
 def process_and_store_single_doc(username, file_or_url):
-    delete_user_document_and_index(username)
+    # The replacement may already sit in the user's directory, so it survives the cleanup
+    delete_user_document_and_index(username, keep=file_or_url)
     
     process_and_store_docs(username, file_or_url)